@@ -322,7 +322,7 @@ def builder_submit():
                     'sql': """
                         INSERT INTO workflow_categories (id, account_id, name, active)
                         VALUES (
-                            (SELECT MAX(id) + 1 FROM workflow_categories),
+                            ?,
                             ?,
                             ?,
                             'TRUE'
@@ -330,6 +330,7 @@ def builder_submit():
                     """,
                     'sql_parameters': (ACCOUNT_ID, submitted_name)
                 },
+                'id_table': 'workflow_categories',
                 'validation': {
                     'sql': """
                         SELECT id
@@ -348,7 +349,7 @@ def builder_submit():
                     'sql': """
                         INSERT INTO workflows (id, account_id, name, workflow_category_id, active)
                         VALUES (
-                            (SELECT MAX(id) + 1 FROM workflows),
+                            ?,
                             ?,
                             ?,
                             (
@@ -361,6 +362,7 @@ def builder_submit():
                     """,
                     'sql_parameters': (ACCOUNT_ID, submitted_name, folder, ACCOUNT_ID)
                 },
+                'id_table': 'workflows',
                 'validation': {
                     'sql': """
                         SELECT w.id
@@ -422,7 +424,7 @@ def builder_submit():
                     'sql': """
                         INSERT INTO templates (id, account_id, template_type, name, workflow_category_id, active)
                         VALUES (
-                            (SELECT MAX(id) + 1 FROM templates),
+                            ?,
                             ?,
                             ?,
                             ?,
@@ -436,6 +438,7 @@ def builder_submit():
                     """,
                     'sql_parameters': (ACCOUNT_ID, template_type, submitted_name, folder, ACCOUNT_ID)
                 },
+                'id_table': 'templates',
                 'validation': {
                     'sql': """
                         SELECT t.id
@@ -480,12 +483,21 @@ def builder_submit():
         query_sub_dict = query_library.get(f'{operation} {node_type}', {})
         validation_dict = query_sub_dict.get('validation')
 
-        if validation_dict and len(submitted_name) > 150:
-            validation_failure_code = 4
-        elif validation_dict and database_connector.run_query(commit=False, **validation_dict):
-            validation_failure_code = query_sub_dict['validation_failure_code']
-        else:
-            validation_failure_code = None
+        # Validation and execution run on one connection and commit together
+        with database_connector.transaction() as tx:
+            if validation_dict and len(submitted_name) > 150:
+                validation_failure_code = 4
+            elif validation_dict and tx.run_query(**validation_dict):
+                validation_failure_code = query_sub_dict['validation_failure_code']
+            else:
+                validation_failure_code = None
+
+            if validation_failure_code is None and query_sub_dict:
+                execution_dict = query_sub_dict['execution']
+                if 'id_table' in query_sub_dict:
+                    new_id = tx.allocate_ids(query_sub_dict['id_table'], 1)[0]
+                    execution_dict = dict(execution_dict, sql_parameters=(new_id, *execution_dict['sql_parameters']))
+                tx.run_query(**execution_dict)
 
         if validation_failure_code is not None:
             return redirect(
@@ -493,8 +505,6 @@ def builder_submit():
             )
 
         if query_sub_dict:
-            execution_dict = query_sub_dict['execution']
-            database_connector.run_query(commit=True, **execution_dict)
             if node_type == 'Workflow':
                 workflow = submitted_name
             elif node_type == 'Template':
@@ -629,6 +639,12 @@ def workflow_builder_app():
         )
 
 
+@blueprint.route('/query-metrics', methods=['GET'])
+@login_required
+def query_metrics():
+    return json.dumps(database_connector.get_query_metrics(), default=str)
+
+
 @blueprint.route('/<template>', methods=['POST'])
 def route_api_endpoint(template):
     try:
@@ -905,7 +921,7 @@ def toggle_workflows():
 
         return toggle_switch_html.replace('\n', ' ')
 
-    workflow_data = database_connector.run_query(
+    table_df = database_connector.run_query(
         """
             SELECT
                 w.id AS "Workflow ID",
@@ -919,9 +935,8 @@ def toggle_workflows():
                 AND w.active = 'TRUE'
         """,
         sql_parameters=[ACCOUNT_ID],
-        return_data_format=dict
+        return_data_format='dataframe'
     )
-    table_df = pd.DataFrame(workflow_data)
 
     for column in ['Workflow Category', 'Workflow Name']:
         table_df[column] = table_df[column].map(html.escape)
@@ -952,7 +967,7 @@ def api_triggers():
         except TypeError as e:
             return ''
 
-    workflow_data = database_connector.run_query(
+    table_df = database_connector.run_query(
         """
             SELECT
                 wn.workflow_id AS "Workflow ID",
@@ -974,11 +989,9 @@ def api_triggers():
             ORDER BY wc.name, w.name, wn.name
         """,
         sql_parameters=[ACCOUNT_ID],
-        return_data_format=dict
+        return_data_format='dataframe'
     )
 
-    table_df = pd.DataFrame(workflow_data)
-
     table_df['API Endpoint'] = table_df['API Endpoint'].map(_construct_api_endpoint_info)
     table_df['API Endpoint'] = table_df.apply(
         lambda row: f"https://{row['subdomain']}.shinewave.io/{row['API Endpoint']}" if row['API Endpoint'] else '', axis=1)
@@ -1125,12 +1138,13 @@ def recipient_file_upload_overwrite_settings():
         commit=True
     )
 
-    conn = database_connector.get_conn()
+    upload_df = upload_df.convert_dtypes()
+    upload_df = upload_df.astype(object).where(pd.notnull(upload_df), None)
     try:
-        upload_df.to_sql('recipients_staging', conn, if_exists='append', index=False)
-        conn.close()
+        database_connector.bulk_insert(
+            'recipients_staging', list(upload_df.columns), upload_df.itertuples(index=False, name=None)
+        )
     except Exception as e:
-        conn.close()
         raise ValueError(e)
 
     database_connector.run_query(
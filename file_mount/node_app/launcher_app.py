@@ -6,7 +6,7 @@ import subprocess
 
 from flask import Flask, request
 
-from shinewave_webapp.database_connector import run_query
+from shinewave_webapp.database_connector import allocate_id, get_query_metrics, run_query
 
 
 ACCOUNT_ID = 1
@@ -217,7 +217,9 @@ def app_launcher():
         """
         app_server_address = extract_ip_address()
         insert_columns = ['id', 'account_id', 'workflow_id', 'app_server_address', 'active', 'last_activity']
-        insert_values = [account_id, workflow_id, app_server_address, 'TRUE', str(datetime.now())]
+        insert_values = [
+            allocate_id('workflow_routes'), account_id, workflow_id, app_server_address, 'TRUE', str(datetime.now())
+        ]
 
         assign_port_dict = assign_next_port(workflow_id, app_server_address)
         for column_name, value in assign_port_dict.items():
@@ -228,10 +230,7 @@ def app_launcher():
 
         insert_statement = f"""
             INSERT INTO workflow_routes ({', '.join(insert_columns)})
-            VALUES (
-                (SELECT MAX(id) + 1 FROM workflow_routes),
-                {', '.join(insert_substitutions)}
-            )
+            VALUES ({', '.join(insert_substitutions)})
         """
 
         # Create entry in DB for app instance
@@ -256,5 +255,10 @@ def app_launcher():
         return json.dumps(address_info, default=str)
 
 
+@app.route('/query_metrics', methods=["GET"])
+def query_metrics():
+    return json.dumps(get_query_metrics(), default=str)
+
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=LAUNCHER_PORT)
@@ -35,6 +35,8 @@ def run_node_app(
 
     # create graph controller.
     graph = GraphHandler(queue=queue, socketio=socketio)
+    # write any workflow activity the heartbeat hasn't flushed yet before the app closes
+    app.aboutToQuit.connect(graph.stop_activity_heartbeat)
 
     # registered nodes.
 
@@ -0,0 +1,115 @@
+"""
+    Benchmark for GraphHandler path enumeration on fan-out/fan-in workflows. Each synthetic workflow is one entry point,
+    followed by <depth> layers of <width> nodes where every node connects to every node of the next layer, ending in a
+    single marker, so it has width ** depth paths. Times the original recursive get_paths against count_paths,
+    iter_paths (capped) and get_paths.
+
+    Usage:
+        QT_QPA_PLATFORM=offscreen python benchmarks/bench_get_paths.py --shapes 2x8 4x6 8x6 50x2
+"""
+import argparse
+from itertools import chain, islice
+from time import perf_counter
+
+from Qt import QtWidgets
+
+from jakenode.graph_handler import GraphHandler
+
+
+ENTRY_NODE_TYPE = 'nodes.trigger.InboundWorkflowChange'
+LAYER_NODE_TYPE = 'nodes.trigger.TimeElapsedTrigger'
+EXIT_NODE_TYPE = 'nodes.marker.Converted'
+
+
+def legacy_get_paths(graph):
+    """
+        The get_paths that iter_paths/count_paths replaced, kept here as the baseline.
+    """
+    def _get_paths(explored_paths, unexplored_paths):
+        if unexplored_paths:
+            current_path = unexplored_paths.pop(0)
+            current_node = current_path[-1]
+            output_nodes = current_node.connected_output_nodes().values()
+            children = list(chain(*output_nodes))
+            if children:
+                for child in children:
+                    unexplored_paths.append(current_path + [child])
+                current_path = []
+            else:
+                explored_paths.append(current_path)
+                current_path = []
+        if unexplored_paths:
+            return _get_paths(explored_paths, unexplored_paths)
+        else:
+            return explored_paths
+
+    entry_points = graph.get_entry_points()
+
+    return _get_paths([], [entry_points])
+
+
+def build_graph(width, depth):
+    graph = GraphHandler()
+    previous_layer = [graph.create_node(ENTRY_NODE_TYPE, push_undo=False)]
+    for _ in range(depth):
+        layer = [graph.create_node(LAYER_NODE_TYPE, push_undo=False) for _ in range(width)]
+        for node in layer:
+            for upstream_node in previous_layer:
+                upstream_node.output(0).connect_to(node.input(0), push_undo=False)
+        previous_layer = layer
+
+    exit_node = graph.create_node(EXIT_NODE_TYPE, push_undo=False)
+    for upstream_node in previous_layer:
+        upstream_node.output(0).connect_to(exit_node.input(0), push_undo=False)
+    return graph
+
+
+def time_call(function):
+    start = perf_counter()
+    try:
+        result = function()
+    except (RecursionError, ValueError) as exception:
+        return perf_counter() - start, type(exception).__name__
+    return perf_counter() - start, result
+
+
+def run_benchmark(shapes, max_paths):
+    app = QtWidgets.QApplication([])
+
+    for width, depth in shapes:
+        graph = build_graph(width, depth)
+        node_count = len(graph.all_nodes())
+
+        results = {
+            'legacy get_paths': time_call(lambda: len(legacy_get_paths(graph))),
+            'count_paths': time_call(graph.count_paths),
+            f'iter_paths (first {max_paths:,})': time_call(
+                lambda: sum(1 for _ in islice(graph.iter_paths(), max_paths))
+            ),
+            'get_paths': time_call(lambda: len(graph.get_paths()))
+        }
+
+        print(f'\nwidth {width}, depth {depth}: {node_count:,} nodes, {width ** depth:,} paths')
+        print(f'{"method":<28}{"seconds":>10}{"result":>16}')
+        for name, (seconds, result) in results.items():
+            print(f'{name:<28}{seconds:>10.4f}{result:>16}')
+
+    app.quit()
+
+
+def parse_shape(shape):
+    width, depth = shape.lower().split('x')
+    return int(width), int(depth)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '-s', '--shapes', dest='shapes', type=parse_shape, nargs='+', default=[(2, 8), (4, 6), (8, 6), (50, 2)],
+        help='Workflow shapes to benchmark, as <width>x<depth>'
+    )
+    parser.add_argument(
+        '-m', '--max-paths', dest='max_paths', type=int, default=10000, help='Cap for the iter_paths run'
+    )
+    args = parser.parse_args()
+    run_benchmark(args.shapes, args.max_paths)
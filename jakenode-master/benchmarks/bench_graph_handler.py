@@ -0,0 +1,295 @@
+"""
+    Benchmark for how GraphHandler scales with workflow size. Builds synthetic workflows from the jakenode node types
+    in a temporary sqlite database, then times save_graph_to_database (first save, and again after renaming 1% of the
+    nodes), load_graph_from_database, validate_graph, get_paths and auto_layout_nodes, under an offscreen Qt platform.
+
+    Each workflow is an API trigger followed by a spine of SMS outreach nodes, grown one motif at a time until it
+    reaches the requested number of nodes:
+        chain:    spine SMS -> time elapsed -> spine SMS
+        fan-out:  spine SMS -> exact responses -> email -> marker, plus a fuzzy response continuing the spine
+        diamond:  spine SMS -> two time elapsed/SMS branches -> exact responses -> one shared email -> marker, plus a
+                  chain continuing the spine
+    The mixed shape rotates through chain, chain, fan-out, diamond. Branches end off the spine, so the number of paths
+    grows with the number of nodes rather than exponentially.
+
+    Usage:
+        python benchmarks/bench_graph_handler.py --sizes 10 100 1000 10000 --shapes mixed --output results.json
+        python benchmarks/bench_graph_handler.py --app-data-path ../file_mount/node_app/data --shapes chain fan-out
+"""
+import argparse
+from datetime import datetime
+import json
+import os
+import platform
+import tempfile
+from time import perf_counter
+
+from Qt import QtWidgets
+
+from jakenode.graph_handler import GraphHandler
+from jakenode.regex import regex_templates
+from shinewave_webapp.database_connector import APP_DATA_PATH, close_sqlite_conns, transaction
+from shinewave_webapp.schema_migrations import migrate_tables
+
+
+ACCOUNT_ID = 1
+WORKFLOW_CATEGORY_ID = 1
+
+# (id, name, template_type) for the templates that the outreach nodes select
+TEMPLATES = [
+    (1, 'Reminder', 'nodes.outreach.SMSOutreach'),
+    (2, 'Follow Up', 'nodes.outreach.SMSOutreach'),
+    (3, 'Confirmation', 'nodes.outreach.EmailOutreach'),
+    (4, 'Cancellation', 'nodes.outreach.EmailOutreach')
+]
+
+MOTIFS = {
+    'chain': ['chain'],
+    'fan-out': ['fan-out'],
+    'diamond': ['diamond'],
+    'mixed': ['chain', 'chain', 'fan-out', 'diamond']
+}
+
+# Share of nodes renamed before the second save
+CHANGED_NODE_SHARE = 0.01
+
+
+class WorkflowBuilder():
+    """
+        Builds node records in the form returned by GraphHandler.get_node_records, so that workflows can be generated
+        without creating a node per record.
+    """
+
+    def __init__(self):
+        self.node_records = {}
+        self.fuzzy_response_template = regex_templates().get_all_templates()[0]
+
+    def add_node(self, node_type, custom_data=None, upstream_object_ids=()):
+        object_id = f'bench-{len(self.node_records):06d}'
+        self.node_records[object_id] = {
+            'name': f"{node_type.rsplit('.', 1)[-1]} {len(self.node_records)}",
+            'node_type': node_type,
+            'inputs': sorted(upstream_object_ids),
+            'outputs': [],
+            'custom_data': custom_data or {}
+        }
+        for upstream_object_id in upstream_object_ids:
+            self.node_records[upstream_object_id]['outputs'].append(object_id)
+        return object_id
+
+    def add_time_elapsed(self, upstream_object_id, time_number='2', time_units='days'):
+        return self.add_node(
+            'nodes.trigger.TimeElapsedTrigger',
+            {'time_number': time_number, 'time_units': time_units},
+            [upstream_object_id]
+        )
+
+    def add_sms(self, upstream_object_ids, template_id=1):
+        return self.add_node('nodes.outreach.SMSOutreach', {'template_id': template_id}, upstream_object_ids)
+
+    def add_email(self, upstream_object_ids, template_id=3):
+        return self.add_node('nodes.outreach.EmailOutreach', {'template_id': template_id}, upstream_object_ids)
+
+    def add_exact_response(self, upstream_object_id, exact_response):
+        return self.add_node(
+            'nodes.trigger.ExactResponseReceivedTrigger', {'exact_response': exact_response}, [upstream_object_id]
+        )
+
+    def add_chain(self, spine_object_id):
+        return self.add_sms([self.add_time_elapsed(spine_object_id)], template_id=2)
+
+    def add_fan_out(self, spine_object_id):
+        for exact_response, template_id, marker_type in [('YES', 3, 'Converted'), ('STOP', 4, 'NotConverted')]:
+            email_object_id = self.add_email([self.add_exact_response(spine_object_id, exact_response)], template_id)
+            self.add_node(f'nodes.marker.{marker_type}', upstream_object_ids=[email_object_id])
+
+        fuzzy_response_object_id = self.add_node(
+            'nodes.trigger.FuzzyResponseReceivedTrigger',
+            {'response_template': self.fuzzy_response_template},
+            [spine_object_id]
+        )
+        return self.add_sms([fuzzy_response_object_id])
+
+    def add_diamond(self, spine_object_id):
+        branch_object_ids = []
+        for time_units in ['hours', 'days']:
+            sms_object_id = self.add_sms([self.add_time_elapsed(spine_object_id, time_units=time_units)])
+            branch_object_ids.append(self.add_exact_response(sms_object_id, 'YES'))
+
+        email_object_id = self.add_email(branch_object_ids)
+        self.add_node('nodes.marker.Converted', upstream_object_ids=[email_object_id])
+        return self.add_chain(spine_object_id)
+
+
+def build_node_records(shape, node_count):
+    """
+        Returns the node records of a workflow of the given shape with at least node_count nodes.
+    """
+    builder = WorkflowBuilder()
+    api_trigger_object_id = builder.add_node('nodes.trigger.APITrigger', {'api_endpoint': f'bench-{shape}'})
+    spine_object_id = builder.add_sms([api_trigger_object_id])
+
+    motif_builders = {'chain': builder.add_chain, 'fan-out': builder.add_fan_out, 'diamond': builder.add_diamond}
+    motif_number = 0
+    while len(builder.node_records) < node_count:
+        motif = MOTIFS[shape][motif_number % len(MOTIFS[shape])]
+        spine_object_id = motif_builders[motif](spine_object_id)
+        motif_number += 1
+
+    return builder.node_records
+
+
+def build_database(database_connection_kwargs, app_data_path, workflows):
+    """
+        Creates every table from the schema files, plus the account, workflow category, templates and the
+        [(workflow_id, name), ...] workflows that the benchmark saves into.
+    """
+    migrate_tables(app_data_path=app_data_path, **database_connection_kwargs)
+
+    with transaction(**database_connection_kwargs) as tx:
+        tx.bulk_insert(
+            'account',
+            ['id', 'name', 'subdomain', 'active'],
+            [[ACCOUNT_ID, 'Benchmark Account', 'benchmark', 'TRUE']]
+        )
+        tx.bulk_insert(
+            'workflow_categories',
+            ['id', 'account_id', 'name', 'active'],
+            [[WORKFLOW_CATEGORY_ID, ACCOUNT_ID, 'Benchmark Category', 'TRUE']]
+        )
+        tx.bulk_insert(
+            'templates',
+            ['id', 'account_id', 'name', 'template_type', 'workflow_category_id', 'active'],
+            [[i[0], ACCOUNT_ID, i[1], i[2], WORKFLOW_CATEGORY_ID, 'TRUE'] for i in TEMPLATES]
+        )
+        tx.bulk_insert(
+            'workflows',
+            ['id', 'account_id', 'name', 'workflow_category_id', 'enabled', 'active'],
+            [[workflow_id, ACCOUNT_ID, name, WORKFLOW_CATEGORY_ID, 'TRUE', 'TRUE'] for workflow_id, name in workflows]
+        )
+
+
+def time_call(function):
+    start = perf_counter()
+    try:
+        result = function()
+    except (RecursionError, ValueError) as exception:
+        return perf_counter() - start, type(exception).__name__
+    return perf_counter() - start, result
+
+
+def get_graph(workflow_id, database_connection_kwargs):
+    # The activity heartbeat would otherwise write to the database in the middle of a timing
+    graph = GraphHandler(
+        account_id=ACCOUNT_ID,
+        workflow_category_id=WORKFLOW_CATEGORY_ID,
+        workflow_id=workflow_id,
+        activity_flush_seconds=3600,
+        database_connection_kwargs=database_connection_kwargs
+    )
+    # Nodes are selected as they're created, and there is no display window to send their info to
+    graph.display_delay_seconds = float('inf')
+    return graph
+
+
+def benchmark_workflow(workflow_id, node_records, database_connection_kwargs):
+    """
+        Returns {operation: (seconds, result)} for one workflow. The first save writes a graph built from node_records;
+        everything after it runs on a fresh graph loaded from the database.
+    """
+    timings = {}
+
+    built_graph = get_graph(workflow_id, database_connection_kwargs)
+    built_graph.load_graph_from_records(node_records)
+    timings['save_graph_to_database'] = time_call(lambda: built_graph.save_graph_to_database()['rows_written'])
+    built_graph.stop_activity_heartbeat()
+
+    graph = get_graph(workflow_id, database_connection_kwargs)
+    timings['load_graph_from_database'] = time_call(lambda: graph.load_graph_from_database() or len(graph.all_nodes()))
+    timings['validate_graph'] = time_call(lambda: graph.validate_graph(full=True) or 'valid')
+    timings['get_paths'] = time_call(lambda: len(graph.get_paths()))
+    timings['auto_layout_nodes'] = time_call(lambda: graph.auto_layout_nodes() or len(graph.all_nodes()))
+
+    nodes = graph.all_nodes()
+    for node in nodes[::max(1, round(1 / CHANGED_NODE_SHARE))]:
+        node.set_property('name', f'{node.name()} (renamed)', push_undo=False)
+    timings['save_graph_to_database (1% renamed)'] = time_call(
+        lambda: graph.save_graph_to_database()['rows_written']
+    )
+    graph.stop_activity_heartbeat()
+
+    return timings
+
+
+def run_benchmark(sizes, shapes, app_data_path, output_path=None):
+    # Qt reads the platform when the QApplication is created; an explicit QT_QPA_PLATFORM still wins
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    app = QtWidgets.QApplication([])
+
+    workflows = [(shape, size) for shape in shapes for size in sizes]
+    report = {
+        'benchmark': 'graph_handler',
+        'started_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'qt_platform': app.platformName(),
+        'database_connection_type': 'sqlite',
+        'results': []
+    }
+
+    with tempfile.TemporaryDirectory() as temp_folder:
+        database_connection_kwargs = {
+            'database_connection_type': 'sqlite', 'database': os.path.join(temp_folder, 'bench.db')
+        }
+        build_database(
+            database_connection_kwargs,
+            app_data_path,
+            [(workflow_id, f'{shape} {size}') for workflow_id, (shape, size) in enumerate(workflows, start=1)]
+        )
+
+        for workflow_id, (shape, size) in enumerate(workflows, start=1):
+            node_records = build_node_records(shape, size)
+            timings = benchmark_workflow(workflow_id, node_records, database_connection_kwargs)
+
+            node_count = len(node_records)
+            print(f'\n{shape}, {node_count:,} nodes')
+            print(f'{"operation":<38}{"seconds":>10}{"nodes/sec":>14}{"result":>12}')
+            for name, (seconds, result) in timings.items():
+                print(f'{name:<38}{seconds:>10.4f}{node_count / seconds:>14,.0f}{result:>12}')
+
+            report['results'].append({
+                'shape': shape,
+                'requested_node_count': size,
+                'node_count': node_count,
+                'connection_count': sum(len(i['inputs']) for i in node_records.values()),
+                'timings': {name: {'seconds': seconds, 'result': result} for name, (seconds, result) in timings.items()}
+            })
+
+        close_sqlite_conns()
+
+    app.quit()
+
+    if output_path:
+        with open(output_path, 'w') as output_file:
+            json.dump(report, output_file, indent=4)
+        print(f'\nResults written to {output_path}')
+
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '-n', '--sizes', dest='sizes', type=int, nargs='+', default=[10, 100, 1000, 10000],
+        help='Node counts to benchmark'
+    )
+    parser.add_argument(
+        '-s', '--shapes', dest='shapes', nargs='+', choices=list(MOTIFS), default=['mixed'],
+        help='Workflow shapes to benchmark'
+    )
+    parser.add_argument(
+        '-d', '--app-data-path', dest='app_data_path', default=APP_DATA_PATH,
+        help='Folder holding table_csvs, for the table schemas'
+    )
+    parser.add_argument('-o', '--output', dest='output_path', default=None, help='Path to write JSON results to')
+    args = parser.parse_args()
+    run_benchmark(args.sizes, args.shapes, args.app_data_path, args.output_path)
@@ -0,0 +1,132 @@
+"""
+    Benchmark for classifying inbound SMS replies against the fuzzy response templates. Generates synthetic replies
+    (short answers, answers inside sentences, and replies that match no template), a share of which are made unique so
+    that they miss the classify cache, then times running every raw template through re.search, every precompiled
+    template, all templates in one pass of optional lookaheads, TemplateMatcher.classify (memoized) and
+    TemplateMatcher.search (first matching template, one scan).
+    Runs with the built-in templates, then with EXTRA_TEMPLATES added. classify is checked against the per-template
+    results before anything is timed.
+
+    Usage:
+        python benchmarks/bench_regex_templates.py --replies 1000000 --unique-share 0.2
+"""
+import argparse
+import random
+import re
+from time import perf_counter
+
+from jakenode.regex import TemplateMatcher, regex_templates
+
+
+REPLIES = [
+    'Yes', 'yes', 'YES', 'y', 'Y', 'yes please', 'Yes, see you then', 'yes!', 'Yes I will be there',
+    'No', 'no', 'NO', 'n', 'no thanks', 'No, I need to reschedule', 'nope',
+    'Sí', 'si', 'SI', 'sí, gracias', 'Si claro',
+    'STOP', 'ok', 'Thanks!', 'Who is this?', 'What time is my appointment?', 'Can I move it to Tuesday?',
+    'yesterday was better', 'not sure, can you call me?', 'Running 10 minutes late', '👍'
+]
+
+
+# Templates an account might add on top of the built-in ones
+EXTRA_TEMPLATES = [
+    ('Stop', r'\b(stop|unsubscribe|cancel)\b'),
+    ('Reschedule', r'\b(reschedul\w*|move|change)\b'),
+    ('Call Me', r'\bcall( me)?\b'),
+    ('Late', r'\blate\b'),
+    ('Thanks', r'\b(thanks?|thx|gracias)\b'),
+    ('Question', r'\?'),
+    ('Ok', r'\b(ok(ay)?|k)\b'),
+    ('Who', r'\bwho\b'),
+    ('When', r'\b(when|what time)\b'),
+    ('Weekday', r'\b(mon|tues|wednes|thurs|fri|satur|sun)day\b')
+]
+
+
+def build_replies(reply_count, unique_share, seed=0):
+    """
+        Returns reply_count replies drawn from REPLIES, with unique_share of them suffixed with a sequence number (as
+        in a reply quoting an appointment number), so that they can't be served from the classify cache.
+    """
+    random_generator = random.Random(seed)
+    replies = random_generator.choices(REPLIES, k=reply_count)
+    for i in random_generator.sample(range(reply_count), round(reply_count * unique_share)):
+        replies[i] = f'{replies[i]} #{i}'
+    return replies
+
+
+def legacy_classify(templates, message):
+    """
+        Runs each raw template through re.search, the way the stored patterns had to be used before TemplateMatcher.
+    """
+    return [template_name for template_name, template in templates if re.search(template, message, re.IGNORECASE)]
+
+
+def precompiled_classify(patterns, message):
+    return [template_name for template_name, pattern in patterns if pattern.search(message)]
+
+
+def compile_single_pass(templates):
+    """
+        Returns a pattern whose match at the start of a message captures group t<position> for every template found
+        in it, each template's optional lookahead scanning the message from the start.
+    """
+    lookaheads = [f'(?:(?=(?s:.*?)(?P<t{i}>{template})))?' for i, (_, template) in enumerate(templates)]
+    return re.compile(''.join(lookaheads), re.IGNORECASE)
+
+
+def single_pass_classify(templates, pattern, message):
+    match = pattern.match(message)
+    return [template_name for i, (template_name, _) in enumerate(templates) if match.start(f't{i}') >= 0]
+
+
+def time_call(function):
+    start = perf_counter()
+    function()
+    return perf_counter() - start
+
+
+def run_benchmark(reply_count, unique_share):
+    templates_source = regex_templates()
+    built_in_templates = [
+        (i, templates_source.templates_dict[i]['template']) for i in templates_source.get_all_templates()
+    ]
+    replies = build_replies(reply_count, unique_share)
+
+    for templates in [built_in_templates, built_in_templates + EXTRA_TEMPLATES]:
+        patterns = [(template_name, re.compile(template, re.IGNORECASE)) for template_name, template in templates]
+        single_pass_pattern = compile_single_pass(templates)
+        for i in set(replies):
+            expected = precompiled_classify(patterns, i)
+            if TemplateMatcher(templates).classify(i) != expected:
+                raise ValueError(f'TemplateMatcher.classify disagrees with the per-template results for: {i!r}')
+            if single_pass_classify(templates, single_pass_pattern, i) != expected:
+                raise ValueError(f'The single pass disagrees with the per-template results for: {i!r}')
+
+        # A fresh matcher per run, so that the memoized run starts with an empty cache
+        results = {
+            'legacy re.search per template': time_call(lambda: [legacy_classify(templates, i) for i in replies]),
+            'precompiled search per template': time_call(lambda: [precompiled_classify(patterns, i) for i in replies]),
+            'single pass of lookaheads': time_call(
+                lambda: [single_pass_classify(templates, single_pass_pattern, i) for i in replies]
+            ),
+            'TemplateMatcher.classify': time_call(lambda: list(map(TemplateMatcher(templates).classify, replies))),
+            'TemplateMatcher.search': time_call(lambda: list(map(TemplateMatcher(templates).search, replies)))
+        }
+
+        print(f'\n{reply_count:,} replies ({unique_share:.0%} unique), {len(templates)} templates')
+        print(f'{"method":<36}{"seconds":>10}{"replies/sec":>16}')
+        for name, seconds in results.items():
+            print(f'{name:<36}{seconds:>10.4f}{reply_count / seconds:>16,.0f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '-r', '--replies', dest='replies', type=int, default=1000000, help='Number of synthetic replies to classify'
+    )
+    parser.add_argument(
+        '-u', '--unique-share', dest='unique_share', type=float, default=0.2,
+        help='Share of replies made unique, so that they miss the classify cache'
+    )
+    args = parser.parse_args()
+    run_benchmark(args.replies, args.unique_share)
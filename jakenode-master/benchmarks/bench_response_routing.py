@@ -0,0 +1,172 @@
+"""
+    Benchmark for routing inbound SMS replies with ResponseRouter. Builds a workflow of <sms-nodes> SMS outreach nodes,
+    each followed by Exact Response triggers (EXACT_RESPONSES) and Fuzzy Response triggers (every built-in template),
+    spreads <recipients> recipients across them, and generates replies (exact responses in varying case and spacing,
+    answers inside sentences, and replies that set nothing off), a share of which are made unique so that they miss
+    the route cache. Times building the routes, then routing every reply with ResponseRouter.route_message against
+    scanning each recipient's downstream triggers in turn. Both are checked to agree before anything is timed.
+
+    Usage:
+        python benchmarks/bench_response_routing.py --sms-nodes 1000 --recipients 100000 --replies 1000000
+"""
+import argparse
+import random
+import re
+from time import perf_counter
+
+from jakenode.regex import regex_templates
+from jakenode.response_router import (
+    EXACT_RESPONSE_TYPE, FUZZY_RESPONSE_TYPE, SMS_OUTREACH_TYPE, ResponseRouter, normalize_response
+)
+
+
+EXACT_RESPONSES = ['YES', 'STOP', 'C', '1', '2', 'Reschedule']
+
+REPLIES = [
+    'YES', 'yes', ' Yes ', 'stop', 'STOP', 'Stop', 'c', 'C', '1', '2', ' 2', 'reschedule', 'RESCHEDULE',
+    'y', 'Yes, see you then', 'yes please', 'No', 'no thanks', 'nope', 'Sí', 'si claro', 'SI',
+    'ok', 'Thanks!', 'Who is this?', 'What time is my appointment?', 'Running 10 minutes late', '👍'
+]
+
+# Replies per second that route_message is expected to sustain with the defaults below
+TARGET_REPLIES_PER_SECOND = 250000
+
+
+def build_node_records(sms_node_count):
+    """
+        Returns node records, in the form returned by GraphHandler.get_node_records, for an API trigger followed by a
+        chain of SMS outreach nodes, each with one Exact Response trigger per EXACT_RESPONSES and one Fuzzy Response
+        trigger per built-in template, the first fuzzy trigger continuing the chain.
+    """
+    node_records = {}
+
+    def add_node(node_type, custom_data=None, upstream_object_id=None):
+        object_id = f'bench-{len(node_records):07d}'
+        node_records[object_id] = {
+            'name': f"{node_type.rsplit('.', 1)[-1]} {len(node_records)}",
+            'node_type': node_type,
+            'inputs': [upstream_object_id] if upstream_object_id else [],
+            'outputs': [],
+            'custom_data': custom_data or {}
+        }
+        if upstream_object_id:
+            node_records[upstream_object_id]['outputs'].append(object_id)
+        return object_id
+
+    template_names = regex_templates().get_all_templates()
+    spine_object_id = add_node('nodes.trigger.APITrigger', {'api_endpoint': 'bench-routing'})
+    for _ in range(sms_node_count):
+        sms_object_id = add_node(SMS_OUTREACH_TYPE, {'template_id': 1}, spine_object_id)
+        for exact_response in EXACT_RESPONSES:
+            add_node(EXACT_RESPONSE_TYPE, {'exact_response': exact_response}, sms_object_id)
+        fuzzy_object_ids = [
+            add_node(FUZZY_RESPONSE_TYPE, {'response_template': i}, sms_object_id) for i in template_names
+        ]
+        spine_object_id = fuzzy_object_ids[0]
+
+    return node_records
+
+
+def build_replies(recipient_ids, reply_count, unique_share, seed=0):
+    """
+        Returns reply_count (recipient_id, reply) pairs, with unique_share of the replies suffixed with a sequence
+        number (as in a reply quoting an appointment number), so that they can't be served from the route cache.
+    """
+    random_generator = random.Random(seed)
+    replies = list(zip(
+        random_generator.choices(recipient_ids, k=reply_count), random_generator.choices(REPLIES, k=reply_count)
+    ))
+    for i in random_generator.sample(range(reply_count), round(reply_count * unique_share)):
+        replies[i] = (replies[i][0], f'{replies[i][1]} #{i}')
+    return replies
+
+
+def legacy_route_message(node_records, templates_dict, waiting_object_ids, recipient_id, message):
+    """
+        Routes a reply by walking the downstream triggers of the recipient's SMS node, comparing each exact response
+        and running each fuzzy template through re.search, with the same precedence as ResponseRoute.
+    """
+    object_id = waiting_object_ids.get(recipient_id)
+    if object_id is None:
+        return None
+
+    normalized_message = normalize_response(message)
+    fuzzy_matches = []
+    for output_object_id in sorted(node_records[object_id]['outputs']):
+        output_record = node_records[output_object_id]
+        if output_record['node_type'] == EXACT_RESPONSE_TYPE:
+            if normalize_response(output_record['custom_data']['exact_response']) == normalized_message:
+                return output_object_id
+        elif output_record['node_type'] == FUZZY_RESPONSE_TYPE:
+            template = templates_dict[output_record['custom_data']['response_template']]['template']
+            match = re.search(template, normalized_message, re.IGNORECASE)
+            if match:
+                fuzzy_matches.append((match.start(), output_object_id))
+    return min(fuzzy_matches)[1] if fuzzy_matches else None
+
+
+def time_call(function):
+    start = perf_counter()
+    function()
+    return perf_counter() - start
+
+
+def run_benchmark(sms_node_count, recipient_count, reply_count, unique_share):
+    node_records = build_node_records(sms_node_count)
+    templates_dict = regex_templates().templates_dict
+
+    router = ResponseRouter()
+    build_seconds = time_call(lambda: router.load_routes_from_records(node_records))
+
+    random_generator = random.Random(1)
+    sms_object_ids = list(router.routes)
+    for recipient_id in range(recipient_count):
+        router.set_waiting_node(recipient_id, random_generator.choice(sms_object_ids))
+    replies = build_replies(range(recipient_count), reply_count, unique_share)
+
+    mismatches = [
+        i for i in set(replies[:100000]) if router.route_message(*i) != legacy_route_message(
+            node_records, templates_dict, router.waiting_object_ids, *i
+        )
+    ]
+    if mismatches:
+        raise ValueError(f'ResponseRouter disagrees with the trigger-by-trigger results for: {mismatches[:10]}')
+
+    # A fresh router per run, so that route_message starts with empty route caches
+    timed_router = ResponseRouter()
+    timed_router.load_routes_from_records(node_records)
+    timed_router.waiting_object_ids = router.waiting_object_ids
+    results = {
+        'legacy trigger-by-trigger scan': time_call(
+            lambda: [legacy_route_message(node_records, templates_dict, router.waiting_object_ids, *i) for i in replies]
+        ),
+        'ResponseRouter.route_message': time_call(lambda: [timed_router.route_message(*i) for i in replies])
+    }
+
+    print(
+        f'\n{sms_node_count:,} SMS nodes ({len(node_records):,} nodes), {recipient_count:,} recipients, '
+        f'{reply_count:,} replies ({unique_share:.0%} unique)'
+    )
+    print(f'{"building routes":<36}{build_seconds:>10.4f}')
+    print(f'{"method":<36}{"seconds":>10}{"replies/sec":>16}')
+    for name, seconds in results.items():
+        print(f'{name:<36}{seconds:>10.4f}{reply_count / seconds:>16,.0f}')
+
+    replies_per_second = reply_count / results['ResponseRouter.route_message']
+    status = 'met' if replies_per_second >= TARGET_REPLIES_PER_SECOND else 'MISSED'
+    print(f'target of {TARGET_REPLIES_PER_SECOND:,} replies/sec {status}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-s', '--sms-nodes', dest='sms_nodes', type=int, default=1000, help='Number of SMS nodes')
+    parser.add_argument('-r', '--recipients', dest='recipients', type=int, default=100000, help='Number of recipients')
+    parser.add_argument(
+        '-m', '--replies', dest='replies', type=int, default=1000000, help='Number of synthetic replies to route'
+    )
+    parser.add_argument(
+        '-u', '--unique-share', dest='unique_share', type=float, default=0.2,
+        help='Share of replies made unique, so that they miss the route cache'
+    )
+    args = parser.parse_args()
+    run_benchmark(args.sms_nodes, args.recipients, args.replies, args.unique_share)
@@ -0,0 +1,260 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+from time import perf_counter
+
+from jakenode.headless_graph import HeadlessGraph
+from jakenode.node_catalog import NodeCatalog
+from shinewave_webapp.database_connector import (
+    DATABASE, DEFAULT_CONNECTION_TYPE, HOST, PASSWORD, PORT, USERNAME, dispose_engines, run_query
+)
+
+
+"""
+    Validates every active workflow of an account at once (for example, after a template is deleted), with the same
+    rules as GraphHandler.validate_graph, without opening an editor session per workflow.
+
+    Usage:
+        python -m jakenode.bulk_validation --account-id 1 --processes 4
+        python -m jakenode.bulk_validation --account-id 1 --database-connection-type sqlite --database <path>
+"""
+
+# Workflows are sent to the worker processes in chunks of this many, to keep pickling overhead per workflow low
+VALIDATION_CHUNK_SIZE = 50
+
+
+def fetch_account_workflows(account_id, database_connection_kwargs=None):
+    return run_query(
+        """
+            SELECT id, name, workflow_category_id
+            FROM workflows
+            WHERE
+                account_id = ?
+                AND active = 'TRUE'
+            ORDER BY id
+        """,
+        sql_parameters=[account_id],
+        **(database_connection_kwargs or {})
+    )
+
+
+def fetch_account_node_rows(account_id, database_connection_kwargs=None):
+    """
+        Returns [(workflow_id, workflow_version, object_id, name, node_type, inputs, outputs, custom_data), ...] for
+        the active nodes of every active workflow in the account, in a single query.
+    """
+    return run_query(
+        """
+            SELECT
+                wn.workflow_id,
+                wn.workflow_version,
+                wn.object_id,
+                wn.name,
+                wn.node_type,
+                wn.inputs,
+                wn.outputs,
+                wn.custom_data
+            FROM workflow_nodes wn
+            INNER JOIN workflows w ON
+                wn.workflow_id = w.id
+                AND wn.active = w.active
+            WHERE
+                w.account_id = ?
+                AND wn.active = 'TRUE'
+        """,
+        sql_parameters=[account_id],
+        **(database_connection_kwargs or {})
+    )
+
+
+def get_api_data(node_rows):
+    """
+        Works out what NodeCatalog.fetch_api_data would fetch for each workflow from the account's node rows, so that
+        loading an API trigger doesn't cost a query per workflow.
+        Returns
+        -------
+        tuple: ({workflow_id: workflow_version}, {node_type: [api_endpoint, ...]})
+    """
+    workflow_versions = {}
+    api_endpoints = {}
+    for workflow_id, workflow_version, _, _, node_type, _, _, custom_data in node_rows:
+        if workflow_version is not None:
+            workflow_versions[workflow_id] = max(workflow_versions.get(workflow_id, 1), int(workflow_version))
+
+        node_type_endpoints = api_endpoints.setdefault(node_type, [])
+        if custom_data and 'api_endpoint' in custom_data:
+            api_endpoint = json.loads(custom_data).get('api_endpoint')
+            if api_endpoint:
+                node_type_endpoints.append(api_endpoint)
+
+    return workflow_versions, api_endpoints
+
+
+def validate_workflow(
+    account_id, workflow_category_id, workflow_id, node_rows, node_catalog=None, database_connection_kwargs=None
+):
+    """
+        Loads a workflow from its workflow_nodes rows, [(object_id, name, node_type, inputs, outputs, custom_data),
+        ...], into a HeadlessGraph and validates it in full. database_connection_kwargs are passed to every query the
+        graph and its nodes run.
+        Returns
+        -------
+        dict: {'workflow_id': int, 'node_count': int, 'valid': bool, 'error': validation error message or None}
+    """
+    graph = HeadlessGraph(
+        account_id=account_id,
+        workflow_category_id=workflow_category_id,
+        workflow_id=workflow_id,
+        database_connection_kwargs=database_connection_kwargs
+    )
+    graph.node_catalog = node_catalog
+
+    validation_result = {'workflow_id': workflow_id, 'node_count': len(node_rows), 'valid': True, 'error': None}
+    try:
+        node_records = {object_id: graph.parse_node_row(*node_row) for object_id, *node_row in node_rows}
+        graph.load_graph_from_records(node_records)
+        graph.validate_graph(full=True)
+    except Exception as exception:
+        # Rows that can't be loaded (unknown node types, dangling connections) are reported like validation errors
+        validation_result['valid'] = False
+        validation_result['error'] = str(exception) if isinstance(exception, ValueError) else repr(exception)
+    return validation_result
+
+
+def validate_workflow_chunk(account_id, workflow_category_id, node_catalog, api_endpoints, workflow_chunk):
+    """
+        Runs validate_workflow on [(workflow_id, workflow_version, node_rows), ...], all from one workflow category,
+        giving each workflow a copy of node_catalog with its API data filled in, and node_catalog's connection. This is
+        what the worker processes run.
+    """
+    validation_results = []
+    for workflow_id, workflow_version, node_rows in workflow_chunk:
+        workflow_catalog = node_catalog.copy_for_workflow(workflow_id)
+        for node_type, node_type_endpoints in api_endpoints.items():
+            workflow_catalog.set_api_data(node_type, workflow_version, list(node_type_endpoints))
+        validation_results.append(
+            validate_workflow(
+                account_id,
+                workflow_category_id,
+                workflow_id,
+                node_rows,
+                workflow_catalog,
+                node_catalog.database_connection_kwargs
+            )
+        )
+    return validation_results
+
+
+def validate_account_workflows(
+    account_id, processes=None, chunk_size=VALIDATION_CHUNK_SIZE, database_connection_kwargs=None
+):
+    """
+        Validates every active workflow of the account across a pool of processes (os.cpu_count() if processes is
+        None; 1 validates in this process). Workflows and their nodes are fetched in one query each, and templates
+        once per workflow category, before any validation starts, so the workers don't query the database.
+        database_connection_kwargs (empty for the database_connector defaults) are passed to every query, in this
+        process and the workers.
+        Returns
+        -------
+        dict: {
+            'account_id': int,
+            'workflows': {workflow_id: {'name': str, 'node_count': int, 'valid': bool, 'error': str or None}},
+            'workflow_count': int,
+            'invalid_count': int,
+            'seconds': float,
+            'workflows_per_second': float
+        }
+    """
+    start_time = perf_counter()
+
+    workflows = fetch_account_workflows(account_id, database_connection_kwargs)
+    account_node_rows = fetch_account_node_rows(account_id, database_connection_kwargs)
+    workflow_versions, api_endpoints = get_api_data(account_node_rows)
+
+    node_rows = {}
+    for workflow_id, _, *node_row in account_node_rows:
+        node_rows.setdefault(workflow_id, []).append(node_row)
+
+    node_catalogs = {}
+    validation_jobs = []
+    for workflow_category_id in sorted({i[2] for i in workflows}):
+        node_catalog = NodeCatalog(account_id, workflow_category_id, None, database_connection_kwargs)
+        node_catalog.fetch_templates()
+        if node_catalogs:
+            node_catalog.account_workflows = next(iter(node_catalogs.values())).account_workflows
+        else:
+            node_catalog.fetch_account_workflows()
+        node_catalogs[workflow_category_id] = node_catalog
+
+        category_workflows = [
+            (i[0], workflow_versions.get(i[0], 1), node_rows.get(i[0], []))
+            for i in workflows if i[2] == workflow_category_id
+        ]
+        for chunk_start in range(0, len(category_workflows), chunk_size):
+            workflow_chunk = category_workflows[chunk_start:chunk_start + chunk_size]
+            validation_jobs.append((account_id, workflow_category_id, node_catalog, api_endpoints, workflow_chunk))
+
+    processes = processes or os.cpu_count()
+    if processes == 1 or len(validation_jobs) <= 1:
+        validation_results = [validate_workflow_chunk(*i) for i in validation_jobs]
+    else:
+        # Pooled connections can't be shared with forked processes, so each worker starts with an empty engine registry
+        with ProcessPoolExecutor(max_workers=processes, initializer=dispose_engines) as executor:
+            validation_results = list(executor.map(validate_workflow_chunk, *zip(*validation_jobs)))
+
+    workflow_names = {i[0]: i[1] for i in workflows}
+    workflow_results = {}
+    for validation_result in (i for chunk_results in validation_results for i in chunk_results):
+        workflow_id = validation_result.pop('workflow_id')
+        workflow_results[workflow_id] = {'name': workflow_names[workflow_id], **validation_result}
+
+    total_seconds = perf_counter() - start_time
+    return {
+        'account_id': account_id,
+        'workflows': workflow_results,
+        'workflow_count': len(workflow_results),
+        'invalid_count': sum(1 for i in workflow_results.values() if not i['valid']),
+        'seconds': total_seconds,
+        'workflows_per_second': len(workflow_results) / total_seconds if total_seconds else 0.0
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-a', '--account-id', dest='account_id', type=int, required=True)
+    parser.add_argument('-p', '--processes', dest='processes', type=int, default=None)
+    parser.add_argument('-c', '--chunk-size', dest='chunk_size', type=int, default=VALIDATION_CHUNK_SIZE)
+    parser.add_argument('--database-connection-type', default=DEFAULT_CONNECTION_TYPE, choices=['postgres', 'sqlite'])
+    parser.add_argument('--database', default=DATABASE)
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--username', default=USERNAME)
+    parser.add_argument('--password', default=PASSWORD)
+    args = parser.parse_args()
+
+    database_connection_kwargs = {
+        'database_connection_type': args.database_connection_type,
+        'database': args.database,
+        'host': args.host,
+        'password': args.password,
+        'port': args.port,
+        'username': args.username
+    }
+    report = validate_account_workflows(
+        args.account_id,
+        processes=args.processes,
+        chunk_size=args.chunk_size,
+        database_connection_kwargs=database_connection_kwargs
+    )
+    for workflow_id, workflow_result in report['workflows'].items():
+        status = 'ok' if workflow_result['valid'] else 'INVALID'
+        print(f"{workflow_id:>8}  {status:<8}{workflow_result['node_count']:>6} nodes  {workflow_result['name']}")
+        if workflow_result['error']:
+            for error_line in workflow_result['error'].splitlines():
+                if error_line.strip():
+                    print(f'              {error_line.strip()}')
+    print(
+        f"\n{report['workflow_count']:,} workflows, {report['invalid_count']:,} invalid, in {report['seconds']:.3f}s "
+        f"({report['workflows_per_second']:,.1f} workflows/sec)"
+    )
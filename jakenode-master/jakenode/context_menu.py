@@ -161,7 +161,7 @@ class graph_modifier():
         Prompts a file save dialog to serialize a session if required.
         """
         try:
-            graph.validate_graph()
+            graph.validate_graph(full=True)
             current = graph.current_session()
             if current:
                 graph.save_session(current)
@@ -423,10 +423,17 @@ class graph_modifier():
 
     def save_to_database(self, graph):
         try:
-            graph.validate_graph()
-            graph.save_graph_to_database()
+            graph.validate_graph(full=True)
+            save_stats = graph.save_graph_to_database()
+            msg = 'Save Successful!'
+            if save_stats and save_stats['unchanged']:
+                msg = f"No changes since version {save_stats['workflow_version']}; nothing was saved."
+            elif save_stats:
+                msg += f"\n\nVersion {save_stats['workflow_version']}: {save_stats['nodes_added']} added, "
+                msg += f"{save_stats['nodes_changed']} changed, {save_stats['nodes_removed']} removed "
+                msg += f"({save_stats['rows_written']} rows written)."
             viewer = graph.viewer()
-            viewer.message_dialog('Save Successful!', title='Workflow Saved')
+            viewer.message_dialog(msg, title='Workflow Saved')
         except ValueError as e:
             msg = "Changes could not be saved.\n\n"
             msg += str(e)
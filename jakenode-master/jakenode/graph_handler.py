@@ -1,28 +1,89 @@
+import atexit
+from contextlib import contextmanager
 from datetime import datetime
+import hashlib
 from itertools import chain
 import json
+import logging
+import threading
+import weakref
 
 from jakenode import node_handler
 from jakenode.context_menu import build_context_menu
+from jakenode.graph_index import GraphIndex
+from jakenode.node_catalog import NodeCatalog
 from NodeGraphQt import NodeGraph
 from NodeGraphQt.constants import ViewerEnum
-from shinewave_webapp.database_connector import run_query
+from shinewave_webapp.database_connector import run_query, transaction
+from shinewave_webapp.schema_migrations import check_versioning_schema
+
+
+# Retired workflow_nodes rows are deactivated in batches of this many ids, to stay under bound-parameter limits
+RETIRE_CHUNK_SIZE = 500
+
+# Node selections, property changes and node creation are recorded in memory, and written to
+# workflow_routes.last_activity by a background thread at most once per this many seconds
+ACTIVITY_FLUSH_SECONDS = 30
+
+# get_paths refuses graphs with more root-to-leaf paths than this; iter_paths streams them instead
+MAX_PATHS = 10000
+
+logger = logging.getLogger(__name__)
+
+# GraphHandlers whose activity heartbeat has started, so that any unflushed activity is written at exit
+_heartbeat_graph_handlers = weakref.WeakSet()
+
+
+def stop_activity_heartbeats():
+    for graph_handler in list(_heartbeat_graph_handlers):
+        graph_handler.stop_activity_heartbeat()
+
+
+atexit.register(stop_activity_heartbeats)
 
 
 class GraphHandler(NodeGraph):
 
     def __init__(
-        self, queue=None, socketio=None, parent=None, account_id=None, workflow_category_id=None, workflow_id=None
+        self,
+        queue=None,
+        socketio=None,
+        parent=None,
+        account_id=None,
+        workflow_category_id=None,
+        workflow_id=None,
+        activity_flush_seconds=ACTIVITY_FLUSH_SECONDS,
+        database_connection_kwargs=None
     ):
         self.queue = queue
         self.socketio = socketio
         self.init_time = datetime.now()
         self.display_delay_seconds = 2
+        # {NodeGraphQt node id: object_id} for nodes loaded from or saved to the database
+        self.persisted_object_ids = {}
+        # Set for the duration of graph_load_context, and shared by every node created meanwhile
+        self.node_catalog = None
+        # Passed to every query the graph and its nodes run, e.g. {'database_connection_type': 'sqlite', 'database':
+        # path}; empty for the database_connector defaults
+        self.database_connection_kwargs = database_connection_kwargs or {}
+        # (account_id, workflow_id, activity time) not yet written to workflow_routes
+        self.pending_activity = None
+        self.activity_lock = threading.Lock()
+        self.activity_flush_seconds = activity_flush_seconds
+        self.activity_stopped = threading.Event()
+        self.activity_thread = None
         super(GraphHandler, self).__init__(parent)
+        self.graph_index = GraphIndex(self)
+        # {node id: validation error, or None if valid} from the last validate_nodes, and the nodes changed since
+        self.validation_results = {}
+        self.dirty_validation_ids = set()
+        self.validated_index_rebuild_count = None
 
         # wire signal.
         self.node_selection_changed.connect(self.handle_node_selected)
         self.property_changed.connect(self.handle_property_change)
+        self.port_connected.connect(self.handle_connection_change)
+        self.port_disconnected.connect(self.handle_connection_change)
         self.set_account_properties(
             account_id=account_id, workflow_category_id=workflow_category_id, workflow_id=workflow_id
         )
@@ -35,18 +96,79 @@ class GraphHandler(NodeGraph):
         build_context_menu(self)
 
     def update_workflow_activity(self):
-        if self.account_id and self.workflow_id:
+        """
+            Records activity on the workflow. This only stamps the time in memory; the background thread started here
+            writes the latest stamp to the database (see flush_workflow_activity). Once the heartbeat has been
+            stopped, the stamp is written straight away instead.
+        """
+        if not (self.account_id and self.workflow_id):
+            return
+
+        with self.activity_lock:
+            self.pending_activity = (self.account_id, self.workflow_id, datetime.now())
+            heartbeat_stopped = self.activity_stopped.is_set()
+            if self.activity_thread is None and not heartbeat_stopped:
+                self.activity_thread = threading.Thread(target=self.run_activity_heartbeat, daemon=True)
+                self.activity_thread.start()
+                _heartbeat_graph_handlers.add(self)
+
+        if heartbeat_stopped:
+            try:
+                self.flush_workflow_activity()
+            except Exception:
+                logger.exception('Could not record workflow activity; retrying at the next activity.')
+
+    def flush_workflow_activity(self):
+        """
+            Writes the latest recorded activity, if any, to workflow_routes.last_activity. If the write fails, the
+            activity is kept for the next flush unless newer activity was recorded in the meantime.
+        """
+        with self.activity_lock:
+            pending_activity = self.pending_activity
+            self.pending_activity = None
+
+        if pending_activity is None:
+            return
+
+        account_id, workflow_id, last_activity = pending_activity
+        try:
             run_query(
                 """
-                    UPDATE workflow_routes SET last_activity = NOW()::timestamp
+                    UPDATE workflow_routes SET last_activity = ?
                     WHERE
                         account_id = ?
                         AND workflow_id = ?
                         AND active = 'TRUE'
                 """,
-                sql_parameters=[self.account_id, self.workflow_id],
-                commit=True
+                sql_parameters=[last_activity, account_id, workflow_id],
+                commit=True,
+                **self.database_connection_kwargs
             )
+        except Exception:
+            with self.activity_lock:
+                if self.pending_activity is None:
+                    self.pending_activity = pending_activity
+            raise
+
+    def run_activity_heartbeat(self):
+        while not self.activity_stopped.wait(self.activity_flush_seconds):
+            try:
+                self.flush_workflow_activity()
+            except Exception:
+                logger.exception('Could not record workflow activity; retrying at the next flush.')
+
+    def stop_activity_heartbeat(self):
+        """
+            Stops the background thread and writes any activity it hadn't flushed yet. Run at exit for every graph
+            whose thread started; safe to call more than once.
+        """
+        self.activity_stopped.set()
+        _heartbeat_graph_handlers.discard(self)
+        with self.activity_lock:
+            activity_thread = self.activity_thread
+        if activity_thread is not None and activity_thread is not threading.current_thread():
+            activity_thread.join()
+        self.flush_workflow_activity()
 
     def handle_node_selected(self, node):
         self.update_workflow_activity()
@@ -57,10 +179,23 @@ class GraphHandler(NodeGraph):
 
     def handle_property_change(self, node):
         self.update_workflow_activity()
+        node.bump_display_revision()
+        self.dirty_validation_ids.add(node.id)
         if (datetime.now() - self.init_time).seconds > self.display_delay_seconds:
             if node.view.isSelected():
                 self.display_node_info(node)
 
+    def handle_connection_change(self, input_port, output_port):
+        """
+            A connection decides whether the nodes below it have an upstream trigger and whether the nodes above it
+            have a downstream outreach node, so both sides are marked for re-validation.
+        """
+        input_node = input_port.node()
+        output_node = output_port.node()
+        self.dirty_validation_ids.update([input_node.id, output_node.id])
+        self.dirty_validation_ids.update(i.id for i in self.graph_index.get_node_chain(input_node, 'downstream'))
+        self.dirty_validation_ids.update(i.id for i in self.graph_index.get_node_chain(output_node, 'upstream'))
+
     def display_node_info(self, node):
         title, description = node_handler.fetch_node_display_info(node)
         if self.socketio is not None:
@@ -74,10 +209,31 @@ class GraphHandler(NodeGraph):
             print(title, description)
 
     def set_account_properties(self, account_id, workflow_category_id, workflow_id):
+        if self.pending_activity is not None:
+            self.flush_workflow_activity()
         self.account_id = account_id
         self.workflow_category_id = workflow_category_id
         self.workflow_id = workflow_id
 
+    @contextmanager
+    def graph_load_context(self):
+        """
+            Shares one NodeCatalog between all nodes created inside the block, so that loading a graph fetches each
+            kind of template data once instead of once per node. The catalog is dropped afterwards, so nodes added
+            later by hand see current data.
+        """
+        if self.node_catalog is not None:
+            yield self.node_catalog
+            return
+
+        self.node_catalog = NodeCatalog(
+            self.account_id, self.workflow_category_id, self.workflow_id, self.database_connection_kwargs
+        )
+        try:
+            yield self.node_catalog
+        finally:
+            self.node_catalog = None
+
     def create_node(
         self,
         node_type,
@@ -105,12 +261,78 @@ class GraphHandler(NodeGraph):
         node.set_account_id(account_id=self.account_id)
         node.set_workflow_category_id(workflow_category_id=self.workflow_category_id)
         node.set_workflow_id(workflow_id=self.workflow_id)
+        node.set_database_connection_kwargs(self.database_connection_kwargs)
+        node.set_node_catalog(self.node_catalog)
         node.load_templates()
+        node.set_node_catalog()
 
         return node
 
-    def validate_graph(self):
+    # NodeGraphQt adds, removes and connects nodes in these without emitting the signals GraphIndex follows
+
+    def add_node(self, node, pos=None, selected=True, push_undo=True):
+        super().add_node(node, pos=pos, selected=selected, push_undo=push_undo)
+        self.graph_index.mark_stale()
+
+    def remove_node(self, node, push_undo=True):
+        super().remove_node(node, push_undo=push_undo)
+        self.graph_index.mark_stale()
+
+    def cut_nodes(self, nodes=None):
+        super().cut_nodes(nodes=nodes)
+        self.graph_index.mark_stale()
+
+    def paste_nodes(self):
+        super().paste_nodes()
+        self.graph_index.mark_stale()
+
+    def duplicate_nodes(self, nodes):
+        duplicated_nodes = super().duplicate_nodes(nodes)
+        self.graph_index.mark_stale()
+        return duplicated_nodes
+
+    def clear_session(self):
+        super().clear_session()
+        self.graph_index.mark_stale()
+
+    def validate_nodes(self, full=True):
+        """
+            Runs validate_node on every node. With full=False, only the nodes that changed (or whose connections
+            changed) since the last call are validated and the previous results are reused for the rest, unless the
+            graph was changed in a way the signals don't report (undo, paste and the like, which rebuild the graph
+            index).
+            Returns
+            -------
+            dict: {node id: validation error message, or None if the node is valid}
+        """
+        nodes = self.all_nodes()
+        self.graph_index.sync()
+        if full or self.graph_index.rebuild_count != self.validated_index_rebuild_count:
+            self.validation_results = {}
+
+        validation_results = {}
+        for node in nodes:
+            if node.id in self.validation_results and node.id not in self.dirty_validation_ids:
+                validation_results[node.id] = self.validation_results[node.id]
+                continue
+            try:
+                node.validate_node()
+                validation_results[node.id] = None
+            except ValueError as e:
+                validation_results[node.id] = str(e)
+
+        self.validation_results = validation_results
+        self.dirty_validation_ids = set()
+        self.validated_index_rebuild_count = self.graph_index.rebuild_count
+        return dict(validation_results)
+
+    def validate_graph(self, full=True):
+        """
+            Raises a ValueError listing every invalid node. Every node is validated unless full is False, in which case
+            only changed nodes are re-validated (see validate_nodes).
+        """
         validation_errors = {}
+        node_validation_results = self.validate_nodes(full=full)
 
         # Validate individual nodes, note if graph is empty
         graph_empty = True
@@ -126,10 +348,8 @@ class GraphHandler(NodeGraph):
                 unique_node_registry.setdefault(node_type, [])
                 unique_node_registry[node_type].append(node.name())
 
-            try:
-                node.validate_node()
-            except ValueError as e:
-                validation_errors[node.name()] = str(e)
+            if node_validation_results[node.id] is not None:
+                validation_errors[node.name()] = node_validation_results[node.id]
 
         # Validate that unique nodes don't have duplicates
         for node_type, node_name_list in unique_node_registry.items():
@@ -168,21 +388,22 @@ class GraphHandler(NodeGraph):
 
         prior_nodes = {}
 
-        for object_id, details in graph_dict.get('nodes', {}).items():
-            node_type = details['type_']
-            node_name = details['name']
-            node_custom_properties = details['custom']
+        with self.graph_load_context():
+            for object_id, details in graph_dict.get('nodes', {}).items():
+                node_type = details['type_']
+                node_name = details['name']
+                node_custom_properties = details['custom']
 
-            node = self.create_node(node_type=node_type, name=node_name)
+                node = self.create_node(node_type=node_type, name=node_name)
 
-            node.allow_forced_template_id_changes = False
-            for prop_name, prop_value in node_custom_properties.items():
-                node.safe_set_property(prop_name, prop_value)
+                node.allow_forced_template_id_changes = False
+                for prop_name, prop_value in node_custom_properties.items():
+                    node.safe_set_property(prop_name, prop_value)
 
-            node.set_template_name_from_id()
-            node.allow_forced_template_id_changes = True
+                node.set_template_name_from_id()
+                node.allow_forced_template_id_changes = True
 
-            prior_nodes[object_id] = node
+                prior_nodes[object_id] = node
 
         for details in graph_dict.get('connections', []):
             port_object_id, port_type = details['in']
@@ -204,6 +425,84 @@ class GraphHandler(NodeGraph):
 
         return json.dumps(blank_json)
 
+    def get_object_id(self, node):
+        """
+            Returns the object_id that a node is persisted under. Nodes loaded from the database keep the object_id
+            they were saved with (NodeGraphQt assigns fresh ids on every load), so that saves can be diffed against
+            the stored rows; new nodes use their NodeGraphQt id.
+        """
+        return self.persisted_object_ids.get(node.id, node.id)
+
+    def assign_object_ids(self, nodes):
+        """
+            Returns {node.id: object_id} for the given nodes. A new node whose NodeGraphQt id happens to match a
+            persisted object_id (ids are memory addresses, so can recur between sessions) gets a suffixed one instead.
+        """
+        object_ids = {}
+        taken_object_ids = set(self.persisted_object_ids.values())
+
+        for node in nodes:
+            if node.id in self.persisted_object_ids:
+                object_ids[node.id] = self.persisted_object_ids[node.id]
+                continue
+            object_id = node.id
+            suffix = 0
+            while object_id in taken_object_ids:
+                suffix += 1
+                object_id = f'{node.id}-{suffix}'
+            object_ids[node.id] = object_id
+            taken_object_ids.add(object_id)
+
+        return object_ids
+
+    def get_node_records(self, nodes, object_ids):
+        """
+            Returns {object_id: {'name', 'node_type', 'inputs', 'outputs', 'custom_data'}} for the given nodes, with
+            connections listed as sorted object_ids. This is the form that saves are compared in.
+        """
+        node_records = {}
+        for node in nodes:
+            node.set_template_id_from_name()
+            node_properties = node.properties()
+            connected_inputs = chain(*node.connected_input_nodes().values())
+            connected_outputs = chain(*node.connected_output_nodes().values())
+            node_records[object_ids[node.id]] = {
+                'name': node_properties.get('name'),
+                'node_type': node_properties.get('type_'),
+                'inputs': sorted(object_ids[i.id] for i in connected_inputs),
+                'outputs': sorted(object_ids[i.id] for i in connected_outputs),
+                'custom_data': node_properties.get('custom') or {}
+            }
+        return node_records
+
+    def parse_node_row(self, name, node_type, inputs, outputs, custom_data):
+        """
+            Converts a stored workflow_nodes row into the form returned by get_node_records.
+        """
+        return {
+            'name': name,
+            'node_type': node_type,
+            'inputs': sorted(json.loads(inputs)) if inputs else [],
+            'outputs': sorted(json.loads(outputs)) if outputs else [],
+            'custom_data': json.loads(custom_data) if custom_data else {}
+        }
+
+    def serialize_graph(self, node_records=None):
+        """
+            Returns a canonical JSON serialization of the graph: nodes keyed by object_id, connections as sorted
+            object_id lists, and keys sorted at every level, so that the same graph always serializes to the same
+            string regardless of the order nodes were created or connected in.
+        """
+        if node_records is None:
+            nodes = self.all_nodes()
+            node_records = self.get_node_records(nodes, self.assign_object_ids(nodes))
+        return json.dumps({'nodes': node_records}, sort_keys=True, separators=(',', ':'))
+
+    def get_graph_hash(self, serialized_graph=None):
+        if serialized_graph is None:
+            serialized_graph = self.serialize_graph()
+        return hashlib.sha256(serialized_graph.encode()).hexdigest()
+
     def save_graph_to_database(self):
         """
             Allows for saving directly to a SQL database, rather than the built-in behavior of saving to a JSON. Assumes
@@ -218,169 +517,361 @@ class GraphHandler(NodeGraph):
                 outputs: TEXT
                 custom_data: TEXT
                 active: TEXT
+                retired_version: INTEGER
+            and a table named 'workflow_versions' with one row per saved version, holding the version's canonical
+            serialization (snapshot) and its hash (content_hash). A database without them raises a ValueError naming
+            the migrate command (see schema_migrations.check_versioning_schema) before anything is read or written.
+
+            A graph whose hash matches the latest version's, or whose nodes all match the active rows (as for a
+            workflow saved before versions were recorded, which has no hash to compare), is not saved again: nothing is
+            written, and the latest version number is returned with 'unchanged' set to True.
+
+            The save is differential: the live graph is compared with the active rows by object_id, and only added,
+            changed and removed nodes are written. Changed and removed rows are retired (active = 'FALSE',
+            retired_version = the new version), and added and changed nodes get new rows at the new version, so that
+            version N is every row with workflow_version <= N that wasn't retired by version N.
+            Returns
+            -------
+            dict: {
+                'workflow_version': int,
+                'unchanged': bool,
+                'nodes_added': int,
+                'nodes_changed': int,
+                'nodes_removed': int,
+                'nodes_unchanged': int,
+                'rows_written': int
+            }
         """
         if self.workflow_id is None:
             raise AttributeError('workflow_id has not been set.')
 
-        max_id = run_query(
-            """
-                SELECT
-                    COALESCE(MAX(id), 0) as max_id
-                FROM workflow_nodes
-            """,
-            return_data_format=dict
-        )
-        current_id = max_id['max_id'][0]
-
-        max_version = run_query(
-            """
-                SELECT
-                    COALESCE(MAX(workflow_version), 0) as max_version
-                FROM workflow_nodes
-                WHERE workflow_id = ?
-            """,
-            sql_parameters=[self.workflow_id],
-            return_data_format=dict
-        )
-        workflow_version = max_version['max_version'][0] + 1
-
-        node_property_aliases = {'object_id': 'id', 'node_type': 'type_', 'custom_data': 'custom', 'name': 'name'}
-        node_methods = {'inputs': 'connected_input_nodes', 'outputs': 'connected_output_nodes'}
-        fixed_columns = {'workflow_id': self.workflow_id, 'workflow_version': workflow_version, 'active': 'TRUE'}
-        data_columns = list(chain(node_property_aliases, node_methods, fixed_columns))
-        data_columns += ['id']
-        data_rows = []
-
-        for node in self.all_nodes():
-            node.set_template_id_from_name()
-            current_row = []
-            current_id += 1
-            node_properties = node.properties()
-            for column_name in data_columns:
-                if column_name in node_property_aliases:
-                    alias = node_property_aliases[column_name]
-                    property_value = node_properties.get(alias)
-                elif column_name in node_methods:
-                    connected_node_method = getattr(node, node_methods[column_name])
-                    connected_nodes = connected_node_method()
-                    connected_nodes = chain(*connected_nodes.values())
-                    property_value = [i.get_property('id') for i in connected_nodes]
-                elif column_name in fixed_columns:
-                    property_value = fixed_columns[column_name]
-                elif column_name == 'id':
-                    property_value = current_id
-                else:
-                    property_value = None
-
-                if type(property_value) in (dict, list):
-                    property_value = json.dumps(property_value)
-
-                current_row.append(property_value)
-            data_rows.append(current_row)
-
-        if not data_rows:
+        nodes = self.all_nodes()
+        if not nodes:
             return None
 
-        insert_parameters = []
-        data_placeholder = ['?'] * len(data_columns)
-        data_placeholder = ', '.join(data_placeholder)
-        data_placeholder = f'\n({data_placeholder}),'
-        data_columns_text = ', '.join(data_columns)
-        insert_statement = f'INSERT INTO workflow_nodes ({data_columns_text}) VALUES'
-        for row in data_rows:
-            insert_statement += data_placeholder
-            insert_parameters += row
-        insert_statement = insert_statement[:-1]
-
-        run_query(
-            """
-                UPDATE workflow_nodes
-                SET active = 'FALSE'
-                WHERE workflow_id = ?
-            """,
-            sql_parameters=[self.workflow_id],
-            commit=True
-        )
-        run_query(insert_statement, sql_parameters=insert_parameters, commit=True)
+        object_ids = self.assign_object_ids(nodes)
+        node_records = self.get_node_records(nodes, object_ids)
+        snapshot = self.serialize_graph(node_records)
+        content_hash = self.get_graph_hash(snapshot)
 
-    def load_graph_from_database(self):
-        if self.workflow_id is None:
-            raise AttributeError('workflow_id has not been set.')
+        with transaction(**self.database_connection_kwargs) as tx:
+            check_versioning_schema(self.database_connection_kwargs, tx)
+            latest_version = tx.run_query(
+                """
+                    SELECT workflow_version, content_hash
+                    FROM workflow_versions
+                    WHERE workflow_id = ?
+                    ORDER BY workflow_version DESC
+                    LIMIT 1
+                """,
+                sql_parameters=[self.workflow_id]
+            )
+            unchanged_stats = {
+                'unchanged': True,
+                'nodes_added': 0,
+                'nodes_changed': 0,
+                'nodes_removed': 0,
+                'nodes_unchanged': len(node_records),
+                'rows_written': 0
+            }
+            if latest_version and latest_version[0][1] == content_hash:
+                self.persisted_object_ids = object_ids
+                return {'workflow_version': latest_version[0][0], **unchanged_stats}
+
+            persisted_rows = tx.run_query(
+                """
+                    SELECT id, object_id, name, node_type, inputs, outputs, custom_data
+                    FROM workflow_nodes
+                    WHERE
+                        workflow_id = ?
+                        AND active = 'TRUE'
+                """,
+                sql_parameters=[self.workflow_id]
+            )
+            persisted_row_ids = {}
+            persisted_records = {}
+            for row_id, object_id, *node_row in persisted_rows:
+                persisted_row_ids[object_id] = row_id
+                persisted_records[object_id] = self.parse_node_row(*node_row)
 
-        node_data = run_query(
-            """
-                SELECT
-                    object_id,
-                    node_type,
-                    name,
-                    inputs,
-                    outputs,
-                    custom_data
-                FROM workflow_nodes
-                WHERE
-                    workflow_id = ?
-                    AND active = 'TRUE'
-            """,
-            sql_parameters=[self.workflow_id],
-            return_data_format=list
-        )
+            added = [i for i in node_records if i not in persisted_records]
+            changed = [i for i in node_records if i in persisted_records and node_records[i] != persisted_records[i]]
+            removed = [i for i in persisted_records if i not in node_records]
 
-        prior_nodes = {}
-        all_inputs = {}
+            max_version = tx.run_query(
+                """
+                    SELECT COALESCE(MAX(workflow_version), 0) AS max_version
+                    FROM (
+                        SELECT workflow_version FROM workflow_nodes WHERE workflow_id = ?
+                        UNION ALL
+                        SELECT workflow_version FROM workflow_versions WHERE workflow_id = ?
+                    ) v
+                """,
+                sql_parameters=[self.workflow_id, self.workflow_id],
+                return_data_format=dict
+            )
+            if not (added or changed or removed):
+                self.persisted_object_ids = object_ids
+                return {'workflow_version': max_version['max_version'][0], **unchanged_stats}
+            workflow_version = max_version['max_version'][0] + 1
+
+            retired_row_ids = [persisted_row_ids[i] for i in changed + removed]
+            for chunk_start in range(0, len(retired_row_ids), RETIRE_CHUNK_SIZE):
+                retired_chunk = retired_row_ids[chunk_start:chunk_start + RETIRE_CHUNK_SIZE]
+                tx.run_query(
+                    f"""
+                        UPDATE workflow_nodes
+                        SET
+                            active = 'FALSE',
+                            retired_version = ?
+                        WHERE id IN ({', '.join(['?'] * len(retired_chunk))})
+                    """,
+                    sql_parameters=[workflow_version] + retired_chunk
+                )
+
+            written_object_ids = added + changed
+            # One round-trip reserves an ID for every written node
+            allocated_ids = iter(tx.allocate_ids('workflow_nodes', len(written_object_ids)))
+
+            data_columns = [
+                'id', 'workflow_id', 'workflow_version', 'object_id', 'name', 'node_type', 'inputs', 'outputs',
+                'custom_data', 'active'
+            ]
+            data_rows = []
+            for object_id in written_object_ids:
+                node_record = node_records[object_id]
+                data_rows.append([
+                    next(allocated_ids),
+                    self.workflow_id,
+                    workflow_version,
+                    object_id,
+                    node_record['name'],
+                    node_record['node_type'],
+                    json.dumps(node_record['inputs']),
+                    json.dumps(node_record['outputs']),
+                    json.dumps(node_record['custom_data']),
+                    'TRUE'
+                ])
+            if data_rows:
+                tx.bulk_insert('workflow_nodes', data_columns, data_rows)
+
+            save_stats = {
+                'workflow_version': workflow_version,
+                'unchanged': False,
+                'nodes_added': len(added),
+                'nodes_changed': len(changed),
+                'nodes_removed': len(removed),
+                'nodes_unchanged': len(node_records) - len(added) - len(changed),
+                'rows_written': len(data_rows) + len(retired_row_ids)
+            }
+
+            tx.run_query(
+                """
+                    INSERT INTO workflow_versions (
+                        id,
+                        workflow_id,
+                        workflow_version,
+                        nodes_added,
+                        nodes_changed,
+                        nodes_removed,
+                        rows_written,
+                        saved_at,
+                        content_hash,
+                        snapshot
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                sql_parameters=[
+                    tx.allocate_ids('workflow_versions', 1)[0],
+                    self.workflow_id,
+                    workflow_version,
+                    save_stats['nodes_added'],
+                    save_stats['nodes_changed'],
+                    save_stats['nodes_removed'],
+                    save_stats['rows_written'],
+                    str(datetime.now()),
+                    content_hash,
+                    snapshot
+                ]
+            )
 
-        for object_id, node_type, node_name, inputs, outputs, node_custom_properties in node_data:
+        self.persisted_object_ids = object_ids
+        return save_stats
 
-            inputs = json.loads(inputs)
-            outputs = json.loads(outputs)
-            if node_custom_properties:
-                node_custom_properties = json.loads(node_custom_properties)
-            else:
-                node_custom_properties = {}
+    def load_graph_from_records(self, node_records):
+        """
+            Builds nodes and connections from {object_id: {'name', 'node_type', 'inputs', 'custom_data', ...}}, the
+            form returned by get_node_records, parse_node_row and stored in version snapshots.
+        """
+        prior_nodes = {}
 
-            node = self.create_node(node_type=node_type, name=node_name)
+        with self.graph_load_context():
+            for object_id, node_record in node_records.items():
+                node = self.create_node(node_type=node_record['node_type'], name=node_record['name'])
 
-            node.allow_forced_template_id_changes = False
-            for prop_name, prop_value in node_custom_properties.items():
-                node.safe_set_property(prop_name, prop_value)
+                node.allow_forced_template_id_changes = False
+                for prop_name, prop_value in node_record['custom_data'].items():
+                    node.safe_set_property(prop_name, prop_value)
 
-            node.set_template_name_from_id()
-            node.allow_forced_template_id_changes = True
+                node.set_template_name_from_id()
+                node.allow_forced_template_id_changes = True
 
-            prior_nodes[object_id] = node
-            all_inputs[object_id] = inputs
+                prior_nodes[object_id] = node
+                self.persisted_object_ids[node.id] = object_id
 
-        for object_id, input_object_list in all_inputs.items():
+        for object_id, node_record in node_records.items():
             node = prior_nodes[object_id]
-            for input_object_id in input_object_list:
+            for input_object_id in node_record['inputs']:
                 upstream_node = prior_nodes[input_object_id]
                 node.set_input(0, upstream_node.output(0))
 
+    def load_graph_from_database(self, workflow_version=None):
+        """
+            Loads the workflow's active nodes or, if workflow_version is given, that version. A version saved with a
+            snapshot is loaded from its snapshot in a single fetch; older versions are re-assembled from the rows that
+            were live at that version.
+
+            Saves from before retired_version existed rewrote every node at each version and only deactivated the
+            previous rows, so an inactive row with no retired_version was live at its own version only.
+        """
+        if self.workflow_id is None:
+            raise AttributeError('workflow_id has not been set.')
+
+        if workflow_version is not None:
+            check_versioning_schema(self.database_connection_kwargs)
+            snapshot = run_query(
+                """
+                    SELECT snapshot
+                    FROM workflow_versions
+                    WHERE
+                        workflow_id = ?
+                        AND workflow_version = ?
+                        AND snapshot IS NOT NULL
+                """,
+                sql_parameters=[self.workflow_id, workflow_version],
+                **self.database_connection_kwargs
+            )
+            if snapshot:
+                return self.load_graph_from_records(json.loads(snapshot[0][0])['nodes'])
+
+            node_data = run_query(
+                """
+                    SELECT object_id, name, node_type, inputs, outputs, custom_data
+                    FROM workflow_nodes
+                    WHERE
+                        workflow_id = ?
+                        AND workflow_version <= ?
+                        AND (
+                            retired_version > ?
+                            OR (
+                                retired_version IS NULL
+                                AND (active = 'TRUE' OR workflow_version = ?)
+                            )
+                        )
+                    ORDER BY workflow_version, id
+                """,
+                sql_parameters=[self.workflow_id, workflow_version, workflow_version, workflow_version],
+                **self.database_connection_kwargs
+            )
+        else:
+            node_data = run_query(
+                """
+                    SELECT object_id, name, node_type, inputs, outputs, custom_data
+                    FROM workflow_nodes
+                    WHERE
+                        workflow_id = ?
+                        AND active = 'TRUE'
+                """,
+                sql_parameters=[self.workflow_id],
+                **self.database_connection_kwargs
+            )
+
+        node_records = {object_id: self.parse_node_row(*node_row) for object_id, *node_row in node_data}
+        self.load_graph_from_records(node_records)
+
     def get_entry_points(self):
-        entry_points = []
-        for node in self.all_nodes():
-            if not node.connected_input_nodes():
-                entry_points.append(node)
-        return entry_points
-
-    def get_paths(self):
-        def _get_paths(explored_paths, unexplored_paths):
-            if unexplored_paths:
-                current_path = unexplored_paths.pop(0)
-                current_node = current_path[-1]
-                output_nodes = current_node.connected_output_nodes().values()
-                children = list(chain(*output_nodes))
-                if children:
-                    for child in children:
-                        unexplored_paths.append(current_path + [child])
-                    current_path = []
-                else:
-                    explored_paths.append(current_path)
-                    current_path = []
-            if unexplored_paths:
-                return _get_paths(explored_paths, unexplored_paths)
-            else:
-                return explored_paths
-
-        entry_points = self.get_entry_points()
-        
-        return _get_paths([], [entry_points])
+        return self.graph_index.get_entry_points()
+
+    def iter_paths(self, max_paths=None):
+        """
+            Yields every path through the graph (a list of nodes, from an entry point to a node without outputs) one
+            at a time, depth first, stopping after max_paths paths if given. Memory is bounded by the longest path
+            rather than by the number of paths. A connection back onto the current path is skipped, so a cycle can't
+            loop forever.
+        """
+        graph_index = self.graph_index
+        path_count = 0
+
+        for entry_point in self.get_entry_points():
+            if max_paths is not None and path_count >= max_paths:
+                return
+
+            if not graph_index.get_out_degree(entry_point):
+                path_count += 1
+                yield [entry_point]
+                continue
+
+            current_path = [entry_point]
+            path_node_ids = {entry_point.id}
+            unexplored_children = [iter(graph_index.get_children(entry_point))]
+
+            while unexplored_children:
+                child = next(unexplored_children[-1], None)
+                if child is None:
+                    unexplored_children.pop()
+                    path_node_ids.discard(current_path.pop().id)
+                    continue
+                if child.id in path_node_ids:
+                    continue
+
+                current_path.append(child)
+                path_node_ids.add(child.id)
+                if graph_index.get_out_degree(child):
+                    unexplored_children.append(iter(graph_index.get_children(child)))
+                    continue
+
+                path_count += 1
+                yield list(current_path)
+                if max_paths is not None and path_count >= max_paths:
+                    return
+                path_node_ids.discard(current_path.pop().id)
+
+    def count_paths(self):
+        """
+            Counts the paths that iter_paths would yield without building them, in O(nodes + connections): walking the
+            nodes in reverse topological order, a node's count is 1 if it has no outputs, or else the sum of its
+            children's counts. Raises a ValueError if the graph contains a cycle.
+        """
+        graph_index = self.graph_index
+        path_counts = {}
+        for node in reversed(graph_index.get_topological_order()):
+            children = graph_index.get_children(node)
+            path_counts[node.id] = sum(path_counts[child.id] for child in children) if children else 1
+
+        return sum(path_counts[node.id] for node in graph_index.get_entry_points())
+
+    def get_paths(self, max_paths=MAX_PATHS):
+        """
+            Returns the list of paths yielded by iter_paths. Raises a ValueError if there are more than max_paths
+            (None for no limit): before building any of them if count_paths can count them, or else (the graph has a
+            cycle, whose closing connections iter_paths skips) once max_paths + 1 of them have been built.
+        """
+        if max_paths is None:
+            return list(self.iter_paths())
+
+        try:
+            path_count = self.count_paths()
+        except ValueError:
+            paths = list(self.iter_paths(max_paths=max_paths + 1))
+            if len(paths) > max_paths:
+                raise ValueError(
+                    f'The graph has more than max_paths ({max_paths:,}) paths. Use iter_paths to stream them.'
+                )
+            return paths
+
+        if path_count > max_paths:
+            raise ValueError(
+                f'The graph has {path_count:,} paths, more than max_paths ({max_paths:,}). Use iter_paths to '
+                'stream them, or count_paths to count them.'
+            )
+        return list(self.iter_paths())
@@ -0,0 +1,300 @@
+from itertools import chain
+
+
+class GraphIndex():
+    """
+        Adjacency, degrees and topological order for a GraphHandler, kept as dicts of node ids so that traversals don't
+        go through NodeGraphQt's Port wrappers and get_node_by_id lookups.
+
+        The index follows the graph's node_created, nodes_deleted, port_connected and port_disconnected signals. Some
+        changes happen without those signals: undo and redo, and NodeGraphQt's paste, cut, duplicate and
+        clear_session. An undo or redo is recognized from the undo stack (its index moves while its size doesn't),
+        and GraphHandler marks the index stale around the others; a stale index is rebuilt from the node models on
+        its next read.
+
+        Graphs without signals (HeadlessGraph) pass follow_signals=False and call mark_stale themselves.
+
+        It also summarizes, for every node, which types of node lie upstream and downstream of it (see
+        has_connected_type), so that validation doesn't walk the graph once per node.
+    """
+
+    def __init__(self, graph, follow_signals=True):
+        self.graph = graph
+        # {node id: node}, in creation order
+        self.nodes = {}
+        # {node id: {child node id: None}} and {node id: {parent node id: None}}, used as insertion-ordered sets
+        self.child_ids = {}
+        self.parent_ids = {}
+        # Node ids in topological order; None until needed after a change
+        self.topological_order = None
+        self.is_stale = True
+        # Lets callers that cache results derived from the graph notice changes that were made without signals
+        self.rebuild_count = 0
+        # {node id: frozenset of the type labels (see get_type_labels) of every node upstream / downstream of it}
+        self.upstream_types = {}
+        self.downstream_types = {}
+        # Nodes whose connected component has changed since the type summaries were last computed
+        self.dirty_summary_ids = set()
+
+        self.undo_stack_state = None
+        if not follow_signals:
+            return
+
+        undo_stack = graph.undo_stack()
+        self.undo_stack_state = (undo_stack.index(), undo_stack.count())
+
+        graph.node_created.connect(self.add_node)
+        graph.nodes_deleted.connect(self.remove_nodes)
+        graph.port_connected.connect(self.add_connection)
+        graph.port_disconnected.connect(self.remove_connection)
+        undo_stack.indexChanged.connect(self.handle_undo_stack_change)
+
+    def mark_stale(self):
+        self.is_stale = True
+        self.topological_order = None
+
+    def rebuild(self):
+        self.nodes = {}
+        self.child_ids = {}
+        self.parent_ids = {}
+        for node in self.graph.all_nodes():
+            self.nodes[node.id] = node
+            self.child_ids.setdefault(node.id, {})
+            self.parent_ids.setdefault(node.id, {})
+
+        for node_id, node in self.nodes.items():
+            for port_model in node.model.outputs.values():
+                for child_id, port_names in port_model.connected_ports.items():
+                    if port_names and child_id in self.nodes:
+                        self.child_ids[node_id][child_id] = None
+                        self.parent_ids[child_id][node_id] = None
+
+        self.topological_order = None
+        self.upstream_types = {}
+        self.downstream_types = {}
+        self.dirty_summary_ids = set(self.nodes)
+        self.is_stale = False
+        self.rebuild_count += 1
+
+    def sync(self):
+        if self.is_stale:
+            self.rebuild()
+
+    # Signal handlers
+
+    def add_node(self, node):
+        if self.is_stale:
+            return
+        self.nodes[node.id] = node
+        self.child_ids.setdefault(node.id, {})
+        self.parent_ids.setdefault(node.id, {})
+        self.topological_order = None
+        self.dirty_summary_ids.add(node.id)
+
+    def remove_nodes(self, node_ids):
+        if self.is_stale:
+            return
+        for node_id in node_ids:
+            self.nodes.pop(node_id, None)
+            for child_id in self.child_ids.pop(node_id, {}):
+                self.parent_ids.get(child_id, {}).pop(node_id, None)
+                self.dirty_summary_ids.add(child_id)
+            for parent_id in self.parent_ids.pop(node_id, {}):
+                self.child_ids.get(parent_id, {}).pop(node_id, None)
+                self.dirty_summary_ids.add(parent_id)
+            self.upstream_types.pop(node_id, None)
+            self.downstream_types.pop(node_id, None)
+        self.dirty_summary_ids.difference_update(node_ids)
+        self.topological_order = None
+
+    def add_connection(self, input_port, output_port):
+        if self.is_stale:
+            return
+        parent_id = output_port.node().id
+        child_id = input_port.node().id
+        if parent_id not in self.nodes or child_id not in self.nodes:
+            self.mark_stale()
+            return
+        self.child_ids[parent_id][child_id] = None
+        self.parent_ids[child_id][parent_id] = None
+        self.topological_order = None
+        self.dirty_summary_ids.update([parent_id, child_id])
+
+    def remove_connection(self, input_port, output_port):
+        if self.is_stale:
+            return
+        parent = output_port.node()
+        child_id = input_port.node().id
+        # Another pair of ports may still connect the two nodes
+        if any(i.connected_ports.get(child_id) for i in parent.model.outputs.values()):
+            return
+        self.child_ids.get(parent.id, {}).pop(child_id, None)
+        self.parent_ids.get(child_id, {}).pop(parent.id, None)
+        self.topological_order = None
+        self.dirty_summary_ids.update([parent.id, child_id])
+
+    def handle_undo_stack_change(self, index):
+        """
+            A push grows the stack (or trims undone commands off it); an undo or redo moves the index without changing
+            its size. Undo and redo replay commands without emitting the graph's signals, so they mark the index stale.
+        """
+        try:
+            undo_stack_state = (index, self.graph.undo_stack().count())
+        except RuntimeError:
+            # Qt clears the stack, and emits this signal, while tearing the graph down
+            return
+        previous_index, previous_count = self.undo_stack_state
+        if undo_stack_state[1] == previous_count and index != previous_index:
+            self.mark_stale()
+        self.undo_stack_state = undo_stack_state
+
+    # Read API
+
+    def get_nodes(self):
+        self.sync()
+        return list(self.nodes.values())
+
+    def get_children(self, node):
+        self.sync()
+        return [self.nodes[i] for i in self.child_ids.get(node.id, ())]
+
+    def get_parents(self, node):
+        self.sync()
+        return [self.nodes[i] for i in self.parent_ids.get(node.id, ())]
+
+    def get_in_degree(self, node):
+        self.sync()
+        return len(self.parent_ids.get(node.id, ()))
+
+    def get_out_degree(self, node):
+        self.sync()
+        return len(self.child_ids.get(node.id, ()))
+
+    def get_entry_points(self):
+        """
+            Returns the nodes that have no input ports (triggers that nothing upstream can fire), in creation order.
+        """
+        self.sync()
+        return [node for node in self.nodes.values() if not node.model.inputs]
+
+    def get_topological_order(self):
+        """
+            Returns every node, parents before children. Computed once per change to the graph (Kahn's algorithm).
+            Raises a ValueError if the graph contains a cycle.
+        """
+        self.sync()
+        if self.topological_order is None:
+            input_counts = {node_id: len(parent_ids) for node_id, parent_ids in self.parent_ids.items()}
+            topological_order = [node_id for node_id, input_count in input_counts.items() if input_count == 0]
+            for node_id in topological_order:
+                for child_id in self.child_ids[node_id]:
+                    input_counts[child_id] -= 1
+                    if input_counts[child_id] == 0:
+                        topological_order.append(child_id)
+
+            if len(topological_order) < len(self.nodes):
+                raise ValueError('The graph contains a cycle, so it has no topological order.')
+            self.topological_order = topological_order
+
+        return [self.nodes[i] for i in self.topological_order]
+
+    def get_node_chain(self, node, direction):
+        """
+            Returns every node upstream or downstream of node, nearest first, excluding node itself.
+        """
+        if direction not in ('upstream', 'downstream'):
+            raise ValueError('Parameter "direction" must be either "upstream" or "downstream"')
+
+        self.sync()
+        adjacent_ids = self.parent_ids if direction == 'upstream' else self.child_ids
+        seen_ids = {node.id}
+        chain_ids = [node.id]
+        for node_id in chain_ids:
+            for adjacent_id in adjacent_ids.get(node_id, ()):
+                if adjacent_id not in seen_ids:
+                    seen_ids.add(adjacent_id)
+                    chain_ids.append(adjacent_id)
+
+        return [self.nodes[i] for i in chain_ids[1:]]
+
+    def get_type_labels(self, node):
+        """
+            Returns the labels that has_connected_type matches a node by: its type (e.g. 'nodes.outreach.SMSOutreach')
+            and its parent type (e.g. 'outreach').
+        """
+        type_labels = {node.type_}
+        node_parent_type = getattr(node, 'node_parent_type', None)
+        if node_parent_type is not None:
+            type_labels.add(node_parent_type)
+        return type_labels
+
+    def update_type_summaries(self):
+        """
+            Recomputes upstream_types and downstream_types for the connected components (ignoring direction) that hold a
+            node changed since the last call; other components keep their summaries. A component is summarized in one
+            pass each way, in topological order, each node's set being the union of its parents' (or children's) sets
+            and labels. Nodes in or below a cycle have no topological position, so they are summarized by walking the
+            graph instead.
+        """
+        self.sync()
+        if not self.dirty_summary_ids:
+            return
+
+        component_ids = [i for i in self.dirty_summary_ids if i in self.nodes]
+        seen_ids = set(component_ids)
+        for node_id in component_ids:
+            for adjacent_id in chain(self.parent_ids[node_id], self.child_ids[node_id]):
+                if adjacent_id not in seen_ids:
+                    seen_ids.add(adjacent_id)
+                    component_ids.append(adjacent_id)
+        self.dirty_summary_ids = set()
+
+        type_labels = {i: self.get_type_labels(self.nodes[i]) for i in component_ids}
+
+        input_counts = {i: len(self.parent_ids[i]) for i in component_ids}
+        topological_order = [i for i in component_ids if input_counts[i] == 0]
+        for node_id in topological_order:
+            for child_id in self.child_ids[node_id]:
+                input_counts[child_id] -= 1
+                if input_counts[child_id] == 0:
+                    topological_order.append(child_id)
+
+        for node_id in topological_order:
+            upstream_types = set()
+            for parent_id in self.parent_ids[node_id]:
+                upstream_types.update(type_labels[parent_id])
+                upstream_types.update(self.upstream_types[parent_id])
+            self.upstream_types[node_id] = frozenset(upstream_types)
+
+        for node_id in seen_ids.difference(topological_order):
+            node = self.nodes[node_id]
+            for direction, type_summaries in [('upstream', self.upstream_types), ('downstream', self.downstream_types)]:
+                connected_types = set()
+                for connected_node in self.get_node_chain(node, direction):
+                    connected_types.update(type_labels[connected_node.id])
+                type_summaries[node_id] = frozenset(connected_types)
+
+        for node_id in reversed(topological_order):
+            downstream_types = set()
+            for child_id in self.child_ids[node_id]:
+                downstream_types.update(type_labels[child_id])
+                downstream_types.update(self.downstream_types[child_id])
+            self.downstream_types[node_id] = frozenset(downstream_types)
+
+    def get_connected_types(self, node, direction):
+        """
+            Returns the type labels (see get_type_labels) of every node upstream or downstream of node.
+        """
+        if direction not in ('upstream', 'downstream'):
+            raise ValueError('Parameter "direction" must be either "upstream" or "downstream"')
+
+        self.update_type_summaries()
+        type_summaries = self.upstream_types if direction == 'upstream' else self.downstream_types
+        return type_summaries.get(node.id, frozenset())
+
+    def has_connected_type(self, node, direction, type_label):
+        """
+            Returns whether any node upstream or downstream of node has type_label as its type or parent type, e.g.
+            has_connected_type(node, 'upstream', 'trigger'). Constant time once the summaries are up to date.
+        """
+        return type_label in self.get_connected_types(node, direction)
@@ -0,0 +1,250 @@
+from NodeGraphQt import BaseNode, NodeGraph
+from NodeGraphQt.base.model import NodeModel, PortModel
+from NodeGraphQt.constants import NodePropWidgetEnum, PortTypeEnum
+from NodeGraphQt.errors import PortError, PortRegistrationError
+
+from jakenode import node_handler
+from jakenode.graph_handler import GraphHandler
+from jakenode.graph_index import GraphIndex
+
+
+"""
+    A workflow graph that needs no QApplication, viewer, widgets or QGraphicsItems, for loading, validating and saving
+    workflows outside of the node app (the Flask app, batch jobs, tests).
+
+    Usage:
+        graph = HeadlessGraph(account_id=1, workflow_category_id=1, workflow_id=1)
+        graph.load_graph_from_database()
+        graph.validate_graph()
+"""
+
+# {node class: headless node class}, built once per node class
+HEADLESS_NODE_CLASSES = {}
+
+
+class HeadlessPort():
+    """
+        Stands in for NodeGraphQt's Port, which wraps a QGraphicsItem. Connections are recorded on the PortModels only,
+        in the same {node id: [port name, ...]} form that NodeGraphQt keeps them in.
+    """
+
+    def __init__(self, node, model):
+        self.__node = node
+        self.model = model
+
+    def node(self):
+        return self.__node
+
+    def name(self):
+        return self.model.name
+
+    def type_(self):
+        return self.model.type_
+
+    def connected_ports(self):
+        graph = self.node().graph
+        port_getter = 'outputs' if self.type_() == PortTypeEnum.IN.value else 'inputs'
+        connected_ports = []
+        for node_id, port_names in self.model.connected_ports.items():
+            node_ports = getattr(graph.get_node_by_id(node_id), port_getter)()
+            connected_ports += [node_ports[i] for i in port_names]
+        return connected_ports
+
+    def connect_to(self, port):
+        if port.type_() == self.type_():
+            raise PortError(f'Cannot connect two {self.type_()} ports.')
+
+        if self.type_() == PortTypeEnum.IN.value:
+            input_port, output_port = self, port
+        else:
+            input_port, output_port = port, self
+
+        input_node = input_port.node()
+        output_node = output_port.node()
+        if output_port.name() in input_port.model.connected_ports.get(output_node.id, []):
+            return
+
+        input_port.model.connected_ports[output_node.id].append(output_port.name())
+        output_port.model.connected_ports[input_node.id].append(input_port.name())
+        input_node.graph.graph_index.mark_stale()
+
+
+class HeadlessNode(BaseNode):
+    """
+        Replaces BaseNode underneath a node class (see get_headless_node_class), so that the class's own __init__ and
+        methods run unchanged against a NodeModel, with HeadlessPorts instead of Ports and properties instead of
+        widgets.
+    """
+
+    def __init__(self):
+        self._graph = None
+        self._view = None
+        self._model = NodeModel()
+        self._model.type_ = self.type_
+        self._model.name = self.NODE_NAME
+        self._inputs = []
+        self._outputs = []
+        # {property name: items} for the properties that NodeGraphQt would show as combo boxes
+        self.combo_menu_items = {}
+
+    def add_port(self, name, port_type, multi_connection, display_name, locked):
+        model = PortModel(self)
+        model.type_ = port_type
+        model.name = name
+        model.display_name = display_name
+        model.multi_connection = multi_connection
+        model.locked = locked
+        return HeadlessPort(self, model)
+
+    def add_input(self, name='input', multi_input=False, display_name=True, color=None, locked=False,
+                  painter_func=None):
+        if name in self.model.inputs:
+            raise PortRegistrationError(f'port name "{name}" already registered.')
+        port = self.add_port(name, PortTypeEnum.IN.value, multi_input, display_name, locked)
+        self._inputs.append(port)
+        self.model.inputs[name] = port.model
+        return port
+
+    def add_output(self, name='output', multi_output=True, display_name=True, color=None, locked=False,
+                   painter_func=None):
+        if name in self.model.outputs:
+            raise PortRegistrationError(f'port name "{name}" already registered.')
+        port = self.add_port(name, PortTypeEnum.OUT.value, multi_output, display_name, locked)
+        self._outputs.append(port)
+        self.model.outputs[name] = port.model
+        return port
+
+    def add_combo_menu(self, name, label='', items=None, tab=None):
+        self.combo_menu_items[name] = items or []
+        self.create_property(
+            name,
+            value=items[0] if items else None,
+            items=items or [],
+            widget_type=NodePropWidgetEnum.QCOMBO_BOX.value,
+            tab=tab
+        )
+
+    def add_text_input(self, name, label='', text='', tab=None):
+        self.create_property(name, value=text, widget_type=NodePropWidgetEnum.QLINE_EDIT.value, tab=tab)
+
+    def add_checkbox(self, name, label='', text='', state=False, tab=None):
+        self.create_property(name, value=state, widget_type=NodePropWidgetEnum.QCHECK_BOX.value, tab=tab)
+
+    def get_property(self, name):
+        return self.model.get_property(name)
+
+    def set_property(self, name, value, push_undo=True):
+        """
+            Sets the property on the model and, like NodeGraph's property_changed signal, tells the graph. A combo box
+            can't show a value that isn't one of its items, so NodeGraphQt ends up clearing the property; so does this.
+        """
+        if name in self.combo_menu_items and value not in self.combo_menu_items[name]:
+            value = ''
+
+        if self.get_property(name) == value:
+            return
+
+        if self.graph is not None and name == 'name':
+            value = self.graph.get_unique_name(value)
+            self.NODE_NAME = value
+
+        self.model.set_property(name, value)
+        if self.graph is not None:
+            self.graph.handle_property_change(self)
+
+    def update(self):
+        pass
+
+
+def get_headless_node_class(node_class):
+    """
+        Returns a subclass of node_class whose BaseNode is swapped for HeadlessNode. It keeps node_class's name, so
+        node_class.type_ (and therefore everything serialized) is unchanged.
+    """
+    if node_class not in HEADLESS_NODE_CLASSES:
+        HEADLESS_NODE_CLASSES[node_class] = type(node_class.__name__, (node_class, HeadlessNode), {})
+    return HEADLESS_NODE_CLASSES[node_class]
+
+
+class HeadlessGraph():
+    """
+        A workflow graph built from headless nodes. It loads, validates, serializes and saves exactly like
+        GraphHandler, whose methods for those only touch node models and the GraphIndex, and are shared below as-is.
+    """
+
+    def __init__(self, account_id=None, workflow_category_id=None, workflow_id=None, database_connection_kwargs=None):
+        # {node id: node}, in creation order
+        self.nodes = {}
+        # {node type: headless node class}
+        self.node_classes = {i.type_: get_headless_node_class(i) for i in node_handler.fetch_all_node_types()}
+        # {node id: object_id} for nodes loaded from or saved to the database
+        self.persisted_object_ids = {}
+        # Set for the duration of graph_load_context, and shared by every node created meanwhile
+        self.node_catalog = None
+        # Passed to every query the graph and its nodes run; empty for the database_connector defaults
+        self.database_connection_kwargs = database_connection_kwargs or {}
+        self.graph_index = GraphIndex(self, follow_signals=False)
+        # {node id: validation error, or None if valid} from the last validate_nodes, and the nodes changed since
+        self.validation_results = {}
+        self.dirty_validation_ids = set()
+        self.validated_index_rebuild_count = None
+        self.set_account_properties(
+            account_id=account_id, workflow_category_id=workflow_category_id, workflow_id=workflow_id
+        )
+
+    def set_account_properties(self, account_id, workflow_category_id, workflow_id):
+        self.account_id = account_id
+        self.workflow_category_id = workflow_category_id
+        self.workflow_id = workflow_id
+
+    def all_nodes(self):
+        return list(self.nodes.values())
+
+    def get_node_by_id(self, node_id=None):
+        return self.nodes.get(node_id)
+
+    def create_node(self, node_type, name=None):
+        if node_type not in self.node_classes:
+            raise ValueError(f'Unknown node type: {node_type}')
+
+        node = self.node_classes[node_type]()
+        node._graph = self
+        node.NODE_NAME = self.get_unique_name(name or node.NODE_NAME)
+        node.model.name = node.NODE_NAME
+        self.nodes[node.id] = node
+        self.graph_index.mark_stale()
+
+        node.set_account_id(account_id=self.account_id)
+        node.set_workflow_category_id(workflow_category_id=self.workflow_category_id)
+        node.set_workflow_id(workflow_id=self.workflow_id)
+        node.set_database_connection_kwargs(self.database_connection_kwargs)
+        node.set_node_catalog(self.node_catalog)
+        node.load_templates()
+        node.set_node_catalog()
+
+        return node
+
+    def handle_property_change(self, node):
+        node.bump_display_revision()
+        self.dirty_validation_ids.add(node.id)
+
+    get_unique_name = NodeGraph.get_unique_name
+
+    graph_load_context = GraphHandler.graph_load_context
+    validate_nodes = GraphHandler.validate_nodes
+    validate_graph = GraphHandler.validate_graph
+
+    get_object_id = GraphHandler.get_object_id
+    assign_object_ids = GraphHandler.assign_object_ids
+    get_node_records = GraphHandler.get_node_records
+    parse_node_row = GraphHandler.parse_node_row
+    serialize_graph = GraphHandler.serialize_graph
+    get_graph_hash = GraphHandler.get_graph_hash
+    save_graph_to_database = GraphHandler.save_graph_to_database
+    load_graph_from_records = GraphHandler.load_graph_from_records
+    load_graph_from_database = GraphHandler.load_graph_from_database
+
+    get_entry_points = GraphHandler.get_entry_points
+    iter_paths = GraphHandler.iter_paths
+    count_paths = GraphHandler.count_paths
+    get_paths = GraphHandler.get_paths
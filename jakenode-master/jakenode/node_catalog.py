@@ -0,0 +1,194 @@
+import json
+
+from shinewave_webapp.database_connector import run_query
+
+
+class NodeCatalog():
+    """
+        Account-wide lookups that nodes need when they are created: templates for the workflow category, the account's
+        other workflows, and the API endpoints already in use. Each kind is fetched with one query the first time any
+        node asks for it, so nodes sharing a catalog (see GraphHandler.graph_load_context) cost one query per kind
+        rather than one per node. Callers get copies, since load_templates consumes the lists it is given.
+    """
+
+    def __init__(self, account_id, workflow_category_id, workflow_id, database_connection_kwargs=None):
+        self.account_id = account_id
+        self.workflow_category_id = workflow_category_id
+        self.workflow_id = workflow_id
+        # Passed to run_query, e.g. {'database_connection_type': 'sqlite', 'database': path}; empty for the defaults
+        self.database_connection_kwargs = database_connection_kwargs or {}
+
+        # {template_type: {column_name: [value, ...]}}
+        self.templates = None
+        self.template_columns = []
+        # Every active workflow of the account, so that catalogs copied for other workflows can share it
+        self.account_workflows = None
+        # {node_type: {'workflow_version': int, 'existing_api_endpoints': [str, ...]}}
+        self.api_data = {}
+
+    def check_account_properties(self):
+        if self.account_id is None:
+            raise AttributeError('account_id has not been set.')
+        if self.workflow_category_id is None:
+            raise AttributeError('workflow_category_id has not been set.')
+
+    def fetch_templates(self):
+        template_data = run_query(
+            """
+                SELECT
+                    wc.name AS workflow_category,
+                    t.*
+                FROM templates t
+                INNER JOIN workflow_categories wc ON t.workflow_category_id=wc.id
+                WHERE
+                    t.account_id = ?
+                    AND t.workflow_category_id = ?
+                    AND t.active = 'TRUE'
+                ORDER BY t.id
+            """,
+            sql_parameters=[self.account_id, self.workflow_category_id],
+            return_data_format=dict,
+            **self.database_connection_kwargs
+        )
+
+        self.template_columns = list(template_data)
+        self.templates = {}
+        for row_number, template_type in enumerate(template_data.get('template_type', [])):
+            type_templates = self.templates.setdefault(
+                template_type, {column_name: [] for column_name in self.template_columns}
+            )
+            for column_name, values in template_data.items():
+                type_templates[column_name].append(values[row_number])
+
+    def get_templates(self, template_type):
+        """
+            Returns the active templates of template_type, as {column_name: [value, ...]}.
+        """
+        self.check_account_properties()
+        if self.templates is None:
+            self.fetch_templates()
+
+        type_templates = self.templates.get(template_type)
+        if type_templates is None:
+            return {column_name: [] for column_name in self.template_columns}
+        return {column_name: list(values) for column_name, values in type_templates.items()}
+
+    def fetch_account_workflows(self):
+        self.account_workflows = run_query(
+            """
+                SELECT
+                    NULL AS workflow_category,
+                    *
+                FROM workflows
+                WHERE
+                    account_id = ?
+                    AND active = 'TRUE'
+            """,
+            sql_parameters=[self.account_id],
+            return_data_format=dict,
+            **self.database_connection_kwargs
+        )
+
+    def get_sibling_workflows(self):
+        """
+            Returns the account's other active workflows, as {column_name: [value, ...]}.
+        """
+        self.check_account_properties()
+        if self.account_workflows is None:
+            self.fetch_account_workflows()
+
+        workflow_ids = self.account_workflows.get('id', [])
+        sibling_rows = [i for i, workflow_id in enumerate(workflow_ids) if workflow_id != self.workflow_id]
+        return {
+            column_name: [values[i] for i in sibling_rows] for column_name, values in self.account_workflows.items()
+        }
+
+    def copy_for_workflow(self, workflow_id):
+        """
+            Returns a catalog for another of the account's workflows in the same category, sharing the templates and
+            workflows already fetched here (see bulk_validation). API data depends on the workflow's own version, so it
+            isn't shared.
+        """
+        node_catalog = NodeCatalog(
+            self.account_id, self.workflow_category_id, workflow_id, self.database_connection_kwargs
+        )
+        node_catalog.templates = self.templates
+        node_catalog.template_columns = self.template_columns
+        node_catalog.account_workflows = self.account_workflows
+        return node_catalog
+
+    def fetch_api_data(self, node_type):
+        api_data = run_query(
+            """
+                WITH filtered_workflow_nodes AS (
+                    SELECT
+                        wn.workflow_version,
+                        wn.custom_data,
+                        wn.workflow_id,
+                        wn.node_type
+                    FROM workflow_nodes wn
+                    INNER JOIN workflows w ON
+                        wn.workflow_id = w.id
+                        AND wn.active = w.active
+                    WHERE
+                        wn.active = 'TRUE'
+                        AND w.account_id = ?
+                )
+                    SELECT
+                        custom_data,
+                        1 AS workflow_version
+                    FROM filtered_workflow_nodes
+                    WHERE
+                        node_type = ?
+                UNION
+                    SELECT
+                        '{}' AS custom_data,
+                        MAX(workflow_version) AS workflow_version
+                    FROM filtered_workflow_nodes
+                    WHERE workflow_id = ?
+            """,
+            sql_parameters=[self.account_id, node_type, self.workflow_id],
+            return_data_format=dict,
+            **self.database_connection_kwargs
+        )
+
+        if not api_data:
+            workflow_version = 1
+            existing_api_endpoints = []
+        else:
+            workflow_versions = [int(i) for i in api_data.get('workflow_version') if i is not None] + [1]
+            workflow_version = max(workflow_versions)
+            custom_data = [json.loads(i) for i in api_data['custom_data'] if isinstance(i, str)]
+            existing_api_endpoints = [i['api_endpoint'] for i in custom_data if i.get('api_endpoint')]
+
+        self.set_api_data(node_type, workflow_version, existing_api_endpoints)
+
+    def set_api_data(self, node_type, workflow_version, existing_api_endpoints):
+        """
+            Stores what fetch_api_data would fetch, for callers that already hold the account's nodes (see
+            bulk_validation).
+        """
+        self.api_data[node_type] = {
+            'workflow_version': workflow_version, 'existing_api_endpoints': existing_api_endpoints
+        }
+
+    def get_api_data(self, node_type):
+        """
+            Returns {'workflow_version': int, 'existing_api_endpoints': [str, ...]} for the account's active nodes of
+            node_type.
+        """
+        if node_type not in self.api_data:
+            self.fetch_api_data(node_type)
+
+        api_data = self.api_data[node_type]
+        return {
+            'workflow_version': api_data['workflow_version'],
+            'existing_api_endpoints': list(api_data['existing_api_endpoints'])
+        }
+
+    def add_api_endpoint(self, node_type, api_endpoint):
+        """
+            Records an endpoint handed out during this load, so that later nodes sharing the catalog can't draw it too.
+        """
+        if node_type in self.api_data:
+            self.api_data[node_type]['existing_api_endpoints'].append(api_endpoint)
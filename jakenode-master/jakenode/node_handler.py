@@ -26,7 +26,7 @@ def fetch_all_node_types():
 
 
 def fetch_node_display_info(node):
-    return node.get_display_info()
+    return node.get_cached_display_info()
 
 
 def fetch_node_text_color(node_type):
@@ -1,6 +1,6 @@
 from NodeGraphQt.constants import NodePropWidgetEnum
 
-from jakenode.nodes.workflow_node import NodeTextEdit, WorkflowNode
+from jakenode.nodes.workflow_node import WorkflowNode
 
 
 class MarkerNode(WorkflowNode):
@@ -17,10 +17,7 @@ class MarkerNode(WorkflowNode):
         super(MarkerNode, self).__init__(has_output=False, has_input=True)
 
         self.label_name = 'marker_type'
-        widget = NodeTextEdit(self.view, 'marker_type', 'Marker Type', marker_type, is_read_only=True)
-        widget.value_changed.connect(lambda k, v: self.set_property(k, v))
-        self.view.add_widget(widget)
-        self.view.draw_node()
+        self.add_text_edit('marker_type', 'Marker Type', marker_type, is_read_only=True)
 
     def validate_has_upstream_trigger(self):
         super().validate_has_upstream_trigger(
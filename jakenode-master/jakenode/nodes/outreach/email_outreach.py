@@ -64,8 +64,10 @@ class EmailOutreach(OutreachNode):
 
         selected_template = self.get_property('email_templates')
 
-        template_id = self.template_data[selected_template]['id']
-        template_contents = self.get_node_template_contents(template_id=template_id)
+        template_details = self.template_data[selected_template]
+        template_contents = self.get_node_template_contents(
+            template_id=template_details['id'], workflow_category=template_details['workflow_category']
+        )
 
         display_text = f"""
             <h3>Email Template: {selected_template}</h3>
@@ -74,6 +76,11 @@ class EmailOutreach(OutreachNode):
 
         return node_name, display_text
 
+    def get_display_info_version(self):
+        template_details = self.template_data.get(self.get_property('email_templates'))
+        if template_details:
+            return self.get_node_template_version(template_details['id'], template_details['workflow_category'])
+
     def validate_has_template_selected(self):
         """
             Validates that a template is selected.
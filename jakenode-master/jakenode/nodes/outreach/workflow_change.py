@@ -23,31 +23,16 @@ class OutboundWorkflowChange(OutreachNode):
         if self.workflow_category_id is None:
             raise AttributeError('workflow_category_id has not been set.')
 
-        template_data = self.run_query(
-            """
-                SELECT
-                    NULL AS workflow_category,
-                    *
-                FROM workflows
-                WHERE
-                    account_id = ?
-                    AND id != ?
-                    AND active = 'TRUE'
-            """,
-            sql_parameters=[self.account_id, self.workflow_id],
-            return_data_format=dict
-        )
+        template_data = self.get_node_catalog().get_sibling_workflows()
 
         return template_data
 
     def load_templates(self):
         all_template_data = self.get_node_template_data()
-        for template_name in all_template_data['name']:
-            individual_template_dict = {}
-            for key in ['workflow_category', 'id']:
-                individual_template_dict[key] = all_template_data[key].pop(0)
-
-            self.template_data[template_name] = individual_template_dict
+        # One entry per workflow in the account, so walk the columns together rather than popping from their fronts
+        template_columns = [all_template_data[i] for i in ['name', 'workflow_category', 'id']]
+        for template_name, workflow_category, template_id in zip(*template_columns):
+            self.template_data[template_name] = {'workflow_category': workflow_category, 'id': template_id}
 
         self.add_combo_menu(
             'workflow_templates', 'Workflows', items=[self.get_blank_menu_item()] + list(self.template_data.keys())
@@ -1,5 +1,3 @@
-import json
-
 from jakenode.nodes.trigger.trigger_node import TriggerNode
 
 
@@ -18,49 +16,7 @@ class APITrigger(TriggerNode):
         super(APITrigger, self).__init__(has_input=False)
 
     def fetch_api_data(self):
-        api_data = self.run_query(
-            """
-                WITH filtered_workflow_nodes AS (
-                    SELECT
-                        wn.workflow_version,
-                        wn.custom_data,
-                        wn.workflow_id,
-                        wn.node_type
-                    FROM workflow_nodes wn
-                    INNER JOIN workflows w ON
-                        wn.workflow_id = w.id
-                        AND wn.active = w.active
-                    WHERE
-                        wn.active = 'TRUE'
-                        AND w.account_id = ?
-                )
-                    SELECT
-                        custom_data,
-                        1 AS workflow_version
-                    FROM filtered_workflow_nodes
-                    WHERE
-                        node_type = ?
-                UNION
-                    SELECT
-                        '{}' AS custom_data,
-                        MAX(workflow_version) AS workflow_version
-                    FROM filtered_workflow_nodes
-                    WHERE workflow_id = ?
-            """,
-            sql_parameters=[self.account_id, self.get_property('type_'), self.workflow_id],
-            return_data_format=dict
-        )
-
-        if not api_data:
-            workflow_version = 1
-            existing_api_endpoints = []
-        else:
-            workflow_versions = [int(i) for i in api_data.get('workflow_version') if i is not None] + [1]
-            workflow_version = max(workflow_versions)
-            custom_data = [json.loads(i) for i in api_data['custom_data'] if isinstance(i, str)]
-            existing_api_endpoints = [i['api_endpoint'] for i in custom_data if i.get('api_endpoint')]
-
-        return {'workflow_version': workflow_version, 'existing_api_endpoints': existing_api_endpoints}
+        return self.get_node_catalog().get_api_data(self.get_property('type_'))
 
     def generate_api_endpoint(self):
         existing_api_data = self.fetch_api_data()
@@ -74,8 +30,9 @@ class APITrigger(TriggerNode):
 
         api_key = self.get_random_key(key_values)
         if api_key in existing_api_data['existing_api_endpoints']:
-            return generate_api_endpoint()
+            return self.generate_api_endpoint()
         else:
+            self.get_node_catalog().add_api_endpoint(self.get_property('type_'), api_key)
             return api_key
 
     def load_templates(self):
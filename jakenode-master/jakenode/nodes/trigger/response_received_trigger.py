@@ -26,8 +26,7 @@ class ResponseReceivedTrigger(TriggerNode):
         super(ResponseReceivedTrigger, self).__init__(has_input=True)
 
     def validate_has_upstream_sms(self):
-        upstream_node_types = [i.get_property('type_') for i in self.get_upstream_nodes()]
-        if not 'nodes.outreach.SMSOutreach' in upstream_node_types:
+        if not self.has_connected_type('upstream', 'nodes.outreach.SMSOutreach'):
             raise ValueError('SMS response triggers require an upstream SMS outreach, but none was found.')
 
 
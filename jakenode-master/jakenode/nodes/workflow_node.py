@@ -6,8 +6,9 @@ from NodeGraphQt.constants import ViewerEnum
 from NodeGraphQt.widgets.node_widgets import NodeBaseWidget
 from Qt import QtCore, QtWidgets
 
+from jakenode.node_catalog import NodeCatalog
 from shinewave_webapp import database_connector
-from shinewave_webapp.file_storage_connector import fetch_template
+from shinewave_webapp.file_storage_connector import fetch_template, get_template_version
 
 
 class WorkflowNode(BaseNode):
@@ -30,6 +31,10 @@ class WorkflowNode(BaseNode):
         super(WorkflowNode, self).__init__()
 
         self.allow_forced_template_id_changes = True
+        self.node_catalog = None
+        self.database_connection_kwargs = dict(database_connection_kwargs)
+        self.display_revision = 0
+        self.display_info_cache = None
 
         if has_output:
             self.add_output('output', multi_output=True)
@@ -49,17 +54,26 @@ class WorkflowNode(BaseNode):
         sql,
         return_data_format=list,
         commit=False,
-        database_connection_type='postgres',
-        database=database_connector.DATABASE,
+        database_connection_type=None,
+        database=None,
         sql_parameters=[]
     ):
+        """
+            Runs the query against the node's database (see set_database_connection_kwargs) unless
+            database_connection_type or database are given.
+        """
+        database_connection_kwargs = dict(self.database_connection_kwargs)
+        if database_connection_type is not None:
+            database_connection_kwargs['database_connection_type'] = database_connection_type
+        if database is not None:
+            database_connection_kwargs['database'] = database
+
         return database_connector.run_query(
             sql=sql,
             return_data_format=return_data_format,
             commit=commit,
-            database_connection_type=database_connection_type,
-            database=database,
-            sql_parameters=sql_parameters
+            sql_parameters=sql_parameters,
+            **database_connection_kwargs
         )
 
     def get_random_key(self, value_list, random_value_digits=7):
@@ -74,6 +88,25 @@ class WorkflowNode(BaseNode):
     def set_workflow_id(self, workflow_id=None):
         self.workflow_id = workflow_id
 
+    def set_node_catalog(self, node_catalog=None):
+        self.node_catalog = node_catalog
+
+    def set_database_connection_kwargs(self, database_connection_kwargs=None):
+        self.database_connection_kwargs = dict(database_connection_kwargs or {})
+
+    def get_node_catalog(self):
+        """
+            Returns the catalog shared by the graph being loaded or, outside of a load, a fresh one for this node.
+        """
+        if self.node_catalog is not None:
+            return self.node_catalog
+        return NodeCatalog(
+            self.account_id,
+            self.workflow_category_id,
+            self.workflow_id,
+            database_connection_kwargs=self.database_connection_kwargs
+        )
+
     def get_node_name(self, html_safe=False):
         node_name = self.get_property('name')
         if html_safe:
@@ -87,17 +120,18 @@ class WorkflowNode(BaseNode):
         if self.workflow_category_id is None:
             raise AttributeError('workflow_category_id has not been set.')
 
+        if template_id is None:
+            return self.get_node_catalog().get_templates(self.get_property('type_'))
+
         lookup_where_clause = f"""
             WHERE
                 t.account_id={self.account_id}
                 AND t.workflow_category_id={self.workflow_category_id}
                 AND t.template_type='{self.get_property('type_')}'
                 AND t.active='TRUE'
+                AND t.id={template_id}
         """
 
-        if template_id is not None:
-            lookup_where_clause += f' AND t.id={template_id}'
-
         template_data = self.run_query(
             f"""
                 SELECT
@@ -124,10 +158,17 @@ class WorkflowNode(BaseNode):
 
         return fetch_template(self.node_parent_type, self.node_detail_type, workflow_category, template_id)
 
+    def get_node_template_version(self, template_id, workflow_category):
+        return get_template_version(self.node_parent_type, self.node_detail_type, workflow_category, template_id)
+
     def get_node_chain(self, direction):
         """
-            Universal method for getting all upstream or downstream nodes.
+            Universal method for getting all upstream or downstream nodes. Uses the graph's GraphIndex when the node
+            belongs to a GraphHandler, and walks the node's ports otherwise.
         """
+        graph_index = getattr(self.graph, 'graph_index', None)
+        if graph_index is not None:
+            return graph_index.get_node_chain(self, direction)
 
         if direction == 'upstream':
             connection_method = 'connected_input_nodes'
@@ -136,25 +177,15 @@ class WorkflowNode(BaseNode):
         else:
             raise ValueError('Parameter "direction" must be either "upstream" or "downstream"')
 
-        def _get_node_chain(current_nodes, prior_nodes, connection_method):
-            all_connected = []
-            for current_node in current_nodes:
-                get_direct_connections = getattr(current_node, connection_method)
-                current_connected = get_direct_connections()
-                current_connected = chain(*current_connected.values())
-                current_connected = [i for i in current_connected if i not in prior_nodes]
-                prior_nodes.append(current_node)
-            all_connected += current_connected
-            return all_connected, prior_nodes
+        seen_ids = {self.id}
+        chain_nodes = [self]
+        for current_node in chain_nodes:
+            for connected_node in chain(*getattr(current_node, connection_method)().values()):
+                if connected_node.id not in seen_ids:
+                    seen_ids.add(connected_node.id)
+                    chain_nodes.append(connected_node)
 
-        current_nodes = [self]
-        prior_nodes = []
-        while current_nodes:
-            current_nodes, prior_nodes = _get_node_chain(current_nodes, prior_nodes, connection_method)
-
-        del prior_nodes[0]
-
-        return prior_nodes
+        return chain_nodes[1:]
 
     def get_upstream_nodes(self):
         return self.get_node_chain('upstream')
@@ -162,15 +193,26 @@ class WorkflowNode(BaseNode):
     def get_downstream_nodes(self):
         return self.get_node_chain('downstream')
 
+    def has_connected_type(self, direction, type_label):
+        """
+            Returns whether any node upstream or downstream has type_label as its type (e.g.
+            'nodes.outreach.SMSOutreach') or parent type (e.g. 'trigger'). Answered from the graph's GraphIndex
+            summaries when the node belongs to a graph, and by walking the node chain otherwise.
+        """
+        graph_index = getattr(self.graph, 'graph_index', None)
+        if graph_index is not None:
+            return graph_index.has_connected_type(self, direction, type_label)
+
+        connected_nodes = self.get_node_chain(direction)
+        return any(type_label in (i.type_, getattr(i, 'node_parent_type', None)) for i in connected_nodes)
+
     def validate_has_upstream_trigger(self, custom_error_message=None):
         if not custom_error_message:
             error_message = 'Node is orphaned (lacks an upstream trigger node).'
         else:
             error_message = custom_error_message
 
-        upstream_nodes = self.get_upstream_nodes()
-        upstream_node_parent_types = [i.node_parent_type for i in upstream_nodes]
-        if 'trigger' not in upstream_node_parent_types:
+        if not self.has_connected_type('upstream', 'trigger'):
             raise ValueError(error_message)
 
     def validate_has_downstream_outreach(self, custom_error_message=None):
@@ -179,9 +221,7 @@ class WorkflowNode(BaseNode):
         else:
             error_message = custom_error_message
 
-        downstream_nodes = self.get_downstream_nodes()
-        downstream_node_parent_types = [i.node_parent_type for i in downstream_nodes]
-        if 'outreach' not in downstream_node_parent_types:
+        if not self.has_connected_type('downstream', 'outreach'):
             raise ValueError(error_message)
 
     def safe_set_property(self, property_name, value):
@@ -192,9 +232,40 @@ class WorkflowNode(BaseNode):
         else:
             self.create_property(property_name, value)
 
+    def add_text_edit(self, name, label='', text='', is_read_only=False):
+        """
+            Embeds a NodeTextEdit in the node. Unlike add_text_input, no property is created for it, so headless nodes
+            (which have no view) skip it entirely.
+        """
+        if self.view is None:
+            return
+
+        widget = NodeTextEdit(self.view, name, label, text, is_read_only=is_read_only)
+        widget.value_changed.connect(lambda k, v: self.set_property(k, v))
+        self.view.add_widget(widget)
+        self.view.draw_node()
+
     def get_html_warning(self, text):
         return f'<p style="background-color:red;">{text}</p>'
 
+    def bump_display_revision(self):
+        """
+            Called by the graph whenever one of the node's properties changes (including through undo/redo), so that
+            the next get_cached_display_info rebuilds the display info.
+        """
+        self.display_revision += 1
+
+    def get_cached_display_info(self):
+        """
+            Returns get_display_info, rebuilding it only when the display revision or get_display_info_version has
+            changed since the last call, so that clicking back and forth between nodes doesn't re-run their queries
+            and file reads.
+        """
+        cache_key = (self.display_revision, self.get_display_info_version())
+        if self.display_info_cache is None or self.display_info_cache[0] != cache_key:
+            self.display_info_cache = (cache_key, self.get_display_info())
+        return self.display_info_cache[1]
+
     def get_html_validation_text(self, validation_method):
         try:
             validation_method()
@@ -210,6 +281,13 @@ class WorkflowNode(BaseNode):
     def get_display_info(self, node_templates_root=None):
         return '', ''
 
+    def get_display_info_version(self):
+        """
+            Anything outside the node's properties that its display info depends on. Nodes that display a template's
+            contents return the template file's version, so that edits made through the frontend show up.
+        """
+        return None
+
     def load_templates(self):
         pass
 
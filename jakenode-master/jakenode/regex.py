@@ -1,5 +1,17 @@
+from functools import lru_cache
 import re
 
+
+# Distinct template sets whose compiled TemplateMatcher is kept by compile_template_matcher
+TEMPLATE_MATCHER_CACHE_SIZE = 64
+
+# Distinct messages whose classification each TemplateMatcher remembers
+CLASSIFY_CACHE_SIZE = 4096
+
+# Numbered backreferences and named groups refer to group numbers/names that change once templates are combined
+_UNCOMBINABLE_TEMPLATE_PATTERN = re.compile(r'\\[1-9]|\(\?P[<=]')
+
+
 class regex_templates():
 
     def __init__(self):
@@ -16,5 +28,87 @@ class regex_templates():
         return self.templates_dict[template_name]['examples']
 
     def get_template(self, template_name):
-        template = self.templates_dict[template_name]['template']
-        return re.compile(return_info, re.IGNORECASE)
+        return self.get_matcher().get_pattern(template_name)
+
+    def get_matcher(self):
+        """
+            Returns the process-wide TemplateMatcher for these templates, in get_all_templates order.
+        """
+        return compile_template_matcher(
+            tuple((i, self.templates_dict[i]['template']) for i in self.get_all_templates())
+        )
+
+
+class TemplateMatcher():
+    """
+        Matches messages against a set of response templates. Each template is compiled once on its own, and once as a
+        named alternative of a combined pattern, (?P<t0>...)|(?P<t1>...)|..., so that the earliest match of any
+        template is found in a single scan (search).
+
+        An alternation stops at its first matching branch, so classify, which lists every matching template, runs the
+        precompiled patterns one after another instead. A single pass of optional lookaheads, (?=.*?(?P<t0>...))?...,
+        finds them all too, but re can't use its literal-prefix search inside a lookahead, and it measured slower
+        than the separate patterns (see benchmarks/bench_regex_templates.py). classify memoizes its results per
+        distinct message, since replies repeat heavily ('Yes', 'STOP', ...).
+    """
+
+    def __init__(self, templates, flags=re.IGNORECASE, classify_cache_size=CLASSIFY_CACHE_SIZE):
+        """
+            templates: [(template name, regular expression), ...]. Matching is case-insensitive by default.
+        """
+        self.template_names = []
+        self.patterns = []
+        # {group name in combined_pattern: position in template_names}
+        self.group_positions = {}
+
+        combined_alternatives = []
+        for position, (template_name, template) in enumerate(templates):
+            if _UNCOMBINABLE_TEMPLATE_PATTERN.search(template):
+                raise ValueError(
+                    f'Template "{template_name}" uses a backreference or named group, so it cannot be combined.'
+                )
+            self.template_names.append(template_name)
+            self.patterns.append(re.compile(template, flags))
+            self.group_positions[f't{position}'] = position
+            combined_alternatives.append(f'(?P<t{position}>{template})')
+
+        self.template_positions = {template_name: i for i, template_name in enumerate(self.template_names)}
+        self.combined_pattern = re.compile('|'.join(combined_alternatives), flags)
+        self.classify_cached = lru_cache(maxsize=classify_cache_size)(self.classify_message)
+
+    def get_pattern(self, template_name):
+        return self.patterns[self.template_positions[template_name]]
+
+    def matches(self, message, template_name):
+        return self.get_pattern(template_name).search(message) is not None
+
+    def search(self, message):
+        """
+            Returns the name of the template matching earliest in the message (the first listed, on a tie), or None.
+        """
+        match = self.combined_pattern.search(message)
+        if match is None:
+            return None
+        return self.template_names[self.group_positions[match.lastgroup]]
+
+    def classify_message(self, message):
+        return tuple(
+            template_name
+            for template_name, pattern in zip(self.template_names, self.patterns)
+            if pattern.search(message)
+        )
+
+    def classify(self, message):
+        """
+            Returns the names of every template found anywhere in the message, in template order.
+        """
+        return list(self.classify_cached(message))
+
+
+@lru_cache(maxsize=TEMPLATE_MATCHER_CACHE_SIZE)
+def compile_template_matcher(templates):
+    """
+        Returns a TemplateMatcher for templates, a tuple of (template name, regular expression) pairs, compiling it
+        only the first time a process sees that tuple.
+    """
+    return TemplateMatcher(templates)
@@ -0,0 +1,223 @@
+from functools import lru_cache
+import logging
+import unicodedata
+
+from jakenode.graph_handler import GraphHandler
+from jakenode.regex import compile_template_matcher, regex_templates
+from shinewave_webapp.database_connector import run_query
+
+
+"""
+    Routes inbound SMS replies to the response trigger they set off. Each SMS outreach node gets a ResponseRoute: a
+    dict of its Exact Response triggers keyed by normalized response, and a TemplateMatcher over the templates of its
+    Fuzzy Response triggers. Recipients are mapped to the SMS node they're waiting at, so routing a reply is two dict
+    lookups plus, when no exact response matches, one scan of the combined fuzzy pattern.
+
+    Usage:
+        router = ResponseRouter(workflow_id=1)
+        router.load_routes_from_database()
+        router.load_waiting_recipients()
+        trigger_object_id = router.route_message(recipient_id, 'Yes, see you then')
+"""
+
+SMS_OUTREACH_TYPE = 'nodes.outreach.SMSOutreach'
+EXACT_RESPONSE_TYPE = 'nodes.trigger.ExactResponseReceivedTrigger'
+FUZZY_RESPONSE_TYPE = 'nodes.trigger.FuzzyResponseReceivedTrigger'
+
+# Distinct normalized replies whose routing each ResponseRoute remembers
+ROUTE_CACHE_SIZE = 1024
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_response(message):
+    """
+        Returns message in the form exact responses are compared in: Unicode-normalized (NFKC), case-folded, with
+        surrounding whitespace stripped and inner runs of whitespace collapsed to a single space.
+    """
+    return ' '.join(unicodedata.normalize('NFKC', message).casefold().split())
+
+
+class ResponseRoute():
+    """
+        The response triggers directly downstream of one SMS outreach node. An exact response takes precedence over a
+        fuzzy one; between fuzzy triggers, the template matching earliest in the reply wins. Where several triggers
+        would fire on the same reply, the first by object_id is used.
+    """
+
+    def __init__(self, exact_responses, fuzzy_templates, route_cache_size=ROUTE_CACHE_SIZE):
+        """
+            exact_responses: [(trigger object_id, exact response), ...]
+            fuzzy_templates: [(trigger object_id, template name, regular expression), ...]
+        """
+        # {normalized exact response: trigger object_id}
+        self.exact_routes = {}
+        for object_id, exact_response in exact_responses:
+            self.exact_routes.setdefault(normalize_response(exact_response), object_id)
+
+        # {template name: trigger object_id}
+        self.fuzzy_routes = {}
+        templates = []
+        for object_id, template_name, template in fuzzy_templates:
+            if template_name not in self.fuzzy_routes:
+                self.fuzzy_routes[template_name] = object_id
+                templates.append((template_name, template))
+        # SMS nodes with the same fuzzy templates share one compiled matcher
+        self.matcher = compile_template_matcher(tuple(templates)) if templates else None
+
+        self.route_cached = lru_cache(maxsize=route_cache_size)(self.route_normalized_message)
+
+    def route_normalized_message(self, normalized_message):
+        object_id = self.exact_routes.get(normalized_message)
+        if object_id is not None or self.matcher is None:
+            return object_id
+
+        template_name = self.matcher.search(normalized_message)
+        return None if template_name is None else self.fuzzy_routes[template_name]
+
+    def route(self, message):
+        """
+            Returns the object_id of the trigger that message sets off, or None if it sets off none of them.
+        """
+        return self.route_cached(normalize_response(message))
+
+
+class ResponseRouter():
+    """
+        Routes the replies of a workflow's recipients, from the workflow's active nodes and the outreach_lists rows of
+        the recipients waiting in it. The routes are built from node records, so no nodes are created.
+    """
+
+    def __init__(self, workflow_id=None, database_connection_kwargs=None, route_cache_size=ROUTE_CACHE_SIZE):
+        self.workflow_id = workflow_id
+        # Passed to every query the router runs; empty for the database_connector defaults
+        self.database_connection_kwargs = database_connection_kwargs or {}
+        self.route_cache_size = route_cache_size
+        # {SMS outreach object_id: ResponseRoute}
+        self.routes = {}
+        # {recipient_id: object_id of the SMS outreach node they're waiting at}
+        self.waiting_object_ids = {}
+
+    parse_node_row = GraphHandler.parse_node_row
+
+    def load_routes_from_records(self, node_records):
+        """
+            Builds a ResponseRoute for every SMS outreach node in {object_id: {'node_type', 'outputs', 'custom_data',
+            ...}}, the form returned by GraphHandler.get_node_records. Triggers with no response entered, or with a
+            template that no longer exists, can't fire and are left out (validate_graph reports them).
+        """
+        templates_dict = regex_templates().templates_dict
+        self.routes = {}
+
+        for object_id, node_record in node_records.items():
+            if node_record['node_type'] != SMS_OUTREACH_TYPE:
+                continue
+
+            exact_responses = []
+            fuzzy_templates = []
+            for output_object_id in sorted(node_record['outputs']):
+                output_record = node_records[output_object_id]
+                custom_data = output_record['custom_data']
+
+                if output_record['node_type'] == EXACT_RESPONSE_TYPE:
+                    exact_response = (custom_data.get('exact_response') or '').strip()
+                    if exact_response:
+                        exact_responses.append((output_object_id, exact_response))
+                    else:
+                        logger.warning(f'Exact response trigger {output_object_id} has no response; it is not routed.')
+
+                elif output_record['node_type'] == FUZZY_RESPONSE_TYPE:
+                    template_name = (custom_data.get('response_template') or '').strip()
+                    if template_name in templates_dict:
+                        fuzzy_templates.append(
+                            (output_object_id, template_name, templates_dict[template_name]['template'])
+                        )
+                    else:
+                        logger.warning(
+                            f'Fuzzy response trigger {output_object_id} has no known template; it is not routed.'
+                        )
+
+            self.routes[object_id] = ResponseRoute(exact_responses, fuzzy_templates, self.route_cache_size)
+
+    def load_routes_from_database(self):
+        if self.workflow_id is None:
+            raise AttributeError('workflow_id has not been set.')
+
+        node_data = run_query(
+            """
+                SELECT object_id, name, node_type, inputs, outputs, custom_data
+                FROM workflow_nodes
+                WHERE
+                    workflow_id = ?
+                    AND active = 'TRUE'
+            """,
+            sql_parameters=[self.workflow_id],
+            **self.database_connection_kwargs
+        )
+        self.load_routes_from_records({object_id: self.parse_node_row(*node_row) for object_id, *node_row in node_data})
+
+    def load_waiting_recipients(self):
+        """
+            Maps every recipient whose active outreach_lists row has them at one of the workflow's SMS outreach nodes
+            to that node. Recipients at any other node aren't waiting for a reply, so aren't routed. A recipient whose
+            current node isn't in the loaded routes (a deleted node, or one from a version no longer active) is
+            skipped with a warning rather than failing the load for every other recipient.
+            Returns
+            -------
+            list: [recipient_id, ...] of the skipped recipients
+        """
+        if self.workflow_id is None:
+            raise AttributeError('workflow_id has not been set.')
+
+        waiting_recipients = run_query(
+            """
+                SELECT ol.recipient_id, ol.current_node_id, wn.object_id, wn.node_type
+                FROM outreach_lists ol
+                LEFT JOIN workflow_nodes wn ON
+                    ol.current_node_id = wn.id
+                WHERE
+                    ol.workflow_id = ?
+                    AND ol.active = 'TRUE'
+            """,
+            sql_parameters=[self.workflow_id],
+            **self.database_connection_kwargs
+        )
+        self.waiting_object_ids = {}
+        skipped_recipient_ids = []
+        for recipient_id, current_node_id, object_id, node_type in waiting_recipients:
+            if object_id is not None and node_type != SMS_OUTREACH_TYPE:
+                continue
+            if object_id not in self.routes:
+                logger.warning(
+                    f'Recipient {recipient_id} is at workflow_nodes row {current_node_id}, which is not an SMS '
+                    f'outreach node of workflow {self.workflow_id}; their replies are not routed.'
+                )
+                skipped_recipient_ids.append(recipient_id)
+                continue
+            self.waiting_object_ids[recipient_id] = object_id
+        return skipped_recipient_ids
+
+    def set_waiting_node(self, recipient_id, object_id):
+        if object_id not in self.routes:
+            raise ValueError(f'{object_id} is not an SMS outreach node of workflow {self.workflow_id}.')
+        self.waiting_object_ids[recipient_id] = object_id
+
+    def remove_waiting_node(self, recipient_id):
+        self.waiting_object_ids.pop(recipient_id, None)
+
+    def route_response(self, object_id, message):
+        """
+            Returns the object_id of the response trigger downstream of SMS outreach node object_id that message sets
+            off, or None.
+        """
+        return self.routes[object_id].route(message)
+
+    def route_message(self, recipient_id, message):
+        """
+            Returns the object_id of the response trigger that a reply from recipient_id sets off, or None if the
+            recipient isn't waiting at an SMS outreach node or the reply matches none of its triggers.
+        """
+        object_id = self.waiting_object_ids.get(recipient_id)
+        if object_id is None:
+            return None
+        return self.routes[object_id].route(message)
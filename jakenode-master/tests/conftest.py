@@ -0,0 +1,59 @@
+import json
+import os
+
+import pytest
+
+from shinewave_webapp.database_connector import close_sqlite_conns, transaction
+from shinewave_webapp.schema_migrations import migrate_schema
+
+
+APP_DATA_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'file_mount', 'node_app', 'data')
+
+ACCOUNT_ID = 1
+WORKFLOW_CATEGORY_ID = 1
+WORKFLOW_ID = 1
+
+WORKFLOW_NODE_COLUMNS = [
+    'id', 'workflow_id', 'workflow_version', 'object_id', 'name', 'node_type', 'inputs', 'outputs', 'custom_data',
+    'active', 'retired_version'
+]
+
+
+@pytest.fixture
+def database_connection_kwargs(tmp_path):
+    """
+        A migrated sqlite database holding one account, workflow category and workflow, and no nodes.
+    """
+    database_connection_kwargs = {'database_connection_type': 'sqlite', 'database': str(tmp_path / 'jakenode.db')}
+    migrate_schema(app_data_path=APP_DATA_PATH, **database_connection_kwargs)
+
+    with transaction(**database_connection_kwargs) as tx:
+        tx.bulk_insert('account', ['id', 'name', 'subdomain', 'active'], [[ACCOUNT_ID, 'Test', 'test', 'TRUE']])
+        tx.bulk_insert(
+            'workflow_categories',
+            ['id', 'account_id', 'name', 'active'],
+            [[WORKFLOW_CATEGORY_ID, ACCOUNT_ID, 'Test Category', 'TRUE']]
+        )
+        tx.bulk_insert(
+            'workflows',
+            ['id', 'account_id', 'name', 'workflow_category_id', 'enabled', 'active'],
+            [[WORKFLOW_ID, ACCOUNT_ID, 'Test Workflow', WORKFLOW_CATEGORY_ID, 'TRUE', 'TRUE']]
+        )
+
+    yield database_connection_kwargs
+    close_sqlite_conns()
+
+
+def insert_node_rows(database_connection_kwargs, node_rows):
+    """
+        Inserts workflow_nodes rows, given as {column: value} with inputs, outputs and custom_data unencoded.
+    """
+    data_rows = []
+    for node_row in node_rows:
+        node_row = {'workflow_id': WORKFLOW_ID, 'inputs': [], 'outputs': [], 'custom_data': {}, **node_row}
+        for column_name in ['inputs', 'outputs', 'custom_data']:
+            node_row[column_name] = json.dumps(node_row[column_name])
+        data_rows.append([node_row.get(i) for i in WORKFLOW_NODE_COLUMNS])
+
+    with transaction(**database_connection_kwargs) as tx:
+        tx.bulk_insert('workflow_nodes', WORKFLOW_NODE_COLUMNS, data_rows)
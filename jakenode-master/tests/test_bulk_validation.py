@@ -0,0 +1,11 @@
+from conftest import ACCOUNT_ID, WORKFLOW_ID
+from jakenode.bulk_validation import validate_account_workflows
+from test_graph_handler import insert_legacy_workflow
+
+
+def test_validate_account_workflows_on_given_database(database_connection_kwargs):
+    insert_legacy_workflow(database_connection_kwargs)
+
+    report = validate_account_workflows(ACCOUNT_ID, processes=1, database_connection_kwargs=database_connection_kwargs)
+    assert report['workflow_count'] == 1
+    assert report['workflows'][WORKFLOW_ID]['node_count'] == 3
@@ -0,0 +1,191 @@
+import re
+
+import pytest
+
+from conftest import ACCOUNT_ID, APP_DATA_PATH, WORKFLOW_CATEGORY_ID, WORKFLOW_ID, insert_node_rows
+from jakenode.headless_graph import HeadlessGraph
+from shinewave_webapp.database_connector import transaction
+from shinewave_webapp.schema_migrations import MIGRATE_COMMAND, migrate_schema
+
+
+TIME_ELAPSED_TYPE = 'nodes.trigger.TimeElapsedTrigger'
+MARKER_TYPE = 'nodes.marker.Converted'
+API_TRIGGER_TYPE = 'nodes.trigger.APITrigger'
+# Saves wrote every custom property of a node, defaults included
+TIME_ELAPSED_DATA = {'time_number': '2', 'time_units': 'days'}
+
+
+def get_graph(database_connection_kwargs):
+    return HeadlessGraph(
+        account_id=ACCOUNT_ID,
+        workflow_category_id=WORKFLOW_CATEGORY_ID,
+        workflow_id=WORKFLOW_ID,
+        database_connection_kwargs=database_connection_kwargs
+    )
+
+
+def get_connections(graph):
+    return sorted(
+        (node.name(), downstream_node.name())
+        for node in graph.all_nodes()
+        for downstream_nodes in node.connected_output_nodes().values()
+        for downstream_node in downstream_nodes
+    )
+
+
+def insert_legacy_workflow(database_connection_kwargs):
+    """
+        Writes the rows that saves from before retired_version left behind: every node rewritten under a fresh
+        object_id at each version, and the previous version's rows deactivated without a retired_version.
+    """
+    node_rows = [
+        (1, 1, 'wait-v1', 'Wait', TIME_ELAPSED_TYPE, [], ['done-v1'], 'FALSE'),
+        (2, 1, 'done-v1', 'Done', MARKER_TYPE, ['wait-v1'], [], 'FALSE'),
+        (3, 2, 'wait-v2', 'Wait', TIME_ELAPSED_TYPE, [], ['wait-again-v2'], 'TRUE'),
+        (4, 2, 'wait-again-v2', 'Wait Again', TIME_ELAPSED_TYPE, ['wait-v2'], ['done-v2'], 'TRUE'),
+        (5, 2, 'done-v2', 'Done', MARKER_TYPE, ['wait-again-v2'], [], 'TRUE')
+    ]
+    insert_node_rows(database_connection_kwargs, [
+        {
+            'id': row_id,
+            'workflow_version': workflow_version,
+            'object_id': object_id,
+            'name': name,
+            'node_type': node_type,
+            'inputs': inputs,
+            'outputs': outputs,
+            'custom_data': TIME_ELAPSED_DATA if node_type == TIME_ELAPSED_TYPE else {},
+            'active': active
+        }
+        for row_id, workflow_version, object_id, name, node_type, inputs, outputs, active in node_rows
+    ])
+
+
+def test_load_legacy_workflow_versions(database_connection_kwargs):
+    insert_legacy_workflow(database_connection_kwargs)
+
+    graph = get_graph(database_connection_kwargs)
+    graph.load_graph_from_database(workflow_version=1)
+    assert get_connections(graph) == [('Wait', 'Done')]
+
+    for workflow_version in [2, None]:
+        graph = get_graph(database_connection_kwargs)
+        graph.load_graph_from_database(workflow_version=workflow_version)
+        assert get_connections(graph) == [('Wait', 'Wait Again'), ('Wait Again', 'Done')]
+
+
+def test_load_legacy_workflow_versions_after_save(database_connection_kwargs):
+    insert_legacy_workflow(database_connection_kwargs)
+
+    graph = get_graph(database_connection_kwargs)
+    graph.load_graph_from_database()
+    for node in graph.all_nodes():
+        if node.name() == 'Wait Again':
+            node.set_property('name', 'Wait Longer', push_undo=False)
+    assert graph.save_graph_to_database()['workflow_version'] == 3
+
+    expected_connections = {
+        1: [('Wait', 'Done')],
+        2: [('Wait', 'Wait Again'), ('Wait Again', 'Done')],
+        3: [('Wait', 'Wait Longer'), ('Wait Longer', 'Done')]
+    }
+    for workflow_version, connections in expected_connections.items():
+        graph = get_graph(database_connection_kwargs)
+        graph.load_graph_from_database(workflow_version=workflow_version)
+        assert get_connections(graph) == connections
+
+
+def test_save_unchanged_legacy_workflow(database_connection_kwargs):
+    insert_legacy_workflow(database_connection_kwargs)
+
+    graph = get_graph(database_connection_kwargs)
+    graph.load_graph_from_database()
+    save_stats = graph.save_graph_to_database()
+    assert save_stats['unchanged']
+    assert save_stats['workflow_version'] == 2
+    assert save_stats['rows_written'] == 0
+
+
+def unmigrate_versioning(database_connection_kwargs):
+    """
+        Takes the database back to before workflow versioning: no workflow_versions table, nor retired_version column.
+    """
+    with transaction(**database_connection_kwargs) as tx:
+        tx.run_query('DROP TABLE workflow_versions')
+        tx.run_query('ALTER TABLE workflow_nodes DROP COLUMN retired_version')
+
+
+def test_unmigrated_database_names_migrate_command(database_connection_kwargs):
+    graph = get_graph(database_connection_kwargs)
+    graph.create_node(TIME_ELAPSED_TYPE, name='Wait')
+    unmigrate_versioning(database_connection_kwargs)
+
+    with pytest.raises(ValueError, match=re.escape(MIGRATE_COMMAND)):
+        graph.save_graph_to_database()
+    with pytest.raises(ValueError, match='workflow_nodes.retired_version'):
+        get_graph(database_connection_kwargs).load_graph_from_database(workflow_version=1)
+
+    migrate_schema(app_data_path=APP_DATA_PATH, **database_connection_kwargs)
+    assert graph.save_graph_to_database()['workflow_version'] == 1
+
+
+def test_save_unchanged_legacy_workflow_on_unmigrated_database(database_connection_kwargs):
+    insert_legacy_workflow(database_connection_kwargs)
+    unmigrate_versioning(database_connection_kwargs)
+
+    graph = get_graph(database_connection_kwargs)
+    graph.load_graph_from_database()
+    with pytest.raises(ValueError, match=re.escape(MIGRATE_COMMAND)):
+        graph.save_graph_to_database()
+
+    migrate_schema(app_data_path=APP_DATA_PATH, **database_connection_kwargs)
+    save_stats = graph.save_graph_to_database()
+    assert save_stats['unchanged']
+    assert save_stats['workflow_version'] == 2
+
+
+def build_graph(database_connection_kwargs, connections):
+    """
+        Returns a graph of nodes named after the letters in connections, ['AB', ...] for A -> B, .... A is an API
+        trigger, the graph's entry point, and the rest are time elapsed triggers.
+    """
+    graph = get_graph(database_connection_kwargs)
+    nodes = {}
+    for name in sorted(set(''.join(connections))):
+        nodes[name] = graph.create_node(API_TRIGGER_TYPE if name == 'A' else TIME_ELAPSED_TYPE, name=name)
+    for upstream_name, downstream_name in connections:
+        nodes[downstream_name].set_input(0, nodes[upstream_name].output(0))
+    return graph
+
+
+def get_path_names(paths):
+    return sorted(''.join(node.name() for node in path) for path in paths)
+
+
+def test_get_paths_diamond(database_connection_kwargs):
+    graph = build_graph(database_connection_kwargs, ['AB', 'AC', 'BD', 'CD', 'DE'])
+    assert graph.count_paths() == 2
+    assert get_path_names(graph.get_paths()) == ['ABDE', 'ACDE']
+    assert get_path_names(graph.iter_paths()) == ['ABDE', 'ACDE']
+
+
+def test_get_paths_cap(database_connection_kwargs):
+    # Three diamonds in a row: 2 ** 3 paths
+    graph = build_graph(
+        database_connection_kwargs, ['AB', 'AC', 'BD', 'CD', 'DE', 'DF', 'EG', 'FG', 'GH', 'GI', 'HJ', 'IJ']
+    )
+    assert len(graph.get_paths(max_paths=8)) == 8
+    assert len(graph.get_paths(max_paths=None)) == 8
+    with pytest.raises(ValueError, match='8 paths'):
+        graph.get_paths(max_paths=7)
+
+
+def test_get_paths_cycle(database_connection_kwargs):
+    graph = build_graph(database_connection_kwargs, ['AB', 'BC', 'CB', 'CD', 'AE'])
+    with pytest.raises(ValueError, match='cycle'):
+        graph.count_paths()
+
+    assert get_path_names(graph.get_paths()) == ['ABCD', 'AE']
+    assert get_path_names(graph.get_paths(max_paths=2)) == ['ABCD', 'AE']
+    with pytest.raises(ValueError, match='more than max_paths'):
+        graph.get_paths(max_paths=1)
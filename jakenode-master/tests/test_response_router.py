@@ -0,0 +1,73 @@
+import logging
+
+import pytest
+
+from conftest import ACCOUNT_ID, WORKFLOW_ID, insert_node_rows
+from jakenode.response_router import ResponseRouter
+from shinewave_webapp.database_connector import transaction
+
+
+def insert_workflow(database_connection_kwargs):
+    insert_node_rows(database_connection_kwargs, [
+        {'id': 1, 'workflow_version': 1, 'object_id': 'sms', 'name': 'SMS', 'active': 'FALSE', 'retired_version': 2,
+         'node_type': 'nodes.outreach.SMSOutreach', 'outputs': ['yes']},
+        {'id': 2, 'workflow_version': 2, 'object_id': 'sms', 'name': 'SMS', 'active': 'TRUE',
+         'node_type': 'nodes.outreach.SMSOutreach', 'outputs': ['no', 'yes']},
+        {'id': 3, 'workflow_version': 1, 'object_id': 'yes', 'name': 'Yes', 'active': 'TRUE',
+         'node_type': 'nodes.trigger.ExactResponseReceivedTrigger', 'inputs': ['sms'],
+         'custom_data': {'exact_response': 'YES'}},
+        {'id': 4, 'workflow_version': 2, 'object_id': 'no', 'name': 'No', 'active': 'TRUE',
+         'node_type': 'nodes.trigger.FuzzyResponseReceivedTrigger', 'inputs': ['sms'],
+         'custom_data': {'response_template': 'No'}},
+        {'id': 5, 'workflow_version': 1, 'object_id': 'deleted-sms', 'name': 'Deleted SMS', 'active': 'FALSE',
+         'retired_version': 2, 'node_type': 'nodes.outreach.SMSOutreach'},
+        {'id': 6, 'workflow_version': 1, 'object_id': 'wait', 'name': 'Wait', 'active': 'TRUE',
+         'node_type': 'nodes.trigger.TimeElapsedTrigger'}
+    ])
+
+
+def insert_outreach_lists(database_connection_kwargs, outreach_list_rows):
+    """
+        Inserts [(recipient_id, current_node_id, active), ...] into outreach_lists for the test workflow.
+    """
+    with transaction(**database_connection_kwargs) as tx:
+        tx.bulk_insert(
+            'outreach_lists',
+            ['id', 'account_id', 'workflow_id', 'recipient_id', 'current_node_id', 'active'],
+            [[i, ACCOUNT_ID, WORKFLOW_ID, *outreach_list_row] for i, outreach_list_row in enumerate(outreach_list_rows)]
+        )
+
+
+def get_router(database_connection_kwargs):
+    router = ResponseRouter(workflow_id=WORKFLOW_ID, database_connection_kwargs=database_connection_kwargs)
+    router.load_routes_from_database()
+    return router
+
+
+def test_route_message(database_connection_kwargs):
+    insert_workflow(database_connection_kwargs)
+    insert_outreach_lists(database_connection_kwargs, [(100, 2, 'TRUE'), (101, 2, 'FALSE'), (102, 6, 'TRUE')])
+
+    router = get_router(database_connection_kwargs)
+    assert router.load_waiting_recipients() == []
+    assert router.waiting_object_ids == {100: 'sms'}
+
+    assert router.route_message(100, ' yes ') == 'yes'
+    assert router.route_message(100, 'No thanks') == 'no'
+    assert router.route_message(100, 'Who is this?') is None
+    assert router.route_message(101, 'yes') is None
+
+
+def test_load_waiting_recipients_skips_stale_nodes(database_connection_kwargs, caplog):
+    insert_workflow(database_connection_kwargs)
+    insert_outreach_lists(database_connection_kwargs, [(100, 2, 'TRUE'), (101, 5, 'TRUE'), (102, 999, 'TRUE')])
+
+    router = get_router(database_connection_kwargs)
+    with caplog.at_level(logging.WARNING):
+        assert sorted(router.load_waiting_recipients()) == [101, 102]
+    assert router.waiting_object_ids == {100: 'sms'}
+    assert 'Recipient 101' in caplog.text and 'Recipient 102' in caplog.text
+    assert router.route_message(100, 'YES') == 'yes'
+
+    with pytest.raises(ValueError):
+        router.set_waiting_node(101, 'deleted-sms')
@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from conftest import ACCOUNT_ID, WORKFLOW_CATEGORY_ID, WORKFLOW_ID
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+QtWidgets = pytest.importorskip('Qt.QtWidgets')
+
+from jakenode.graph_handler import GraphHandler  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def qt_application():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+@pytest.fixture
+def graph(qt_application, database_connection_kwargs):
+    graph = GraphHandler(
+        account_id=ACCOUNT_ID,
+        workflow_category_id=WORKFLOW_CATEGORY_ID,
+        workflow_id=WORKFLOW_ID,
+        database_connection_kwargs=database_connection_kwargs
+    )
+    yield graph
+    graph.stop_activity_heartbeat()
+
+
+def validate_every_node(graph):
+    """
+        Returns validate_nodes' results as a full validation would, without touching the graph's cached results.
+    """
+    validation_results = {}
+    for node in graph.all_nodes():
+        try:
+            node.validate_node()
+            validation_results[node.id] = None
+        except ValueError as e:
+            validation_results[node.id] = str(e)
+    return validation_results
+
+
+def assert_incremental_validation(graph):
+    assert graph.validate_nodes(full=False) == validate_every_node(graph)
+
+
+def test_incremental_validation_matches_full(graph):
+    api_trigger = graph.create_node('nodes.trigger.APITrigger', name='API')
+    sms = graph.create_node('nodes.outreach.SMSOutreach', name='SMS')
+    exact_response = graph.create_node('nodes.trigger.ExactResponseReceivedTrigger', name='Yes')
+    email = graph.create_node('nodes.outreach.EmailOutreach', name='Email')
+    converted = graph.create_node('nodes.marker.Converted', name='Converted')
+    assert_incremental_validation(graph)
+
+    api_trigger.output(0).connect_to(sms.input(0))
+    sms.output(0).connect_to(exact_response.input(0))
+    exact_response.output(0).connect_to(converted.input(0))
+    assert_incremental_validation(graph)
+
+    exact_response.set_property('exact_response', 'YES')
+    assert_incremental_validation(graph)
+
+    exact_response.output(0).connect_to(email.input(0))
+    assert_incremental_validation(graph)
+
+    sms.output(0).disconnect_from(exact_response.input(0))
+    assert_incremental_validation(graph)
+
+    sms.output(0).connect_to(exact_response.input(0))
+    exact_response.set_property('exact_response', '')
+    assert_incremental_validation(graph)
+
+    graph.delete_node(sms)
+    assert_incremental_validation(graph)
+
+    rebuild_count = graph.graph_index.rebuild_count
+    graph.undo_stack().undo()
+    assert len(graph.all_nodes()) == 5
+    assert_incremental_validation(graph)
+    assert graph.graph_index.rebuild_count > rebuild_count
+
+    graph.undo_stack().undo()
+    assert exact_response.get_property('exact_response') == 'YES'
+    assert_incremental_validation(graph)
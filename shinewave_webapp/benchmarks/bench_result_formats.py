@@ -0,0 +1,84 @@
+"""
+    Benchmark for run_query result formats. Loads a synthetic recipients-shaped table into a temporary sqlite database,
+    then times the original dict pivot against the columnar dict, 'dataframe' and 'recarray' formats, including the
+    pd.DataFrame(run_query(..., return_data_format=dict)) pattern that callers used before 'dataframe' existed.
+
+    Usage:
+        python benchmarks/bench_result_formats.py --rows 10000 1000000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+from time import perf_counter
+
+import pandas as pd
+
+from shinewave_webapp.database_connector import format_results, run_query
+
+
+COLUMNS = ['id', 'account_id', 'first_name', 'last_name', 'phone_number', 'active']
+
+
+def legacy_dict_pivot(rows, column_names):
+    """
+        The dict pivot that format_results replaced, kept here as the baseline.
+    """
+    results_dict = {}
+    for n, column_name in enumerate(column_names):
+        results_dict[column_name] = []
+        for row in rows:
+            results_dict[column_name].append(row[n])
+    return results_dict
+
+
+def build_database(database, row_count):
+    with sqlite3.connect(database) as conn:
+        conn.execute(
+            'CREATE TABLE recipients (id INTEGER, account_id INTEGER, first_name TEXT, last_name TEXT, '
+            'phone_number INTEGER, active TEXT)'
+        )
+        conn.executemany(
+            'INSERT INTO recipients VALUES (?, ?, ?, ?, ?, ?)',
+            ((i, i % 3, f'First{i}', f'Last{i}', 5550000000 + i, 'TRUE') for i in range(row_count))
+        )
+
+
+def time_call(function):
+    start = perf_counter()
+    function()
+    return perf_counter() - start
+
+
+def run_benchmark(row_counts):
+    for row_count in row_counts:
+        with tempfile.TemporaryDirectory() as temp_folder:
+            database = os.path.join(temp_folder, 'bench.db')
+            build_database(database, row_count)
+            query_kwargs = {'database_connection_type': 'sqlite', 'database': database}
+            sql = 'SELECT * FROM recipients'
+
+            rows = run_query(sql, return_data_format=list, **query_kwargs)
+
+            results = {
+                'fetch only (list)': time_call(lambda: run_query(sql, return_data_format=list, **query_kwargs)),
+                'legacy dict pivot': time_call(lambda: legacy_dict_pivot(rows, COLUMNS)),
+                'columnar dict': time_call(lambda: format_results(rows, COLUMNS, dict)),
+                'legacy dict -> DataFrame': time_call(lambda: pd.DataFrame(legacy_dict_pivot(rows, COLUMNS))),
+                "'dataframe'": time_call(lambda: format_results(rows, COLUMNS, 'dataframe')),
+                "'recarray'": time_call(lambda: format_results(rows, COLUMNS, 'recarray'))
+            }
+
+            print(f'\n{row_count:,} rows (formatting times exclude the fetch)')
+            print(f'{"format":<28}{"seconds":>10}{"rows/sec":>16}')
+            for name, seconds in results.items():
+                print(f'{name:<28}{seconds:>10.4f}{row_count / seconds:>16,.0f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '-r', '--rows', dest='rows', type=int, nargs='+', default=[10000, 1000000], help='Row counts to benchmark'
+    )
+    args = parser.parse_args()
+    run_benchmark(args.rows)
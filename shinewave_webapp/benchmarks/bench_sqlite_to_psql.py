@@ -0,0 +1,120 @@
+"""
+    Micro-benchmark for database_connector.sqlite_to_psql. Compares the original regex/str.format implementation, the
+    single-pass tokenizer, and the cached entry point that run_query uses.
+
+    Usage:
+        python benchmarks/bench_sqlite_to_psql.py --iterations 100000
+"""
+import argparse
+import re
+from timeit import timeit
+
+from shinewave_webapp.database_connector import sqlite_to_psql, translate_sqlite_to_psql
+
+
+SAMPLE_STATEMENTS = [
+    """
+        UPDATE workflow_routes SET last_activity = NOW()::timestamp
+        WHERE
+            account_id = ?
+            AND workflow_id = ?
+            AND active = 'TRUE'
+    """,
+    """
+        WITH filtered_workflow_nodes AS (
+            SELECT
+                wn.workflow_version,
+                wn.custom_data,
+                wn.workflow_id,
+                wn.node_type
+            FROM workflow_nodes wn
+            INNER JOIN workflows w ON
+                wn.workflow_id = w.id
+                AND wn.active = w.active
+            WHERE
+                wn.active = 'TRUE'
+                AND w.account_id = ?
+        )
+            SELECT
+                custom_data,
+                1 AS workflow_version
+            FROM filtered_workflow_nodes
+            WHERE
+                node_type = ?
+        UNION
+            SELECT
+                '{}' AS custom_data,
+                MAX(workflow_version) AS workflow_version
+            FROM filtered_workflow_nodes
+            WHERE workflow_id = ?
+    """,
+    """
+        SELECT t.id
+        FROM templates t
+        INNER JOIN workflow_categories wc ON
+            t.workflow_category_id=wc.id
+            AND t.account_id=wc.account_id
+        WHERE
+            t.account_id = ?
+            AND t.name=?
+            AND wc.name = ?
+            AND t.active = 'TRUE'
+            AND t.template_type = ?
+    """
+]
+
+
+def legacy_sqlite_to_psql(sql):
+    """
+        The implementation that sqlite_to_psql replaced, kept here as the baseline.
+    """
+    for char in '{}':
+        sql = sql.replace(char, char * 2)
+
+    master_quote_replacement_ptrn = r'(.*?\?)'
+    quote_replacement_types = [('double', '"'), ('single', "'")]
+    replacement_dict = {}
+
+    for pattern_name, replacement_type in quote_replacement_types:
+        replacement_ptrn = f'{replacement_type}{master_quote_replacement_ptrn}{replacement_type}'
+        replacements = re.findall(replacement_ptrn, sql)
+        replacement_count = 0
+        while replacements:
+            placeholder = f'{pattern_name}_{replacement_count}'
+            replacement_dict[placeholder] = replacements.pop(0)
+            sql = re.sub(replacement_ptrn, f'{replacement_type}{{{placeholder}}}{replacement_type}', sql, 1)
+            replacement_count += 1
+    sql = sql.replace('?', r'%s')
+    return sql.format(**replacement_dict)
+
+
+def run_benchmark(iterations):
+    implementations = [
+        ('legacy regex + str.format', legacy_sqlite_to_psql),
+        ('single-pass tokenizer', translate_sqlite_to_psql),
+        ('cached (sqlite_to_psql)', sqlite_to_psql)
+    ]
+
+    results = {}
+    for name, function in implementations:
+        def _run_statements(function=function):
+            for statement in SAMPLE_STATEMENTS:
+                function(statement)
+
+        seconds = timeit(_run_statements, number=iterations)
+        results[name] = seconds / (iterations * len(SAMPLE_STATEMENTS)) * 1e6
+
+    baseline = results['legacy regex + str.format']
+    print(f'{"implementation":<28}{"us/call":>12}{"speedup":>12}')
+    for name, microseconds in results.items():
+        print(f'{name:<28}{microseconds:>12.3f}{baseline / microseconds:>11.1f}x')
+    print(sqlite_to_psql.cache_info())
+
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--iterations', dest='iterations', type=int, default=20000, help='Calls per statement')
+    args = parser.parse_args()
+    run_benchmark(args.iterations)
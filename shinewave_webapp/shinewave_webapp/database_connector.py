@@ -1,14 +1,24 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import csv
 from datetime import datetime
+from functools import lru_cache
 import hashlib
-from itertools import chain
+from itertools import islice
+from operator import itemgetter
 import os
 from random import randint
 import re
 import sqlite3
+import threading
+from time import perf_counter
 
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine 
+from sqlalchemy import create_engine
+
+from shinewave_webapp import query_metrics
+from shinewave_webapp.table_schema import get_create_index_statements, get_create_table_statement, read_table_schemas
 
 
 """
@@ -28,6 +38,27 @@ PASSWORD = ''
 PORT = 5432
 USERNAME = ''
 
+# Connection pool settings, shared by every engine in the registry unless overridden per call
+POOL_SIZE = 5
+POOL_MAX_OVERFLOW = 10
+POOL_TIMEOUT = 30
+POOL_RECYCLE = 1800
+
+# Maximum number of distinct statements kept by the sqlite_to_psql translation cache
+SQL_TRANSLATION_CACHE_SIZE = 1024
+
+# Rows fetched per round-trip when run_query streams results (return_data_format='iterator')
+STREAM_BATCH_SIZE = 5000
+
+# Rows rendered (postgres COPY) or sent per executemany call (sqlite) by bulk_insert
+BULK_INSERT_CHUNK_SIZE = 5000
+
+# Table that emulates postgres sequences on sqlite, for allocate_ids
+SQLITE_SEQUENCE_TABLE = 'id_sequences'
+
+# Tables loaded concurrently by build_dummy_data on postgres (sqlite only allows one writer, so it loads serially)
+DUMMY_DATA_WORKERS = 4
+
 # Old Settings
 # DEFAULT_CONNECTION_TYPE = 'sqlite'
 # DATABASE = f'{APP_DATA_PATH}/test_db.db'
@@ -37,25 +68,43 @@ USERNAME = ''
 # USERNAME = None
 
 
+_SQL_TOKEN_PATTERN = re.compile(
+    r"""
+        '(?:[^']|'')*(?:'|\Z)      # single-quoted string literal
+        | "(?:[^"]|"")*(?:"|\Z)    # double-quoted identifier
+        | --[^\n]*                 # line comment
+        | /\*.*?(?:\*/|\Z)         # block comment
+        | \?                       # sqlite-style placeholder
+        | %                        # literal percent sign
+    """,
+    re.VERBOSE | re.DOTALL
+)
+
+
+def _translate_sql_token(match):
+    token = match.group(0)
+    if token == '?':
+        return '%s'
+    return token.replace('%', '%%')
+
+
+def translate_sqlite_to_psql(sql):
+    """
+        Converts a sqlite-style statement to psycopg2 paramstyle in a single pass. Placeholders ("?") are converted to
+        "%s" unless they fall inside a string literal, quoted identifier or comment. Literal "%" characters are doubled
+        everywhere, since psycopg2 interpolates the whole statement whenever parameters are passed.
+    """
+    return _SQL_TOKEN_PATTERN.sub(_translate_sql_token, sql)
+
+
+@lru_cache(maxsize=SQL_TRANSLATION_CACHE_SIZE)
 def sqlite_to_psql(sql):
-    for char in '{}':
-        sql = sql.replace(char, char * 2)
-
-    master_quote_replacement_ptrn = r'(.*?\?)'
-    quote_replacement_types = [('double', '"'), ('single', "'")]
-    replacement_dict = {}
-
-    for pattern_name, replacement_type in quote_replacement_types:
-        replacement_ptrn = f'{replacement_type}{master_quote_replacement_ptrn}{replacement_type}'
-        replacements = re.findall(replacement_ptrn, sql)
-        replacement_count = 0
-        while replacements:
-            placeholder = f'{pattern_name}_{replacement_count}'
-            replacement_dict[placeholder] = replacements.pop(0)
-            sql = re.sub(replacement_ptrn, f'{replacement_type}{{{placeholder}}}{replacement_type}', sql, 1)
-            replacement_count += 1
-    sql = sql.replace('?', r'%s')
-    return sql.format(**replacement_dict)
+    """
+        Cached wrapper around translate_sqlite_to_psql. Most statements are literal SQL that is re-run many times, so
+        translations are kept in a bounded LRU keyed by the source statement. Use sqlite_to_psql.cache_info() for hit
+        and miss counts.
+    """
+    return translate_sqlite_to_psql(sql)
 
 
 def get_random_key(value_list, random_value_digits=7):
@@ -76,6 +125,143 @@ def get_random_key(value_list, random_value_digits=7):
     return sha_key.hexdigest()
 
 
+_engine_registry = {}
+_engine_registry_lock = threading.Lock()
+_sqlite_local = threading.local()
+_sqlite_stats = {'connections_opened': 0, 'connections_reused': 0}
+_sqlite_stats_lock = threading.Lock()
+
+
+def get_engine(
+    database=DATABASE,
+    host=HOST,
+    password=PASSWORD,
+    port=PORT,
+    username=USERNAME,
+    pool_size=POOL_SIZE,
+    max_overflow=POOL_MAX_OVERFLOW
+):
+    """
+        Returns the process-wide SQLAlchemy engine for the given connection parameters, creating it on first use.
+        Engines hold a bounded connection pool, and connections are pinged before being handed out so that stale
+        connections (e.g. after a database restart) are replaced transparently.
+    """
+    registry_key = (host, port, database, username, password, pool_size, max_overflow)
+    engine = _engine_registry.get(registry_key)
+    if engine is not None:
+        return engine
+
+    with _engine_registry_lock:
+        engine = _engine_registry.get(registry_key)
+        if engine is None:
+            db_string = f"postgresql+psycopg2://{username}:{password}@{host}:{port}/{database}"
+            engine = create_engine(
+                db_string,
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+                pool_timeout=POOL_TIMEOUT,
+                pool_recycle=POOL_RECYCLE,
+                pool_pre_ping=True
+            )
+            _engine_registry[registry_key] = engine
+    return engine
+
+
+def get_sqlite_conn(database=DATABASE):
+    """
+        Returns a sqlite connection owned by the calling thread, reusing it across calls. sqlite connections cannot be
+        shared between threads, so each thread keeps its own connection per database file.
+    """
+    connections = getattr(_sqlite_local, 'connections', None)
+    if connections is None:
+        connections = _sqlite_local.connections = {}
+
+    conn = connections.get(database)
+    with _sqlite_stats_lock:
+        if conn is None:
+            _sqlite_stats['connections_opened'] += 1
+        else:
+            _sqlite_stats['connections_reused'] += 1
+
+    if conn is None:
+        conn = sqlite3.connect(database)
+        connections[database] = conn
+    return conn
+
+
+def close_sqlite_conns():
+    """
+        Closes every sqlite connection owned by the calling thread.
+    """
+    connections = getattr(_sqlite_local, 'connections', {})
+    while connections:
+        database, conn = connections.popitem()
+        conn.close()
+
+
+def dispose_engines():
+    """
+        Closes all pooled connections and empties the engine registry. Call this after forking, or on shutdown.
+    """
+    with _engine_registry_lock:
+        for engine in _engine_registry.values():
+            engine.dispose()
+        _engine_registry.clear()
+    close_sqlite_conns()
+
+
+def get_pool_stats():
+    """
+        Returns a snapshot of connection usage, in the following format:
+            {
+                'postgres': {
+                    <username@host:port/database>: {
+                        'pool_size': int,
+                        'max_overflow': int,
+                        'checked_in': int,
+                        'checked_out': int,
+                        'overflow': int
+                    }
+                },
+                'sqlite': {'connections_opened': int, 'connections_reused': int}
+            }
+    """
+    postgres_stats = {}
+    with _engine_registry_lock:
+        registry_items = list(_engine_registry.items())
+
+    for registry_key, engine in registry_items:
+        host, port, database, username, password, pool_size, max_overflow = registry_key
+        pool = engine.pool
+        postgres_stats[f'{username}@{host}:{port}/{database}'] = {
+            'pool_size': pool_size,
+            'max_overflow': max_overflow,
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow()
+        }
+
+    with _sqlite_stats_lock:
+        sqlite_stats = dict(_sqlite_stats)
+
+    return {'postgres': postgres_stats, 'sqlite': sqlite_stats}
+
+
+# Sequences already brought up to date with their table's MAX(id) by this process, keyed by (connection_key, table)
+_synced_sequences = set()
+_synced_sequences_lock = threading.Lock()
+
+
+def get_query_metrics():
+    """
+        Returns the query_metrics snapshot (per-fingerprint latency histograms, row counts and connection-acquire
+        times) together with get_pool_stats(), for exposing as a metrics endpoint.
+    """
+    metrics = query_metrics.get_snapshot()
+    metrics['pools'] = get_pool_stats()
+    return metrics
+
+
 def get_conn(
     database_connection_type=DEFAULT_CONNECTION_TYPE,
     database=DATABASE,
@@ -84,11 +270,14 @@ def get_conn(
     port=PORT,
     username=USERNAME
 ):
+    """
+        Returns a connection that the caller owns and must close. Postgres connections are checked out of the shared
+        pool and returned to it on close; sqlite connections are opened fresh, since callers close them.
+    """
     if database_connection_type == 'sqlite':
         return sqlite3.connect(database)
     elif database_connection_type == 'postgres':
-        db_string = f"postgresql+psycopg2://{username}:{password}@{host}:{port}/{database}"
-        db = create_engine(db_string)
+        db = get_engine(database=database, host=host, password=password, port=port, username=username)
         return db.connect()
 
 
@@ -103,40 +292,81 @@ def run_query(
     port=PORT,
     username=USERNAME,
     sql_parameters=[],
-    print_debug_info=False
+    print_debug_info=False,
+    pool_size=POOL_SIZE,
+    max_overflow=POOL_MAX_OVERFLOW,
+    batch_size=STREAM_BATCH_SIZE
 ):
+    if return_data_format == 'iterator':
+        return iterate_query(
+            sql,
+            database_connection_type=database_connection_type,
+            database=database,
+            host=host,
+            password=password,
+            port=port,
+            username=username,
+            sql_parameters=sql_parameters,
+            print_debug_info=print_debug_info,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            batch_size=batch_size
+        )
+
     exception = None
     rows = []
     column_names = []
+    start_time = perf_counter()
+    acquire_seconds = 0.0
     try:
         if database_connection_type == 'sqlite':
-            with sqlite3.connect(database) as conn:
+            conn = get_sqlite_conn(database)
+            acquire_seconds = perf_counter() - start_time
+            with conn:
                 cur = conn.cursor()
                 cur.execute(sql, sql_parameters)
 
                 if commit:
                     conn.commit()
-                    return None
-
-                rows = cur.fetchall()
-                column_names = [i[0] for i in cur.description]
+                else:
+                    rows = cur.fetchall()
+                    column_names = [i[0] for i in cur.description]
         elif database_connection_type == 'postgres':
             sql = sqlite_to_psql(sql)
-            db_string = f"postgresql+psycopg2://{username}:{password}@{host}:{port}/{database}"
-            db = create_engine(db_string)
-            with db.connect() as conn:
+            db = get_engine(
+                database=database,
+                host=host,
+                password=password,
+                port=port,
+                username=username,
+                pool_size=pool_size,
+                max_overflow=max_overflow
+            )
+            conn = db.connect()
+            acquire_seconds = perf_counter() - start_time
+            with conn:
                 results = conn.execute(sql, sql_parameters, commit=commit)
 
-                if commit:
-                    return None
-
-                rows = results.fetchall()
-                column_names = list(results.keys())
+                if not commit:
+                    rows = results.fetchall()
+                    column_names = list(results.keys())
         else:
             raise ValueError("Parameter database_connection_type must be either 'postgres' or 'sqlite'.")
     except Exception as e:
         exception = e
 
+    query_metrics.record_query(
+        sql,
+        perf_counter() - start_time,
+        rows=len(rows),
+        acquire_seconds=acquire_seconds,
+        database_connection_type=database_connection_type,
+        error=exception
+    )
+
+    if commit and exception is None:
+        return None
+
     if print_debug_info:
         for debug_component in [sql, sql_parameters, rows, column_names]:
             print(str(debug_component)[:1000])
@@ -144,88 +374,615 @@ def run_query(
     if exception is not None:
         raise exception
 
+    return format_results(rows, column_names, return_data_format)
+
+
+def iterate_query(
+    sql,
+    database_connection_type=DEFAULT_CONNECTION_TYPE,
+    database=DATABASE,
+    host=HOST,
+    password=PASSWORD,
+    port=PORT,
+    username=USERNAME,
+    sql_parameters=[],
+    print_debug_info=False,
+    pool_size=POOL_SIZE,
+    max_overflow=POOL_MAX_OVERFLOW,
+    batch_size=STREAM_BATCH_SIZE
+):
+    """
+        Generator that yields result rows one at a time, holding at most batch_size rows in memory. On postgres this
+        uses a named server-side cursor; on sqlite it uses fetchmany on a dedicated connection, so that a long scan
+        doesn't share a transaction with other queries on the thread's pooled connection. The query runs on the first
+        call to next(), and the connection is released when the generator is exhausted or closed.
+        The latency recorded in query_metrics covers the whole iteration, including time spent by the consumer.
+    """
+    if print_debug_info:
+        for debug_component in [sql, sql_parameters]:
+            print(str(debug_component)[:1000])
+
+    if database_connection_type not in ['sqlite', 'postgres']:
+        raise ValueError("Parameter database_connection_type must be either 'postgres' or 'sqlite'.")
+
+    exception = None
+    row_count = 0
+    start_time = perf_counter()
+    acquire_seconds = 0.0
+    try:
+        if database_connection_type == 'sqlite':
+            conn = sqlite3.connect(database)
+            acquire_seconds = perf_counter() - start_time
+            try:
+                cur = conn.cursor()
+                cur.arraysize = batch_size
+                cur.execute(sql, sql_parameters)
+                rows = cur.fetchmany()
+                while rows:
+                    row_count += len(rows)
+                    yield from rows
+                    rows = cur.fetchmany()
+            finally:
+                conn.close()
+        else:
+            sql = sqlite_to_psql(sql)
+            db = get_engine(
+                database=database,
+                host=host,
+                password=password,
+                port=port,
+                username=username,
+                pool_size=pool_size,
+                max_overflow=max_overflow
+            )
+            conn = db.connect()
+            acquire_seconds = perf_counter() - start_time
+            with conn:
+                results = conn.execution_options(stream_results=True, max_row_buffer=batch_size).execute(
+                    sql, sql_parameters, commit=False
+                )
+                try:
+                    rows = results.fetchmany(batch_size)
+                    while rows:
+                        row_count += len(rows)
+                        yield from rows
+                        rows = results.fetchmany(batch_size)
+                finally:
+                    results.close()
+    except Exception as e:
+        exception = e
+        raise
+    finally:
+        query_metrics.record_query(
+            sql,
+            perf_counter() - start_time,
+            rows=row_count,
+            acquire_seconds=acquire_seconds,
+            database_connection_type=database_connection_type,
+            error=exception
+        )
+
+
+def format_results(rows, column_names, return_data_format=list):
+    """
+        Shapes fetched rows into the requested format:
+            list: the rows as returned by the cursor
+            dict: {<column_name>: [<value>, ...]}
+            'dataframe': a pandas DataFrame
+            'recarray': a numpy record array, with one field per column
+        run_query handles 'iterator' itself, by returning iterate_query(...) instead of fetching every row.
+        Columns are built with one C-level pass per column (map/itemgetter), rather than a Python loop over every
+        column and row.
+    """
     if return_data_format is list:
         return rows
+    elif return_data_format == 'dataframe':
+        return pd.DataFrame.from_records(rows, columns=column_names)
 
-    elif return_data_format is dict:
-        results_dict = {}
-        for n, column_name in enumerate(column_names):
-            results_dict[column_name] = []
-            for row in rows:
-                results_dict[column_name].append(row[n])
-        return results_dict
+    columns = [list(map(itemgetter(n), rows)) for n in range(len(column_names))]
 
+    if return_data_format is dict:
+        return dict(zip(column_names, columns))
+    elif return_data_format == 'recarray':
+        return np.rec.fromarrays([np.asarray(column) for column in columns], names=column_names)
+    else:
+        raise ValueError("Parameter return_data_format must be one of list, dict, 'dataframe' or 'recarray'.")
 
 
-def build_dummy_data(
+_COPY_TEXT_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def _to_copy_text(row):
+    values = ['\\N' if value is None else str(value).translate(_COPY_TEXT_ESCAPES) for value in row]
+    return '\t'.join(values) + '\n'
+
+
+class CopyRowReader():
+    """
+        Read-only file-like object that renders rows into postgres COPY text format on demand, so that COPY FROM STDIN
+        can stream an iterable of rows without building the whole payload in memory.
+    """
+
+    def __init__(self, rows, chunk_size=BULK_INSERT_CHUNK_SIZE):
+        self.rows = iter(rows)
+        self.chunk_size = chunk_size
+        self.row_count = 0
+        self.buffer = ''
+        self.buffer_position = 0
+
+    def _fill_buffer(self):
+        chunk = list(islice(self.rows, self.chunk_size))
+        self.row_count += len(chunk)
+        self.buffer = ''.join([_to_copy_text(row) for row in chunk])
+        self.buffer_position = 0
+
+    def read(self, size=-1):
+        if self.buffer_position >= len(self.buffer):
+            self._fill_buffer()
+
+        if size is None or size < 0:
+            size = len(self.buffer)
+
+        data = self.buffer[self.buffer_position:self.buffer_position + size]
+        self.buffer_position += size
+        return data
+
+
+class Transaction():
+    """
+        Unit of work yielded by transaction(). Every statement runs on the same connection, and nothing is committed
+        until the with block exits cleanly; an exception rolls back everything run through the transaction.
+    """
+
+    def __init__(self, conn, database_connection_type, print_debug_info=False, connection_key=None):
+        self.conn = conn
+        self.database_connection_type = database_connection_type
+        self.print_debug_info = print_debug_info
+        self.connection_key = connection_key
+        self.synced_sequences = set()
+
+    def run_query(self, sql, return_data_format=list, sql_parameters=[], print_debug_info=False):
+        """
+            Same as database_connector.run_query, minus the connection and commit arguments. Statements that return no
+            rows (UPDATE, INSERT, ...) return None.
+        """
+        if self.database_connection_type == 'postgres':
+            sql = sqlite_to_psql(sql)
+
+        exception = None
+        rows = None
+        start_time = perf_counter()
+        cur = self.conn.cursor()
+        try:
+            cur.execute(sql, list(sql_parameters))
+            if cur.description is None:
+                column_names = []
+            else:
+                rows = cur.fetchall()
+                column_names = [i[0] for i in cur.description]
+        except Exception as e:
+            exception = e
+            raise
+        finally:
+            cur.close()
+            query_metrics.record_query(
+                sql,
+                perf_counter() - start_time,
+                rows=len(rows) if rows else 0,
+                database_connection_type=self.database_connection_type,
+                error=exception
+            )
+
+        if print_debug_info or self.print_debug_info:
+            for debug_component in [sql, sql_parameters, rows, column_names]:
+                print(str(debug_component)[:1000])
+
+        if rows is None:
+            return None
+        return format_results(rows, column_names, return_data_format)
+
+    def bulk_insert(self, table, columns, rows, chunk_size=BULK_INSERT_CHUNK_SIZE):
+        """
+            Same as database_connector.bulk_insert, minus the connection arguments. Rows become visible to other
+            connections when the transaction commits.
+        """
+        start_time = perf_counter()
+        column_clause = f" ({', '.join(columns)})" if columns else ''
+
+        exception = None
+        row_count = 0
+        cur = self.conn.cursor()
+        try:
+            if self.database_connection_type == 'sqlite':
+                insert_statement = f'INSERT INTO {table}{column_clause} VALUES (?)'
+                rows = iter(rows)
+                chunk = list(islice(rows, chunk_size))
+                if chunk:
+                    placeholders = ', '.join(['?'] * len(chunk[0]))
+                    insert_statement = f'INSERT INTO {table}{column_clause} VALUES ({placeholders})'
+                    while chunk:
+                        cur.executemany(insert_statement, chunk)
+                        row_count += len(chunk)
+                        chunk = list(islice(rows, chunk_size))
+            else:
+                insert_statement = f'COPY {table}{column_clause} FROM STDIN'
+                row_reader = CopyRowReader(rows, chunk_size=chunk_size)
+                cur.copy_expert(insert_statement, row_reader, size=65536)
+                row_count = row_reader.row_count
+        except Exception as e:
+            exception = e
+            raise
+        finally:
+            cur.close()
+            query_metrics.record_query(
+                insert_statement,
+                perf_counter() - start_time,
+                rows=row_count,
+                database_connection_type=self.database_connection_type,
+                error=exception
+            )
+
+        return self._get_insert_stats(table, row_count, start_time)
+
+    def bulk_load_csv(self, table, csv_path, chunk_size=BULK_INSERT_CHUNK_SIZE):
+        """
+            Loads a CSV file whose first row holds column names. Empty fields are loaded as NULL. On postgres the file
+            is streamed straight into COPY ... (FORMAT csv), so rows are parsed by the server and never pass through
+            Python; on sqlite it is read with csv.reader and sent through bulk_insert.
+            Returns the same stats as bulk_insert.
+        """
+        with open(csv_path, newline='') as csv_file:
+            reader = csv.reader(csv_file)
+            columns = next(reader, None)
+            if not columns:
+                return self._get_insert_stats(table, 0, perf_counter())
+
+            if self.database_connection_type == 'sqlite':
+                rows = ([i if i != '' else None for i in row] for row in reader)
+                return self.bulk_insert(table, columns, rows, chunk_size=chunk_size)
+
+            start_time = perf_counter()
+            copy_statement = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, HEADER true)"
+            csv_file.seek(0)
+
+            exception = None
+            row_count = 0
+            cur = self.conn.cursor()
+            try:
+                cur.copy_expert(copy_statement, csv_file, size=65536)
+                row_count = cur.rowcount
+            except Exception as e:
+                exception = e
+                raise
+            finally:
+                cur.close()
+                query_metrics.record_query(
+                    copy_statement,
+                    perf_counter() - start_time,
+                    rows=row_count,
+                    database_connection_type=self.database_connection_type,
+                    error=exception
+                )
+
+        return self._get_insert_stats(table, row_count, start_time)
+
+    def _get_insert_stats(self, table, row_count, start_time):
+        seconds = perf_counter() - start_time
+        insert_stats = {
+            'table': table,
+            'rows': row_count,
+            'seconds': seconds,
+            'rows_per_second': row_count / seconds if seconds else 0.0
+        }
+
+        if self.print_debug_info:
+            rows_per_second = insert_stats['rows_per_second']
+            print(f'{table}: inserted {row_count} rows in {seconds:.3f}s ({rows_per_second:,.0f} rows/sec)')
+
+        return insert_stats
+
+    def _sync_sequence(self, table):
+        """
+            Creates the table's sequence if needed, and moves it past MAX(id) if rows were inserted without it (legacy
+            rows, dummy data, ...). Runs once per table per process, so the MAX(id) aggregate isn't repeated on every
+            allocation. The sync is only recorded process-wide once the transaction commits.
+        """
+        sync_key = (self.connection_key, table)
+        with _synced_sequences_lock:
+            if sync_key in _synced_sequences or sync_key in self.synced_sequences:
+                return
+
+        if self.database_connection_type == 'postgres':
+            sequence = f'{table}_id_seq'
+            self.run_query(f'CREATE SEQUENCE IF NOT EXISTS {sequence}')
+            self.run_query(
+                f"""
+                    SELECT setval('{sequence}', t.max_id)
+                    FROM
+                        (SELECT MAX(id) AS max_id FROM {table}) t,
+                        {sequence} s
+                    WHERE t.max_id > CASE WHEN s.is_called THEN s.last_value ELSE s.last_value - 1 END
+                """
+            )
+        else:
+            self.run_query(
+                f'CREATE TABLE IF NOT EXISTS {SQLITE_SEQUENCE_TABLE} (table_name TEXT PRIMARY KEY, last_value INTEGER)'
+            )
+            self.run_query(
+                f'INSERT OR IGNORE INTO {SQLITE_SEQUENCE_TABLE} (table_name, last_value) VALUES (?, 0)',
+                sql_parameters=[table]
+            )
+            self.run_query(
+                f"""
+                    UPDATE {SQLITE_SEQUENCE_TABLE}
+                    SET last_value = MAX(last_value, (SELECT COALESCE(MAX(id), 0) FROM {table}))
+                    WHERE table_name = ?
+                """,
+                sql_parameters=[table]
+            )
+
+        self.synced_sequences.add(sync_key)
+
+    def allocate_ids(self, table, count):
+        """
+            Same as database_connector.allocate_ids, minus the connection arguments. On postgres the IDs are drawn from
+            the sequence immediately and are never handed out twice, even if the transaction rolls back; on sqlite the
+            emulated sequence is updated inside the transaction.
+        """
+        if not re.fullmatch(r'\w+', table):
+            raise ValueError(f'Invalid table name: {table}')
+        if count < 1:
+            return []
+
+        self._sync_sequence(table)
+
+        if self.database_connection_type == 'postgres':
+            allocated_ids = self.run_query(
+                f"SELECT nextval('{table}_id_seq') FROM generate_series(1, ?)",
+                sql_parameters=[count]
+            )
+            return sorted(i[0] for i in allocated_ids)
+        else:
+            self.run_query(
+                f'UPDATE {SQLITE_SEQUENCE_TABLE} SET last_value = last_value + ? WHERE table_name = ?',
+                sql_parameters=[count, table]
+            )
+            last_value = self.run_query(
+                f'SELECT last_value FROM {SQLITE_SEQUENCE_TABLE} WHERE table_name = ?',
+                sql_parameters=[table]
+            )[0][0]
+            return list(range(last_value - count + 1, last_value + 1))
+
+
+@contextmanager
+def transaction(
     database_connection_type=DEFAULT_CONNECTION_TYPE,
     database=DATABASE,
     host=HOST,
     password=PASSWORD,
     port=PORT,
     username=USERNAME,
-    app_data_path=APP_DATA_PATH
+    print_debug_info=False
 ):
+    """
+        Runs several statements on one connection and commits them once:
+            with database_connector.transaction() as tx:
+                tx.run_query(...)
+                tx.bulk_insert(...)
+        On postgres the connection is checked out of the shared pool for the duration of the block. On sqlite the
+        thread's pooled connection is used, with an explicit BEGIN so that reads are covered by the transaction too;
+        plain run_query calls made inside the block share that connection, and will commit it early.
+    """
+    if database_connection_type == 'sqlite':
+        conn = get_sqlite_conn(database)
+        conn.execute('BEGIN')
+    elif database_connection_type == 'postgres':
+        conn = get_engine(database=database, host=host, password=password, port=port, username=username)
+        conn = conn.raw_connection()
+    else:
+        raise ValueError("Parameter database_connection_type must be either 'postgres' or 'sqlite'.")
+
+    tx = Transaction(
+        conn,
+        database_connection_type,
+        print_debug_info=print_debug_info,
+        connection_key=(database_connection_type, host, port, database)
+    )
+    try:
+        yield tx
+        conn.commit()
+        with _synced_sequences_lock:
+            _synced_sequences.update(tx.synced_sequences)
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        if database_connection_type == 'postgres':
+            conn.close()
+
+
+def bulk_insert(
+    table,
+    columns,
+    rows,
+    database_connection_type=DEFAULT_CONNECTION_TYPE,
+    database=DATABASE,
+    host=HOST,
+    password=PASSWORD,
+    port=PORT,
+    username=USERNAME,
+    chunk_size=BULK_INSERT_CHUNK_SIZE,
+    print_debug_info=False
+):
+    """
+        Inserts an iterable of rows into a table in a single transaction. On postgres the rows are streamed through
+        COPY FROM STDIN; on sqlite they are sent through executemany, chunk_size rows at a time. Either way, only one
+        chunk of rows is held in memory, and no statement grows with the row count.
+        Parameters
+        ----------
+        table : str
+        columns : list or None
+            Column names, in the same order as the values in each row. If None, rows must supply every column of the
+            table, in table order.
+        rows : iterable
+            Sequences of values. None is inserted as NULL.
+        Returns
+        -------
+        dict: {'table': str, 'rows': int, 'seconds': float, 'rows_per_second': float}
+    """
+    transaction_kwargs = {
+        'database_connection_type': database_connection_type,
+        'database': database,
+        'host': host,
+        'password': password,
+        'port': port,
+        'username': username,
+        'print_debug_info': print_debug_info
+    }
+
+    with transaction(**transaction_kwargs) as tx:
+        return tx.bulk_insert(table, columns, rows, chunk_size=chunk_size)
+
+
+def allocate_ids(
+    table,
+    count,
+    database_connection_type=DEFAULT_CONNECTION_TYPE,
+    database=DATABASE,
+    host=HOST,
+    password=PASSWORD,
+    port=PORT,
+    username=USERNAME
+):
+    """
+        Replacement for SELECT MAX(id) + 1: reserves a block of count new IDs for a table in one round-trip, and returns
+        them as a sorted list. Postgres uses a sequence named <table>_id_seq; sqlite emulates one with a row in
+        SQLITE_SEQUENCE_TABLE. Either is created on first use and started after the table's current MAX(id).
+        Concurrent callers never receive the same ID, but IDs are not guaranteed to be contiguous on postgres.
+        Use Transaction.allocate_ids to allocate inside an open transaction.
+    """
+    transaction_kwargs = {
+        'database_connection_type': database_connection_type,
+        'database': database,
+        'host': host,
+        'password': password,
+        'port': port,
+        'username': username
+    }
+
+    with transaction(**transaction_kwargs) as tx:
+        return tx.allocate_ids(table, count)
+
+
+def allocate_id(
+    table,
+    database_connection_type=DEFAULT_CONNECTION_TYPE,
+    database=DATABASE,
+    host=HOST,
+    password=PASSWORD,
+    port=PORT,
+    username=USERNAME
+):
+    return allocate_ids(
+        table,
+        1,
+        database_connection_type=database_connection_type,
+        database=database,
+        host=host,
+        password=password,
+        port=port,
+        username=username
+    )[0]
+
+
+def load_dummy_table(schema, data_path, connection_kwargs):
+    """
+        Recreates one table, loads its data file (if there is one), and only then builds the table's indexes.
+        Returns {'table': str, 'rows': int, 'create_seconds': float, 'load_seconds': float, 'index_seconds': float}
+    """
+    table_name = schema['table_name']
+    table_timing = {'table': table_name, 'rows': 0}
+
+    start_time = perf_counter()
+    for statement in [f'DROP TABLE IF EXISTS {table_name};', get_create_table_statement(schema)]:
+        run_query(statement, commit=True, **connection_kwargs)
+    table_timing['create_seconds'] = perf_counter() - start_time
+
+    start_time = perf_counter()
+    if os.path.exists(data_path):
+        with transaction(**connection_kwargs) as tx:
+            table_timing['rows'] = tx.bulk_load_csv(table_name, data_path)['rows']
+    table_timing['load_seconds'] = perf_counter() - start_time
+
+    start_time = perf_counter()
+    for index_statement in get_create_index_statements(schema):
+        run_query(index_statement, commit=True, **connection_kwargs)
+    table_timing['index_seconds'] = perf_counter() - start_time
+
+    return table_timing
 
+
+def build_dummy_data(
+    database_connection_type=DEFAULT_CONNECTION_TYPE,
+    database=DATABASE,
+    host=HOST,
+    password=PASSWORD,
+    port=PORT,
+    username=USERNAME,
+    app_data_path=APP_DATA_PATH,
+    max_workers=DUMMY_DATA_WORKERS,
+    print_debug_info=True
+):
+    """
+        Recreates every table described in <app_data_path>/table_csvs and loads its <table>_data.csv. On postgres, up
+        to max_workers tables load at once, each on its own pooled connection, largest data file first; sqlite loads
+        one table at a time. Indexes are created after each table's data is in.
+        Returns a list of per-table timings, in the format of load_dummy_table.
+    """
     table_csv_path = f'{app_data_path}/table_csvs'
-    schema_files = []
-    data_files = []
-
-    for folder, subfolders, files in os.walk(table_csv_path):
-        for filename in files:
-            if filename.endswith('_data.csv'):
-                data_files.append(filename)
-            elif filename.endswith('.csv'):
-                schema_files.append(filename)
-
-    for schema_filename in schema_files:
-        table_name = schema_filename.rsplit('.csv', 1)[0]
-        data_filename = f'{table_name}_data.csv'
-        df = pd.read_csv(f'{table_csv_path}/{schema_filename}')
-        df = df.unstack().unstack()
-        df.columns = ['col_type']
-
-        create_statement_rows = []
-        insert_statement_rows = []
-
-        drop_statement = f'DROP TABLE IF EXISTS {table_name};'
-        for i in df.index:
-            create_statement_rows.append(f"    {i} {df.loc[i,'col_type']}")
-        create_statement_rows = ',\n'.join(create_statement_rows)
-        create_statement = f'CREATE TABLE {table_name} (\n{create_statement_rows}\n);'
-
-        if data_filename in data_files:
-            rows = []
-            with open(f'{table_csv_path}/{data_filename}', newline='') as csvfile:
-                reader = csv.reader(csvfile)
-                for row in reader:
-                    rows.append(row)
-                    placeholder = ['?' for i in row]
-                    placeholder = ', '.join(placeholder)
-                    placeholder = f"({placeholder})"
-                    insert_statement_rows.append(placeholder)
-            insert_statement_rows = insert_statement_rows[1:]
-            insert_statement_rows = ',\n'.join(insert_statement_rows)
-            insert_statement = f'INSERT INTO {table_name} VALUES\n{insert_statement_rows}\n;'
-            rows = rows[1:]
-            rows = list(chain(*rows))
-            rows = [i if i != '' else None for i in rows]
-        else:
-            insert_statement = ''
-            rows = []
-
-        run_query_kwargs = {
-            'commit': True,
-            'database_connection_type': database_connection_type,
-            'database': database,
-            'host': host,
-            'password': password,
-            'port': port,
-            'username': username,
-            'print_debug_info': True,
-            'sql_parameters': rows
-        }
+    schemas = read_table_schemas(table_csv_path)
+
+    connection_kwargs = {
+        'database_connection_type': database_connection_type,
+        'database': database,
+        'host': host,
+        'password': password,
+        'port': port,
+        'username': username
+    }
+
+    load_jobs = []
+    for table_name, schema in schemas.items():
+        data_path = f'{table_csv_path}/{table_name}_data.csv'
+        data_size = os.path.getsize(data_path) if os.path.exists(data_path) else 0
+        load_jobs.append((data_size, schema, data_path))
+    load_jobs.sort(key=itemgetter(0), reverse=True)
+
+    if database_connection_type == 'sqlite':
+        max_workers = 1
+
+    start_time = perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(load_dummy_table, schema, data_path, connection_kwargs)
+            for data_size, schema, data_path in load_jobs
+        ]
+        table_timings = [future.result() for future in futures]
+    total_seconds = perf_counter() - start_time
 
-        for statement in [drop_statement, create_statement, insert_statement]:
-            if statement:
-                run_query(statement, **run_query_kwargs)
+    # Tables were reloaded with explicit IDs, so sequences must be checked against MAX(id) again
+    with _synced_sequences_lock:
+        _synced_sequences.clear()
+
+    if print_debug_info:
+        print(f'{"table":<28}{"rows":>10}{"create":>10}{"load":>10}{"index":>10}{"rows/sec":>14}')
+        for table_timing in table_timings:
+            load_seconds = table_timing['load_seconds']
+            rows_per_second = table_timing['rows'] / load_seconds if load_seconds else 0.0
+            print(
+                f"{table_timing['table']:<28}{table_timing['rows']:>10,}{table_timing['create_seconds']:>10.3f}"
+                f"{load_seconds:>10.3f}{table_timing['index_seconds']:>10.3f}{rows_per_second:>14,.0f}"
+            )
+        print(f'Loaded {len(table_timings)} tables in {total_seconds:.3f}s')
+
+    return table_timings
@@ -1,4 +1,7 @@
+from collections import OrderedDict
+import os
 from pathlib import Path
+import threading
 
 import pandas as pd
 
@@ -6,6 +9,14 @@ APP_HANDLER_PATH = '/srv/node_app'
 APP_DATA_PATH = f'{APP_HANDLER_PATH}/data'
 TEMPLATES_PATH = f'{APP_DATA_PATH}/templates'
 
+# Maximum number of template files whose contents fetch_template keeps in memory, least recently used evicted first
+TEMPLATE_CACHE_SIZE = 512
+
+# {template filepath: (file version, contents)}, least recently used first
+_template_cache = OrderedDict()
+_template_cache_lock = threading.Lock()
+_template_cache_stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'evictions': 0}
+
 
 def send_file_upload(account_id, upload_id, upload_file, upload_type, local_parent_folder=f'{APP_DATA_PATH}/file_uploads'):
     if local_parent_folder:
@@ -38,15 +49,117 @@ def edit_template(
     with open(template_filepath, 'w+') as template_file:
         template_file.write(contents)
 
+    # The next fetch in this process is served from memory; other processes see the new file version and re-read it.
+    # Reading the file in text mode translates '\r\n' and '\r' to '\n', so the cached copy is translated the same way.
+    cached_contents = contents.replace('\r\n', '\n').replace('\r', '\n')
+    cache_template(template_filepath, get_file_version(template_filepath), cached_contents)
 
-def fetch_template(
+
+def get_template_filepath(
     node_parent_type, node_detail_type, workflow_category, template_id, templates_folder_path=TEMPLATES_PATH
 ):
     template_filepath_components = [
         templates_folder_path, node_parent_type, node_detail_type, workflow_category, str(template_id)
     ]
+    return '/'.join(template_filepath_components) + '.txt'
+
+
+def get_file_version(filepath):
+    """
+        Returns (modification time in ns, size) of a file, or None if it doesn't exist. Costs a stat, not a read.
+    """
+    try:
+        file_stat = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    return file_stat.st_mtime_ns, file_stat.st_size
+
+
+def get_template_version(
+    node_parent_type, node_detail_type, workflow_category, template_id, templates_folder_path=TEMPLATES_PATH
+):
+    """
+        Returns the get_file_version of a template file, which changes whenever edit_template rewrites it.
+    """
+    return get_file_version(
+        get_template_filepath(node_parent_type, node_detail_type, workflow_category, template_id, templates_folder_path)
+    )
+
+
+def cache_template(template_filepath, template_version, contents, cache_size=TEMPLATE_CACHE_SIZE):
+    """
+        Stores a template's contents for fetch_template, evicting the least recently used templates beyond cache_size.
+        A template_version of None (the file is gone) drops the template instead.
+    """
+    with _template_cache_lock:
+        if template_version is None:
+            _template_cache.pop(template_filepath, None)
+            return
+
+        _template_cache[template_filepath] = (template_version, contents)
+        _template_cache.move_to_end(template_filepath)
+        while len(_template_cache) > cache_size:
+            _template_cache.popitem(last=False)
+            _template_cache_stats['evictions'] += 1
 
-    template_filepath = '/'.join(template_filepath_components) + '.txt'
-    with open(template_filepath, 'r') as template_file:
-        template_file_contents = template_file.read()
+
+def fetch_template(
+    node_parent_type, node_detail_type, workflow_category, template_id, templates_folder_path=TEMPLATES_PATH
+):
+    """
+        Returns a template file's contents. Contents are cached process-wide, keyed by file path, and a cached copy is
+        only used while the file's version (see get_file_version) is unchanged, so edits made by any process are picked
+        up on the next fetch at the cost of a stat.
+    """
+    template_filepath = get_template_filepath(
+        node_parent_type, node_detail_type, workflow_category, template_id, templates_folder_path
+    )
+    template_version = get_file_version(template_filepath)
+
+    with _template_cache_lock:
+        cached_template = _template_cache.get(template_filepath)
+        if cached_template is not None and template_version is not None and cached_template[0] == template_version:
+            _template_cache.move_to_end(template_filepath)
+            _template_cache_stats['hits'] += 1
+            return cached_template[1]
+
+        _template_cache_stats['misses'] += 1
+        if cached_template is not None:
+            _template_cache_stats['invalidations'] += 1
+
+    # The version is taken before the read, so a file rewritten in between is re-read on the next fetch
+    try:
+        with open(template_filepath, 'r') as template_file:
+            template_file_contents = template_file.read()
+    except FileNotFoundError:
+        cache_template(template_filepath, None, None)
+        raise
+
+    cache_template(template_filepath, template_version, template_file_contents)
     return template_file_contents
+
+
+def get_template_cache_stats():
+    """
+        Returns a snapshot of the fetch_template cache, in the following format:
+            {
+                'hits': int,
+                'misses': int,
+                'invalidations': int (misses on a cached template whose file had changed),
+                'evictions': int,
+                'cached_templates': int,
+                'max_cached_templates': int
+            }
+    """
+    with _template_cache_lock:
+        template_cache_stats = dict(_template_cache_stats)
+        template_cache_stats['cached_templates'] = len(_template_cache)
+    template_cache_stats['max_cached_templates'] = TEMPLATE_CACHE_SIZE
+    return template_cache_stats
+
+
+def clear_template_cache():
+    with _template_cache_lock:
+        _template_cache.clear()
+        for stat_name in _template_cache_stats:
+            _template_cache_stats[stat_name] = 0
@@ -0,0 +1,160 @@
+from bisect import bisect_left
+from datetime import datetime
+from functools import lru_cache
+import hashlib
+import json
+import logging
+import re
+import threading
+
+
+"""
+    In-process query instrumentation for database_connector. Every statement is reduced to a fingerprint (literals and
+    placeholder lists collapsed), and latency, row counts and connection-acquire time are aggregated per fingerprint.
+    Statements slower than SLOW_QUERY_THRESHOLD_MS are also written to the 'shinewave_webapp.slow_queries' logger as
+    one JSON object per line.
+"""
+
+SLOW_QUERY_THRESHOLD_MS = 500
+SLOW_QUERY_LOGGER = logging.getLogger('shinewave_webapp.slow_queries')
+
+# Upper bounds (in milliseconds) of the latency histogram buckets; the last bucket catches everything slower
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_FINGERPRINT_PATTERNS = [
+    (re.compile(r'--[^\n]*|/\*.*?\*/', re.DOTALL), ' '),
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(?+)'),
+    (re.compile(r'\(\?\+\)(?:\s*,\s*\(\?\+\))+'), '(?+)+'),
+    (re.compile(r'\s+'), ' ')
+]
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+_metrics_started = datetime.now()
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """
+        Returns (fingerprint_id, normalized_sql) for a statement. Literals become "?", placeholder lists and
+        multi-row VALUES collapse to "(?+)", and whitespace and comments are squeezed out, so that statements differing
+        only in their parameters share a fingerprint.
+    """
+    normalized_sql = sql
+    for pattern, replacement in _FINGERPRINT_PATTERNS:
+        normalized_sql = pattern.sub(replacement, normalized_sql)
+    normalized_sql = normalized_sql.strip()
+
+    fingerprint_id = hashlib.md5(normalized_sql.encode()).hexdigest()[:16]
+    return fingerprint_id, normalized_sql
+
+
+def set_slow_query_threshold(threshold_ms):
+    global SLOW_QUERY_THRESHOLD_MS
+    SLOW_QUERY_THRESHOLD_MS = threshold_ms
+
+
+def record_query(sql, seconds, rows=0, acquire_seconds=0.0, database_connection_type=None, error=None):
+    """
+        Adds one execution to the per-fingerprint aggregates, and logs it if it exceeded the slow-query threshold.
+    """
+    fingerprint_id, normalized_sql = fingerprint(sql)
+    duration_ms = seconds * 1000
+    bucket_index = bisect_left(LATENCY_BUCKETS_MS, duration_ms)
+
+    metrics_key = f'{database_connection_type}:{fingerprint_id}'
+
+    with _metrics_lock:
+        query_metrics = _metrics.get(metrics_key)
+        if query_metrics is None:
+            query_metrics = _metrics[metrics_key] = {
+                'fingerprint': fingerprint_id,
+                'sql': normalized_sql,
+                'database_connection_type': database_connection_type,
+                'count': 0,
+                'errors': 0,
+                'rows': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+                'acquire_total_ms': 0.0,
+                'acquire_max_ms': 0.0,
+                'buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1)
+            }
+
+        query_metrics['count'] += 1
+        query_metrics['rows'] += rows or 0
+        query_metrics['total_ms'] += duration_ms
+        query_metrics['max_ms'] = max(query_metrics['max_ms'], duration_ms)
+        query_metrics['acquire_total_ms'] += acquire_seconds * 1000
+        query_metrics['acquire_max_ms'] = max(query_metrics['acquire_max_ms'], acquire_seconds * 1000)
+        query_metrics['buckets'][bucket_index] += 1
+        if error is not None:
+            query_metrics['errors'] += 1
+
+    if duration_ms >= SLOW_QUERY_THRESHOLD_MS:
+        SLOW_QUERY_LOGGER.warning(json.dumps({
+            'event': 'slow_query',
+            'timestamp': datetime.now().isoformat(),
+            'fingerprint': fingerprint_id,
+            'database_connection_type': database_connection_type,
+            'duration_ms': round(duration_ms, 3),
+            'acquire_ms': round(acquire_seconds * 1000, 3),
+            'rows': rows,
+            'error': None if error is None else repr(error),
+            'sql': normalized_sql[:1000]
+        }))
+
+
+def _estimate_percentile(buckets, count, percentile):
+    target = count * percentile
+    cumulative = 0
+    for bucket_index, bucket_count in enumerate(buckets):
+        cumulative += bucket_count
+        if cumulative >= target:
+            if bucket_index < len(LATENCY_BUCKETS_MS):
+                return LATENCY_BUCKETS_MS[bucket_index]
+            return None
+    return None
+
+
+def get_snapshot():
+    """
+        Returns a JSON-serializable copy of the aggregates, in the following format:
+            {
+                'since': <ISO timestamp>,
+                'slow_query_threshold_ms': float,
+                'bucket_bounds_ms': [float, ...],
+                'queries': {
+                    <database_connection_type:fingerprint_id>: {
+                        'fingerprint', 'sql', 'database_connection_type', 'count', 'errors', 'rows', 'total_ms',
+                        'max_ms', 'mean_ms', 'acquire_total_ms', 'acquire_max_ms', 'buckets', 'p50_ms', 'p95_ms', 'p99_ms'
+                    }
+                }
+            }
+        Percentiles are the upper bound of the bucket they fall in (None if above the last bound).
+    """
+    with _metrics_lock:
+        queries = {key: dict(values, buckets=list(values['buckets'])) for key, values in _metrics.items()}
+
+    for query_metrics in queries.values():
+        count = query_metrics['count']
+        query_metrics['mean_ms'] = query_metrics['total_ms'] / count if count else 0.0
+        for percentile_name, percentile in [('p50_ms', 0.5), ('p95_ms', 0.95), ('p99_ms', 0.99)]:
+            query_metrics[percentile_name] = _estimate_percentile(query_metrics['buckets'], count, percentile)
+
+    return {
+        'since': _metrics_started.isoformat(),
+        'slow_query_threshold_ms': SLOW_QUERY_THRESHOLD_MS,
+        'bucket_bounds_ms': list(LATENCY_BUCKETS_MS),
+        'queries': queries
+    }
+
+
+def reset():
+    global _metrics_started
+    with _metrics_lock:
+        _metrics.clear()
+        _metrics_started = datetime.now()
@@ -0,0 +1,427 @@
+import argparse
+import re
+import threading
+
+from shinewave_webapp.database_connector import (
+    APP_DATA_PATH, DATABASE, DEFAULT_CONNECTION_TYPE, HOST, PASSWORD, PORT, USERNAME, transaction
+)
+from shinewave_webapp.table_schema import INDEX_NAME_PREFIX, get_create_table_statement, read_table_schemas
+
+
+"""
+    Applies the table schema files to an existing database (missing tables, columns and indexes), and checks that the
+    hot queries below are served by an index.
+
+    Usage:
+        python -m shinewave_webapp.schema_migrations migrate
+        python -m shinewave_webapp.schema_migrations migrate --host db.internal --username app --password <password>
+        python -m shinewave_webapp.schema_migrations check --database-connection-type sqlite --database <path>
+"""
+
+# Queries run on every graph load, save, heartbeat or inbound message; none of them should scan their table
+HOT_QUERIES = {
+    'load_graph_from_database': {
+        'table_name': 'workflow_nodes',
+        'sql': """
+            SELECT object_id, node_type, name, inputs, outputs, custom_data
+            FROM workflow_nodes
+            WHERE
+                workflow_id = ?
+                AND active = 'TRUE'
+        """,
+        'sql_parameters': [1]
+    },
+    'route_api_endpoint': {
+        'table_name': 'workflow_nodes',
+        'sql': """
+            SELECT wn.workflow_id, wn.id AS node_id, wn.custom_data
+            FROM workflow_nodes wn
+            INNER JOIN workflows w ON
+                wn.workflow_id = w.id
+                AND wn.active = w.active
+            WHERE
+                w.account_id = ?
+                AND wn.node_type = 'nodes.trigger.APITrigger'
+                AND wn.active = 'TRUE'
+        """,
+        'sql_parameters': [1]
+    },
+    'update_workflow_activity': {
+        'table_name': 'workflow_routes',
+        'sql': """
+            UPDATE workflow_routes SET last_activity = ?
+            WHERE
+                account_id = ?
+                AND workflow_id = ?
+                AND active = 'TRUE'
+        """,
+        'sql_parameters': ['2024-01-01 00:00:00', 1, 1]
+    },
+    'get_node_template_data': {
+        'table_name': 'templates',
+        'sql': """
+            SELECT wc.name AS workflow_category, t.*
+            FROM templates t
+            INNER JOIN workflow_categories wc ON t.workflow_category_id=wc.id
+            WHERE
+                t.account_id = ?
+                AND t.workflow_category_id = ?
+                AND t.template_type = ?
+                AND t.active = 'TRUE'
+        """,
+        'sql_parameters': [1, 1, 'nodes.outreach.SMSOutreach']
+    },
+    'find_recipient_by_phone_number': {
+        'table_name': 'recipients',
+        'sql': """
+            SELECT *
+            FROM recipients
+            WHERE
+                account_id = ?
+                AND phone_number = ?
+        """,
+        'sql_parameters': [1, 5555555555]
+    }
+}
+
+# Command that brings a database in line with the schema files, named in errors about missing tables and columns
+MIGRATE_COMMAND = 'python -m shinewave_webapp.schema_migrations migrate'
+
+# {table_name: [column_name, ...]} that workflow saves and versioned loads need, added after the first tables were
+# created, so missing from databases that haven't been migrated since
+VERSIONING_COLUMNS = {
+    'workflow_nodes': ['retired_version'],
+    'workflow_versions': ['workflow_id', 'workflow_version', 'content_hash', 'snapshot']
+}
+
+# Connections that check_versioning_schema has found up to date, keyed by their connection arguments
+_checked_connections = set()
+_checked_connections_lock = threading.Lock()
+
+# Words that can follow a table name in a FROM, JOIN or UPDATE clause without being an alias for it
+_NON_ALIAS_KEYWORDS = {
+    'CROSS', 'FULL', 'GROUP', 'HAVING', 'INNER', 'JOIN', 'LEFT', 'LIMIT', 'NATURAL', 'ON', 'ORDER', 'OUTER',
+    'RETURNING', 'RIGHT', 'SET', 'UNION', 'USING', 'WHERE', 'WINDOW'
+}
+
+
+def get_existing_tables(tx):
+    if tx.database_connection_type == 'postgres':
+        tables = tx.run_query('SELECT tablename FROM pg_tables WHERE schemaname = current_schema()')
+    else:
+        tables = tx.run_query("SELECT name FROM sqlite_master WHERE type = 'table'")
+    return {i[0] for i in tables}
+
+
+def get_existing_indexes(tx, table_name):
+    if tx.database_connection_type == 'postgres':
+        indexes = tx.run_query(
+            'SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = ?',
+            sql_parameters=[table_name]
+        )
+    else:
+        indexes = tx.run_query(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?",
+            sql_parameters=[table_name]
+        )
+    return {i[0] for i in indexes}
+
+
+def get_existing_columns(tx, table_name):
+    if tx.database_connection_type == 'postgres':
+        columns = tx.run_query(
+            """
+                SELECT column_name
+                FROM information_schema.columns
+                WHERE
+                    table_schema = current_schema()
+                    AND table_name = ?
+            """,
+            sql_parameters=[table_name]
+        )
+        return {i[0] for i in columns}
+    else:
+        return {i[1] for i in tx.run_query(f'PRAGMA table_info({table_name})')}
+
+
+def find_missing_columns(tx, required_columns):
+    """
+        Returns ['table_name', ...] for the tables of required_columns ({table_name: [column_name, ...]}) that don't
+        exist, and ['table_name.column_name', ...] for the columns missing from those that do.
+    """
+    existing_tables = get_existing_tables(tx)
+    missing_columns = []
+    for table_name, column_names in required_columns.items():
+        if table_name not in existing_tables:
+            missing_columns.append(table_name)
+            continue
+        existing_columns = get_existing_columns(tx, table_name)
+        missing_columns += [f'{table_name}.{i}' for i in column_names if i not in existing_columns]
+    return missing_columns
+
+
+def check_versioning_schema(database_connection_kwargs, tx=None):
+    """
+        Raises a ValueError naming MIGRATE_COMMAND if the database that database_connection_kwargs connect to lacks
+        any of VERSIONING_COLUMNS. The check runs in tx if given, otherwise in a transaction of its own. A connection
+        that passes is remembered, so it's only checked once per process.
+    """
+    connection_key = tuple(sorted((i, str(v)) for i, v in database_connection_kwargs.items()))
+    if connection_key in _checked_connections:
+        return
+
+    if tx is None:
+        with transaction(**database_connection_kwargs) as tx:
+            missing_columns = find_missing_columns(tx, VERSIONING_COLUMNS)
+    else:
+        missing_columns = find_missing_columns(tx, VERSIONING_COLUMNS)
+
+    if missing_columns:
+        raise ValueError(
+            f"The database hasn't been migrated for workflow versioning (missing {', '.join(missing_columns)}). "
+            f'Run "{MIGRATE_COMMAND}" and try again.'
+        )
+
+    with _checked_connections_lock:
+        _checked_connections.add(connection_key)
+
+
+def migrate_tables(
+    database_connection_type=DEFAULT_CONNECTION_TYPE,
+    database=DATABASE,
+    host=HOST,
+    password=PASSWORD,
+    port=PORT,
+    username=USERNAME,
+    app_data_path=APP_DATA_PATH,
+    print_debug_info=False
+):
+    """
+        Creates tables that have a schema file but don't exist yet, and adds columns that were added to a schema file
+        after its table was created. Columns are never dropped or retyped. Running it twice is a no-op.
+        Returns
+        -------
+        dict: {'created_tables': [table_name, ...], 'added_columns': ['table_name.column_name', ...]}
+    """
+    schemas = read_table_schemas(f'{app_data_path}/table_csvs')
+    migration_results = {'created_tables': [], 'added_columns': []}
+
+    transaction_kwargs = {
+        'database_connection_type': database_connection_type,
+        'database': database,
+        'host': host,
+        'password': password,
+        'port': port,
+        'username': username,
+        'print_debug_info': print_debug_info
+    }
+
+    with transaction(**transaction_kwargs) as tx:
+        existing_tables = get_existing_tables(tx)
+        for table_name, schema in schemas.items():
+            if table_name not in existing_tables:
+                tx.run_query(get_create_table_statement(schema))
+                migration_results['created_tables'].append(table_name)
+                continue
+
+            existing_columns = get_existing_columns(tx, table_name)
+            for column_name, column_type in schema['columns']:
+                if column_name not in existing_columns:
+                    tx.run_query(f'ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}')
+                    migration_results['added_columns'].append(f'{table_name}.{column_name}')
+
+    return migration_results
+
+
+def migrate_schema(
+    database_connection_type=DEFAULT_CONNECTION_TYPE,
+    database=DATABASE,
+    host=HOST,
+    password=PASSWORD,
+    port=PORT,
+    username=USERNAME,
+    app_data_path=APP_DATA_PATH,
+    print_debug_info=False
+):
+    """
+        Runs migrate_tables, then migrate_indexes, and returns their combined results.
+    """
+    migration_kwargs = {
+        'database_connection_type': database_connection_type,
+        'database': database,
+        'host': host,
+        'password': password,
+        'port': port,
+        'username': username,
+        'app_data_path': app_data_path,
+        'print_debug_info': print_debug_info
+    }
+
+    migration_results = migrate_tables(**migration_kwargs)
+    migration_results.update(migrate_indexes(**migration_kwargs))
+    return migration_results
+
+
+def migrate_indexes(
+    database_connection_type=DEFAULT_CONNECTION_TYPE,
+    database=DATABASE,
+    host=HOST,
+    password=PASSWORD,
+    port=PORT,
+    username=USERNAME,
+    app_data_path=APP_DATA_PATH,
+    print_debug_info=False
+):
+    """
+        Brings the indexes of every existing table in line with its schema file, in one transaction: declared indexes
+        that are missing are created, and managed indexes (named with INDEX_NAME_PREFIX) that are no longer declared
+        are dropped. Indexes created by other means are left alone. Running it twice is a no-op.
+        Returns
+        -------
+        dict: {'created': [index_name, ...], 'dropped': [index_name, ...]}
+    """
+    schemas = read_table_schemas(f'{app_data_path}/table_csvs')
+    migration_results = {'created': [], 'dropped': []}
+
+    transaction_kwargs = {
+        'database_connection_type': database_connection_type,
+        'database': database,
+        'host': host,
+        'password': password,
+        'port': port,
+        'username': username,
+        'print_debug_info': print_debug_info
+    }
+
+    with transaction(**transaction_kwargs) as tx:
+        existing_tables = get_existing_tables(tx)
+        for table_name, schema in schemas.items():
+            if table_name not in existing_tables:
+                continue
+
+            existing_indexes = get_existing_indexes(tx, table_name)
+            for index_name, index_columns in schema['indexes'].items():
+                if index_name not in existing_indexes:
+                    tx.run_query(f"CREATE INDEX {index_name} ON {table_name} ({', '.join(index_columns)})")
+                    migration_results['created'].append(index_name)
+
+            for index_name in sorted(existing_indexes):
+                if index_name.startswith(f'{INDEX_NAME_PREFIX}_{table_name}_') and index_name not in schema['indexes']:
+                    tx.run_query(f'DROP INDEX {index_name}')
+                    migration_results['dropped'].append(index_name)
+
+    return migration_results
+
+
+def get_table_aliases(sql, table_name):
+    """
+        Returns the aliases that table_name is given in the FROM, JOIN and UPDATE clauses of sql, which is what sqlite
+        names the table by in its query plans.
+    """
+    table_aliases = []
+    alias_pattern = rf'\b(?:FROM|JOIN|UPDATE)\s+{re.escape(table_name)}\s+(?:AS\s+)?(\w+)'
+    for alias in re.findall(alias_pattern, sql, flags=re.IGNORECASE):
+        if alias.upper() not in _NON_ALIAS_KEYWORDS and alias not in table_aliases:
+            table_aliases.append(alias)
+    return table_aliases
+
+
+def find_sequential_scans(plan, table_name, database_connection_type, table_aliases=()):
+    """
+        Returns the lines of a query plan that read table_name, under its own name or any of table_aliases, in full.
+    """
+    table_names = '|'.join(re.escape(i) for i in [table_name, *table_aliases])
+    if database_connection_type == 'postgres':
+        scan_pattern = rf'Seq Scan on ({table_names})\b'
+    else:
+        scan_pattern = rf'^SCAN (TABLE )?({table_names})\b'
+    return [i for i in plan if re.search(scan_pattern, i.strip())]
+
+
+def check_query_plans(
+    database_connection_type=DEFAULT_CONNECTION_TYPE,
+    database=DATABASE,
+    host=HOST,
+    password=PASSWORD,
+    port=PORT,
+    username=USERNAME,
+    hot_queries=HOT_QUERIES,
+    raise_on_sequential_scan=True
+):
+    """
+        EXPLAINs each hot query and flags any that scan their table instead of using an index. On postgres, sequential
+        scans are disabled for the check, so that a small table (where a scan is cheaper) still shows whether a usable
+        index exists.
+        Returns
+        -------
+        dict: {query_name: {'table_name': str, 'plan': [str, ...], 'sequential_scans': [str, ...]}}
+        Raises a ValueError naming every failing query, unless raise_on_sequential_scan is False.
+    """
+    plan_results = {}
+
+    transaction_kwargs = {
+        'database_connection_type': database_connection_type,
+        'database': database,
+        'host': host,
+        'password': password,
+        'port': port,
+        'username': username
+    }
+
+    with transaction(**transaction_kwargs) as tx:
+        if database_connection_type == 'postgres':
+            tx.run_query('SET LOCAL enable_seqscan = off')
+
+        explain_prefix = 'EXPLAIN' if database_connection_type == 'postgres' else 'EXPLAIN QUERY PLAN'
+        for query_name, hot_query in hot_queries.items():
+            plan = tx.run_query(f"{explain_prefix} {hot_query['sql']}", sql_parameters=hot_query['sql_parameters'])
+            # Postgres returns one plan line per row; sqlite returns (id, parent, notused, detail)
+            plan = [i[-1] for i in plan]
+
+            table_aliases = get_table_aliases(hot_query['sql'], hot_query['table_name'])
+            plan_results[query_name] = {
+                'table_name': hot_query['table_name'],
+                'plan': plan,
+                'sequential_scans': find_sequential_scans(
+                    plan, hot_query['table_name'], database_connection_type, table_aliases
+                )
+            }
+
+    failing_queries = [query_name for query_name, result in plan_results.items() if result['sequential_scans']]
+    if failing_queries and raise_on_sequential_scan:
+        failure_details = '\n'.join(
+            [f"    {i}: {'; '.join(plan_results[i]['sequential_scans'])}" for i in failing_queries]
+        )
+        raise ValueError(f'Hot queries are scanning their tables:\n{failure_details}')
+
+    return plan_results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', choices=['migrate', 'check'])
+    parser.add_argument('--database-connection-type', default=DEFAULT_CONNECTION_TYPE, choices=['postgres', 'sqlite'])
+    parser.add_argument('--database', default=DATABASE)
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--username', default=USERNAME)
+    parser.add_argument('--password', default=PASSWORD)
+    parser.add_argument('--app-data-path', default=APP_DATA_PATH)
+    args = parser.parse_args()
+
+    connection_kwargs = {
+        'database_connection_type': args.database_connection_type,
+        'database': args.database,
+        'host': args.host,
+        'password': args.password,
+        'port': args.port,
+        'username': args.username
+    }
+
+    if args.command == 'migrate':
+        print(migrate_schema(app_data_path=args.app_data_path, **connection_kwargs))
+    else:
+        for query_name, result in check_query_plans(**connection_kwargs).items():
+            print(f'{query_name}: ok')
+            for plan_line in result['plan']:
+                print(f'    {plan_line}')
@@ -0,0 +1,91 @@
+import csv
+import hashlib
+import os
+
+
+"""
+    Reads the table schema files in <app_data_path>/table_csvs. Each <table>.csv has the following layout:
+        row 1: column names
+        row 2: column types
+        row 3+ (optional): one row per index. Each column that is part of the index holds its position in the index
+            key (1, 2, ...); every other cell is left blank. For example, an index on (workflow_id, active):
+                id,workflow_id,workflow_version,...,active
+                INTEGER,INTEGER,INTEGER,...,TEXT
+                ,1,,...,2
+    Table data lives alongside, in <table>_data.csv.
+"""
+
+INDEX_NAME_PREFIX = 'ix'
+
+# Postgres truncates identifiers longer than this, so longer index names are shortened with a hash suffix
+MAX_IDENTIFIER_LENGTH = 63
+
+
+def get_index_name(table_name, index_columns):
+    index_name = '_'.join([INDEX_NAME_PREFIX, table_name] + list(index_columns))
+    if len(index_name) > MAX_IDENTIFIER_LENGTH:
+        index_hash = hashlib.md5(index_name.encode()).hexdigest()[:8]
+        index_name = f'{index_name[:MAX_IDENTIFIER_LENGTH - 9]}_{index_hash}'
+    return index_name
+
+
+def read_table_schema(schema_path):
+    """
+        Returns a schema in the following format:
+            {
+                'table_name': str,
+                'columns': [(column_name, column_type), ...],
+                'indexes': {index_name: [column_name, ...]}
+            }
+    """
+    table_name = os.path.basename(schema_path).rsplit('.csv', 1)[0]
+
+    with open(schema_path, newline='') as schema_file:
+        reader = csv.reader(schema_file)
+        column_names = [i.strip() for i in next(reader)]
+        column_types = [i.strip() for i in next(reader)]
+        index_rows = [row for row in reader if any(i.strip() for i in row)]
+
+    if len(column_names) != len(column_types):
+        raise ValueError(f'{schema_path}: every column needs exactly one type.')
+
+    indexes = {}
+    for index_row in index_rows:
+        positions = {}
+        for column_name, position in zip(column_names, index_row):
+            if position.strip():
+                positions[int(position)] = column_name
+        if sorted(positions) != list(range(1, len(positions) + 1)):
+            raise ValueError(f'{schema_path}: index positions must run 1, 2, ... without gaps ({index_row}).')
+        index_columns = [positions[i] for i in sorted(positions)]
+        indexes[get_index_name(table_name, index_columns)] = index_columns
+
+    return {'table_name': table_name, 'columns': list(zip(column_names, column_types)), 'indexes': indexes}
+
+
+def read_table_schemas(table_csv_path):
+    """
+        Returns {table_name: schema} for every schema file in table_csv_path, in the format of read_table_schema.
+    """
+    schemas = {}
+    for filename in sorted(os.listdir(table_csv_path)):
+        if filename.endswith('.csv') and not filename.endswith('_data.csv'):
+            schema = read_table_schema(os.path.join(table_csv_path, filename))
+            schemas[schema['table_name']] = schema
+    return schemas
+
+
+def get_create_table_statement(schema):
+    create_statement_rows = [f'    {column_name} {column_type}' for column_name, column_type in schema['columns']]
+    create_statement_rows = ',\n'.join(create_statement_rows)
+    return f"CREATE TABLE {schema['table_name']} (\n{create_statement_rows}\n);"
+
+
+def get_create_index_statements(schema):
+    """
+        CREATE INDEX IF NOT EXISTS is understood by both postgres and sqlite.
+    """
+    return [
+        f"CREATE INDEX IF NOT EXISTS {index_name} ON {schema['table_name']} ({', '.join(index_columns)})"
+        for index_name, index_columns in schema['indexes'].items()
+    ]
@@ -0,0 +1,71 @@
+import re
+
+import pytest
+
+from shinewave_webapp.database_connector import sqlite_to_psql, translate_sqlite_to_psql
+
+
+def legacy_sqlite_to_psql(sql):
+    """
+        The translator that translate_sqlite_to_psql replaced, kept as a reference for the statements it got right.
+    """
+    for char in '{}':
+        sql = sql.replace(char, char * 2)
+
+    master_quote_replacement_ptrn = r'(.*?\?)'
+    quote_replacement_types = [('double', '"'), ('single', "'")]
+    replacement_dict = {}
+
+    for pattern_name, replacement_type in quote_replacement_types:
+        replacement_ptrn = f'{replacement_type}{master_quote_replacement_ptrn}{replacement_type}'
+        replacements = re.findall(replacement_ptrn, sql)
+        replacement_count = 0
+        while replacements:
+            placeholder = f'{pattern_name}_{replacement_count}'
+            replacement_dict[placeholder] = replacements.pop(0)
+            sql = re.sub(replacement_ptrn, f'{replacement_type}{{{placeholder}}}{replacement_type}', sql, 1)
+            replacement_count += 1
+    sql = sql.replace('?', r'%s')
+    return sql.format(**replacement_dict)
+
+
+# (sqlite statement, psycopg2 statement) for statements the legacy translator also handled correctly
+UNCHANGED_TRANSLATIONS = [
+    ('SELECT * FROM t WHERE a = ? AND b = ?', 'SELECT * FROM t WHERE a = %s AND b = %s'),
+    ('INSERT INTO t VALUES (?, ?, ?)', 'INSERT INTO t VALUES (%s, %s, %s)'),
+    ("SELECT * FROM t WHERE a = '?' AND b = ?", "SELECT * FROM t WHERE a = '?' AND b = %s"),
+    ('SELECT "col?" FROM t WHERE a = ?', 'SELECT "col?" FROM t WHERE a = %s'),
+    ("SELECT * FROM t WHERE a = 'it''s?' AND b = ?", "SELECT * FROM t WHERE a = 'it''s?' AND b = %s"),
+    ("SELECT * FROM t WHERE a = '' AND b = ?", "SELECT * FROM t WHERE a = '' AND b = %s"),
+    ("SELECT '{}', '{x}' FROM t WHERE a = ?", "SELECT '{}', '{x}' FROM t WHERE a = %s"),
+    ("SELECT '{' FROM t", "SELECT '{' FROM t"),
+    ('SELECT * FROM t WHERE a = \'{"k": "?"}\' AND b = ?', 'SELECT * FROM t WHERE a = \'{"k": "?"}\' AND b = %s')
+]
+
+# Statements the legacy translator got wrong: placeholders in comments were converted, and "%" was left as it was,
+# which psycopg2 rejects (run_query always passes a parameter list, so the statement is always interpolated)
+CHANGED_TRANSLATIONS = [
+    ('SELECT * FROM t WHERE a = ? -- why?\n AND b = ?', 'SELECT * FROM t WHERE a = %s -- why?\n AND b = %s'),
+    ('SELECT * FROM t /* a ? b */ WHERE a = ?', 'SELECT * FROM t /* a ? b */ WHERE a = %s'),
+    ('SELECT * FROM t /* a ?\n b ? */ WHERE a = ?', 'SELECT * FROM t /* a ?\n b ? */ WHERE a = %s'),
+    ("SELECT * FROM t WHERE a LIKE 'a%'", "SELECT * FROM t WHERE a LIKE 'a%%'"),
+    ("SELECT * FROM t WHERE a LIKE 'a%' AND b = ?", "SELECT * FROM t WHERE a LIKE 'a%%' AND b = %s"),
+    ('SELECT a % 2 FROM t WHERE b = ?', 'SELECT a %% 2 FROM t WHERE b = %s'),
+    ("SELECT * FROM t WHERE a = '%?' AND b = ?", "SELECT * FROM t WHERE a = '%%?' AND b = %s")
+]
+
+
+@pytest.mark.parametrize('sql, expected', UNCHANGED_TRANSLATIONS + CHANGED_TRANSLATIONS)
+def test_translate_sqlite_to_psql(sql, expected):
+    assert translate_sqlite_to_psql(sql) == expected
+    assert sqlite_to_psql(sql) == expected
+
+
+@pytest.mark.parametrize('sql, expected', UNCHANGED_TRANSLATIONS)
+def test_translate_sqlite_to_psql_matches_legacy(sql, expected):
+    assert legacy_sqlite_to_psql(sql) == translate_sqlite_to_psql(sql)
+
+
+@pytest.mark.parametrize('sql, expected', CHANGED_TRANSLATIONS)
+def test_translate_sqlite_to_psql_fixes_legacy(sql, expected):
+    assert legacy_sqlite_to_psql(sql) != translate_sqlite_to_psql(sql)
@@ -0,0 +1,32 @@
+import pytest
+
+from shinewave_webapp.file_storage_connector import (
+    clear_template_cache, edit_template, fetch_template, get_template_cache_stats
+)
+
+
+TEMPLATE_KEY = ['outreach', 'SMSOutreach', 'Test Category', 1]
+
+
+@pytest.fixture(autouse=True)
+def empty_template_cache():
+    clear_template_cache()
+    yield
+    clear_template_cache()
+
+
+@pytest.mark.parametrize('contents', [
+    'Hi {first_name},\nsee you soon.\n',
+    'Hi {first_name},\r\nsee you soon.\r\n',
+    'Hi {first_name},\rsee you soon.\r',
+    'Hi {first_name},\r\n\r\nsee you\rsoon.\n',
+    ''
+])
+def test_edit_then_fetch_matches_uncached_fetch(tmp_path, contents):
+    edit_template(contents, *TEMPLATE_KEY, templates_folder_path=str(tmp_path))
+    cached_contents = fetch_template(*TEMPLATE_KEY, templates_folder_path=str(tmp_path))
+    assert get_template_cache_stats()['hits'] == 1
+
+    clear_template_cache()
+    assert fetch_template(*TEMPLATE_KEY, templates_folder_path=str(tmp_path)) == cached_contents
+    assert get_template_cache_stats()['misses'] == 1
@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from shinewave_webapp.database_connector import close_sqlite_conns, transaction
+from shinewave_webapp.schema_migrations import check_query_plans, get_table_aliases, migrate_schema
+
+
+APP_DATA_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'file_mount', 'node_app', 'data')
+
+
+@pytest.fixture
+def database_connection_kwargs(tmp_path):
+    database_connection_kwargs = {'database_connection_type': 'sqlite', 'database': str(tmp_path / 'migrations.db')}
+    migrate_schema(app_data_path=APP_DATA_PATH, **database_connection_kwargs)
+    yield database_connection_kwargs
+    close_sqlite_conns()
+
+
+def test_get_table_aliases():
+    assert get_table_aliases('SELECT * FROM templates t INNER JOIN workflows AS w ON 1', 'templates') == ['t']
+    assert get_table_aliases('SELECT * FROM workflows AS w', 'workflows') == ['w']
+    assert get_table_aliases('SELECT * FROM templates WHERE id = ?', 'templates') == []
+    assert get_table_aliases('UPDATE workflow_routes SET last_activity = ?', 'workflow_routes') == []
+
+
+def test_check_query_plans_passes_on_migrated_schema(database_connection_kwargs):
+    plan_results = check_query_plans(**database_connection_kwargs)
+    assert not any(i['sequential_scans'] for i in plan_results.values())
+
+
+def test_check_query_plans_catches_scan_of_aliased_table(database_connection_kwargs):
+    with transaction(**database_connection_kwargs) as tx:
+        template_indexes = tx.run_query(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'templates' AND name LIKE 'ix_%'"
+        )
+        for index_name, in template_indexes:
+            tx.run_query(f'DROP INDEX {index_name}')
+
+    plan_results = check_query_plans(raise_on_sequential_scan=False, **database_connection_kwargs)
+    assert plan_results['get_node_template_data']['sequential_scans'] == ['SCAN t']
+
+    with pytest.raises(ValueError, match='get_node_template_data'):
+        check_query_plans(**database_connection_kwargs)